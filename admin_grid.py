@@ -0,0 +1,272 @@
+"""Server-side paging, sorting and filtering for the admin dashboard grid.
+
+The dashboard used to render every row of the selected table and search it in
+the browser.  ``fetch_page`` instead returns one page at a time: filters become
+``WHERE`` clauses, sorting an ``ORDER BY`` on a whitelisted column with ``id`` as
+tie-breaker, and paging uses a keyset cursor (the last row's sort value + id)
+rather than ``OFFSET``, so deep pages cost the same as the first one.
+
+Grid definitions mirror the columns (and header labels - the edit modal posts
+fields by label) the dashboard always showed.
+"""
+import base64
+import json
+from collections import namedtuple
+from datetime import date, datetime
+
+from flask import url_for
+from sqlalchemy import text
+
+from models import db
+
+# kind: how the value is displayed / filtered
+#   text, int, date, datetime, bool, photo, packages (JSON list of {title, price})
+GridColumn = namedtuple('GridColumn', 'key label expr kind sortable filterable')
+
+
+def _col(key, label, expr, kind='text', sortable=True, filterable=True):
+    return GridColumn(key, label, expr, kind, sortable, filterable)
+
+
+class Grid:
+    """One admin table: its FROM clause, id expression and columns."""
+
+    def __init__(self, name, from_sql, columns, default_sort='created_at', id_expr='t.id'):
+        self.name = name
+        self.from_sql = from_sql
+        self.columns = columns
+        self.by_key = {c.key: c for c in columns}
+        self.default_sort = default_sort
+        self.id_expr = id_expr
+
+    @property
+    def headers(self):
+        return [c.label for c in self.columns]
+
+    def describe(self):
+        """Column metadata for the template / API clients."""
+        return [{'key': c.key, 'label': c.label, 'kind': c.kind,
+                 'sortable': c.sortable, 'filterable': c.filterable} for c in self.columns]
+
+
+PASSENGERS_GRID = Grid('passengers', 'login_details t', [
+    _col('photo', 'Photo', 'COALESCE(t.photo_thumb, t.photo)', 'photo', sortable=False, filterable=False),
+    _col('id', 'Profile ID', 't.id', 'int'),
+    _col('login_id', 'Login Key (Phone)', 't.login_id'),
+    _col('name', 'Name', 't.name'),
+    _col('aadhar', 'Aadhar No', 't.aadhar'),
+    _col('year_of_birth', 'Year of Birth', 't.year_of_birth', 'int'),
+    _col('phone', 'Phone', 't.phone'),
+    _col('email', 'Email', 't.email'),
+    _col('city', 'City', 't.city'),
+    _col('district', 'District', 't.district'),
+    _col('state', 'State', 't.state'),
+    _col('created_at', 'Created At', 't.created_at', 'datetime'),
+])
+
+YATRA_DETAILS_GRID = Grid('yatra_details', 'yatra_details t', [
+    _col('id', 'ID', 't.id', 'int'),
+    _col('title', 'Title', 't.title'),
+    _col('starting_date', 'Starting Date', 't.starting_date', 'date'),
+    _col('is_start_fixed', 'Fixed Start', 't.is_start_fixed', 'bool', filterable=False),
+    _col('end_date', 'End Date', 't.end_date', 'date'),
+    _col('is_end_fixed', 'Fixed End', 't.is_end_fixed', 'bool', filterable=False),
+    _col('hotel_packages', 'Hotel Packages', 't.hotel_packages', 'packages', sortable=False),
+    _col('travel_packages', 'Travel Packages', 't.travel_packages', 'packages', sortable=False),
+    _col('yatra_message', 'Message', 't.yatra_message', sortable=False),
+    _col('yatra_link', 'Link', 't.yatra_link', sortable=False),
+    _col('created_at', 'Created At', 't.created_at', 'datetime'),
+])
+
+_YATRA_COLUMNS = [
+    _col('photo', 'Photo', 'COALESCE(ld.photo_thumb, ld.photo)', 'photo', sortable=False, filterable=False),
+    _col('passenger_id', 'Profile ID', 't.passenger_id', 'int'),
+    _col('id', 'Record ID', 't.id', 'int'),
+    _col('login_id', 'Parent Login (Phone)', 't.login_id'),
+    _col('name', 'Name', 't.name'),
+    _col('year_of_birth', 'Year of Birth', 't.year_of_birth', 'int'),
+    _col('aadhar', 'Aadhar No', 'ld.aadhar'),
+    _col('email', 'Email', 't.email'),
+    _col('phone', 'Phone', 't.phone'),
+    _col('gender', 'Gender', 't.gender'),
+    _col('city', 'City', 't.city'),
+    _col('district', 'District', 't.district'),
+    _col('state', 'State', 't.state'),
+    _col('hotel_package', 'Hotel Package', 't.hotel_package'),
+    _col('travel_package', 'Travel Package', 't.travel_package'),
+    _col('start_date', 'Start Date', 't.start_date'),
+    _col('end_date', 'End Date', 't.end_date'),
+    _col('status', 'Status', 't.status'),
+    _col('razorpay_id', 'RazorPay ID', 't.razorpay_id'),
+    _col('created_at', 'Created At', 't.created_at', 'datetime'),
+]
+
+
+def yatra_grid(table_name):
+    """Grid for a dynamic yatra table.  ``table_name`` must already have passed
+    ``_is_valid_table`` - it is inlined into the SQL."""
+    return Grid(table_name, f'{table_name} t LEFT JOIN login_details ld ON ld.id = t.passenger_id',
+                _YATRA_COLUMNS)
+
+
+# ── Cursors ──
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(sep=' ') if isinstance(value, datetime) else value.isoformat()
+    return value
+
+
+def encode_cursor(sort_key, direction, value, row_id):
+    raw = json.dumps([sort_key, direction, _json_value(value), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return ``(sort_key, direction, value, id)`` or ``None`` for a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort_key, direction, value, row_id = json.loads(raw)
+        return sort_key, direction, value, int(row_id)
+    except Exception:
+        return None
+
+
+# ── Query building ──
+
+def _like_term(value):
+    escaped = value.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def _text_expr(expr):
+    return f"LOWER(CAST({expr} AS TEXT))"
+
+
+def _filter_clauses(grid, search, column_filters, params):
+    clauses = []
+    if search:
+        params['q'] = _like_term(search)
+        ors = [f"{_text_expr(c.expr)} LIKE :q ESCAPE '\\'" for c in grid.columns if c.filterable]
+        clauses.append('(' + ' OR '.join(ors) + ')')
+    for i, (key, value) in enumerate(sorted(column_filters.items())):
+        column = grid.by_key.get(key)
+        if not column or not column.filterable or not value:
+            continue
+        name = f'f{i}'
+        if column.kind == 'int' and value.isdigit():
+            # Exact match keeps id / passenger_id lookups on their index
+            params[name] = int(value)
+            clauses.append(f"{column.expr} = :{name}")
+        else:
+            params[name] = _like_term(value)
+            clauses.append(f"{_text_expr(column.expr)} LIKE :{name} ESCAPE '\\'")
+    return clauses
+
+
+def _keyset_clause(sort_expr, id_expr, descending, value, row_id, nulls_largest, params):
+    """Rows strictly after (value, row_id) in ``ORDER BY sort dir, id dir``.
+
+    NULL sort values follow the database's own ordering (largest on PostgreSQL,
+    smallest on SQLite) so the plain ORDER BY can still walk an index.
+    """
+    op = '<' if descending else '>'
+    nulls_last = nulls_largest != descending
+    params['kid'] = row_id
+    if value is None:
+        clause = f"({sort_expr} IS NULL AND {id_expr} {op} :kid)"
+        if not nulls_last:
+            clause = f"({clause} OR {sort_expr} IS NOT NULL)"
+        return clause
+    params['kv'] = value
+    clause = f"({sort_expr} {op} :kv OR ({sort_expr} = :kv AND {id_expr} {op} :kid)"
+    if nulls_last:
+        clause += f" OR {sort_expr} IS NULL"
+    return clause + ')'
+
+
+def fetch_page(grid, sort=None, direction='desc', search='', column_filters=None,
+               cursor=None, page_size=50):
+    """One page of ``grid``.
+
+    Returns ``{'rows', 'next_cursor', 'total', 'sort', 'dir'}``; ``total`` (rows
+    matching the filters) is only counted for the first page.
+    """
+    column_filters = column_filters or {}
+    sort_col = grid.by_key.get(sort)
+    if not sort_col or not sort_col.sortable:
+        sort_col = grid.by_key[grid.default_sort]
+    direction = 'asc' if direction == 'asc' else 'desc'
+    descending = direction == 'desc'
+
+    params = {}
+    where = _filter_clauses(grid, search.strip(), column_filters, params)
+    filter_params = dict(params)
+
+    keyset = decode_cursor(cursor) if cursor else None
+    if keyset and keyset[0] == sort_col.key and keyset[1] == direction:
+        nulls_largest = db.engine.dialect.name == 'postgresql'
+        where.append(_keyset_clause(sort_col.expr, grid.id_expr, descending,
+                                    keyset[2], keyset[3], nulls_largest, params))
+    else:
+        keyset = None
+
+    where_sql = (' WHERE ' + ' AND '.join(where)) if where else ''
+    dir_sql = 'DESC' if descending else 'ASC'
+    select_list = ', '.join(f"{c.expr} AS c_{c.key}" for c in grid.columns)
+    params['limit'] = page_size + 1
+    rows = db.session.execute(text(
+        f"SELECT {grid.id_expr} AS row_id, {sort_col.expr} AS sort_value, {select_list} "
+        f"FROM {grid.from_sql}{where_sql} "
+        f"ORDER BY {sort_col.expr} {dir_sql}, {grid.id_expr} {dir_sql} LIMIT :limit"
+    ), params).fetchall()
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(sort_col.key, direction, last.sort_value, last.row_id)
+
+    total = None
+    if keyset is None:
+        filter_sql = (' WHERE ' + ' AND '.join(where)) if where else ''
+        total = db.session.execute(
+            text(f"SELECT COUNT(*) FROM {grid.from_sql}{filter_sql}"), filter_params
+        ).scalar()
+
+    return {
+        'rows': [{'id': row.row_id, 'cols': [_display(c, row[i + 2]) for i, c in enumerate(grid.columns)]}
+                 for row in rows],
+        'next_cursor': next_cursor,
+        'total': total,
+        'sort': sort_col.key,
+        'dir': direction,
+    }
+
+
+# ── Display formatting (same as the old server-rendered table) ──
+
+def _format_packages(raw):
+    if not raw or raw == 'null':
+        return '-'
+    try:
+        items = json.loads(raw)
+        return ", ".join([f"{x['title']} (₹{x['price']})" if isinstance(x, dict) else str(x) for x in items])
+    except Exception:
+        return raw
+
+
+def _display(column, value):
+    if column.kind == 'photo':
+        return {'type': 'photo', 'url': url_for('static', filename=value) if value else None}
+    if column.kind == 'packages':
+        return _format_packages(value)
+    if value is None or value == '':
+        return '-'
+    if column.kind == 'bool':
+        return 'Yes' if value in (True, 1, '1', 'true') else 'No'
+    if column.kind == 'datetime':
+        return value.strftime('%Y-%m-%d %H:%M') if isinstance(value, datetime) else str(value)[:16]
+    if column.kind == 'date':
+        return value.strftime('%Y-%m-%d') if isinstance(value, date) else str(value)[:10]
+    return value
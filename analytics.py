@@ -0,0 +1,305 @@
+"""Registration analytics computed in the database.
+
+``/admin/api/analytics-data`` used to pull every row of every yatra table into
+Python and bucket them one at a time.  ``table_aggregates`` instead asks the
+database for the counts: conditional sums for the fixed gender / status / age
+buckets and a GROUP BY each for day, hotel and travel package, so only a few
+hundred aggregate rows come back however big the table is.
+``fold_aggregates`` adds them into the response dict.
+
+On top of that, ``analytics_daily_rollup`` keeps those counts pre-aggregated
+per yatra table, day and bucket value.  Write paths call
+``refresh_rollup`` for the days they touched (recomputing a day is a small
+indexed range scan, and it is idempotent, so no before/after bookkeeping is
+needed); ``rollup_analytics`` then answers any period from the rollup plus a
+live aggregate of the partial day at the cutoff.  Age groups depend on the
+current year, so the rollup remembers the year it was built for and is
+rebuilt when that changes.
+"""
+import string
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, text
+
+from models import db
+from settings_service import settings
+
+AGE_BUCKETS = ('0-18', '19-35', '36-50', '51-65', '65+')
+
+
+def empty_analytics():
+    """The response skeleton the analytics page expects."""
+    return {
+        'timeline': {},
+        'gender': {'Male': 0, 'Female': 0, 'Other': 0},
+        'status': {'Paid': 0, 'Pending': 0, 'Interest': 0, 'Failed': 0},
+        'age_groups': {bucket: 0 for bucket in AGE_BUCKETS},
+        'yatra_dist': {},
+        'packages': {'hotel': {}, 'travel': {}},
+    }
+
+
+def yatra_display_name(table_name):
+    return string.capwords(table_name[6:].replace('_', ' '))
+
+
+def _day_expr(column):
+    """``column`` truncated to a 'YYYY-MM-DD' string (NULL if it is not a date)."""
+    if db.engine.dialect.name == 'postgresql':
+        return f"to_char(date_trunc('day', {column}), 'YYYY-MM-DD')"
+    return f"date({column})"
+
+
+def _package_expr(column):
+    return (f"CASE WHEN {column} IS NULL OR TRIM({column}) = '' OR LOWER({column}) = 'none' "
+            f"THEN NULL ELSE TRIM({column}) END")
+
+
+# (response section, key, SQL condition) for every fixed bucket.  Rows that hit
+# none of the gender / status conditions count as 'Other' / 'Interest'.
+_GENDER_SQL = "LOWER(gender)"
+_STATUS_SQL = "LOWER(status)"
+_AGE_SQL = "(:current_year - year_of_birth)"
+_HAS_YOB = "year_of_birth IS NOT NULL AND year_of_birth <> 0"
+FIXED_BUCKETS = (
+    ('gender', 'Male', f"{_GENDER_SQL} IN ('male', 'm')"),
+    ('gender', 'Female', f"{_GENDER_SQL} IN ('female', 'f')"),
+    ('status', 'Paid', f"{_STATUS_SQL} = 'paid'"),
+    ('status', 'Pending', f"{_STATUS_SQL} = 'pending'"),
+    ('status', 'Failed', f"{_STATUS_SQL} = 'failed'"),
+    ('age_groups', '0-18', f"{_HAS_YOB} AND {_AGE_SQL} <= 18"),
+    ('age_groups', '19-35', f"{_HAS_YOB} AND {_AGE_SQL} > 18 AND {_AGE_SQL} <= 35"),
+    ('age_groups', '36-50', f"{_HAS_YOB} AND {_AGE_SQL} > 35 AND {_AGE_SQL} <= 50"),
+    ('age_groups', '51-65', f"{_HAS_YOB} AND {_AGE_SQL} > 50 AND {_AGE_SQL} <= 65"),
+    ('age_groups', '65+', f"{_HAS_YOB} AND {_AGE_SQL} > 65"),
+)
+
+
+def table_aggregates(table_name, cutoff=None, current_year=None, until=None):
+    """Aggregate one yatra table in two statements.
+
+    Returns ``(totals, groups)``: ``totals`` maps ``(section, key)`` of every
+    fixed bucket - plus ``('total', None)`` - to its count; ``groups`` is a list
+    of ``(kind, value, count)`` with kind 'day', 'hotel' or 'travel'.
+    ``table_name`` must already have passed ``_is_valid_table``.  ``cutoff`` /
+    ``until`` ('YYYY-MM-DD[ HH:MM:SS]' strings) limit rows to
+    ``cutoff <= created_at < until``.
+    """
+    params = {'current_year': current_year or datetime.now().year}
+    conditions = []
+    if cutoff:
+        conditions.append('created_at >= :cutoff')
+        params['cutoff'] = cutoff
+    if until:
+        conditions.append('created_at < :until')
+        params['until'] = until
+    where = (' WHERE ' + ' AND '.join(conditions)) if conditions else ''
+
+    # Fixed buckets: one scan, conditional sums
+    sums = ', '.join(f"SUM(CASE WHEN {cond} THEN 1 ELSE 0 END)" for _, _, cond in FIXED_BUCKETS)
+    row = db.session.execute(text(f"SELECT COUNT(*), {sums} FROM {table_name}{where}"), params).fetchone()
+    totals = {('total', None): row[0]}
+    for (section, key, _), n in zip(FIXED_BUCKETS, row[1:]):
+        totals[(section, key)] = n or 0
+
+    # Open-ended buckets: one GROUP BY each, sent as a single statement
+    day, hotel, travel = _day_expr('created_at'), _package_expr('hotel_package'), _package_expr('travel_package')
+    groups = db.session.execute(text(
+        f"SELECT 'day', {day}, COUNT(*) FROM {table_name}{where} GROUP BY {day} "
+        f"UNION ALL SELECT 'hotel', {hotel}, COUNT(*) FROM {table_name}{where} GROUP BY {hotel} "
+        f"UNION ALL SELECT 'travel', {travel}, COUNT(*) FROM {table_name}{where} GROUP BY {travel}"
+    ), params).fetchall()
+    return totals, groups
+
+
+def fold_aggregates(data, display_name, totals, groups):
+    """Add one table's ``table_aggregates`` result into the response dict ``data``."""
+    total = totals[('total', None)]
+    data['yatra_dist'][display_name] = data['yatra_dist'].get(display_name, 0) + total
+    for (section, key), n in totals.items():
+        if section != 'total':
+            data[section][key] = data[section].get(key, 0) + n
+    data['gender']['Other'] += total - totals[('gender', 'Male')] - totals[('gender', 'Female')]
+    data['status']['Interest'] += (total - totals[('status', 'Paid')] - totals[('status', 'Pending')]
+                                   - totals[('status', 'Failed')])
+
+    targets = {'day': data['timeline'], 'hotel': data['packages']['hotel'],
+               'travel': data['packages']['travel']}
+    for kind, value, n in groups:
+        if value:
+            target = targets[kind]
+            target[value] = target.get(value, 0) + n
+    return data
+
+
+def finish_analytics(data):
+    """Add the sorted timeline series the charts read."""
+    sorted_dates = sorted(data['timeline'].keys())
+    data['chart_timeline'] = {
+        'labels': sorted_dates,
+        'values': [data['timeline'][d] for d in sorted_dates]
+    }
+    return data
+
+
+# ── Daily rollup ──
+
+ROLLUP_TABLE = 'analytics_daily_rollup'
+ROLLUP_YEAR_KEY = '_analytics_rollup_year'
+_ROLLUP_COLUMNS = 'yatra_table, day, bucket, value, registrations'
+
+
+def _case(section, default):
+    return "CASE " + " ".join(
+        f"WHEN {cond} THEN '{key}'" for sec, key, cond in FIXED_BUCKETS if sec == section
+    ) + f" ELSE {default} END"
+
+
+def _rollup_select(table_name, where, params):
+    """INSERT-able SELECT of the rollup rows for ``table_name`` rows matching ``where``.
+
+    One row per (day, bucket, value): bucket 'total' (value '') carries the
+    registration count, the others the gender / status / age / package split.
+    Rows without an age or package add nothing to those buckets.
+    """
+    params['rollup_table'] = table_name
+    day = f"COALESCE({_day_expr('created_at')}, '')"
+    dimensions = (
+        ('total', "''"),
+        ('gender', _case('gender', "'Other'")),
+        ('status', _case('status', "'Interest'")),
+        ('age', _case('age_groups', 'NULL')),
+        ('hotel', _package_expr('hotel_package')),
+        ('travel', _package_expr('travel_package')),
+    )
+    parts = ' UNION ALL '.join(
+        f"SELECT {day} AS day, '{bucket}' AS bucket, {expr} AS value, COUNT(*) AS n "
+        f"FROM {table_name}{where} GROUP BY {day}, {expr}"
+        for bucket, expr in dimensions
+    )
+    return f"SELECT :rollup_table, day, bucket, value, n FROM ({parts}) per_day WHERE value IS NOT NULL"
+
+
+def _lock_rollup(table_name):
+    """Serialise rollup maintenance for one yatra table across workers
+    (PostgreSQL; SQLite already allows a single writer)."""
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(text("SELECT pg_advisory_xact_lock(hashtext(:t))"), {'t': ROLLUP_TABLE + ':' + table_name})
+
+
+def _day_bounds(day):
+    next_day = (datetime.strptime(day, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+    return day, next_day
+
+
+def rows_days(table_name, where_sql, params):
+    """Rollup days ('' = undated) of the ``table_name`` rows matching ``where_sql``.
+
+    Call it before deleting rows and after inserting / updating them, then hand
+    the union to ``refresh_rollup``.
+    """
+    rows = db.session.execute(text(
+        f"SELECT DISTINCT COALESCE({_day_expr('created_at')}, '') FROM {table_name} WHERE {where_sql}"
+    ), params).fetchall()
+    return {row[0] for row in rows}
+
+
+def refresh_rollup(table_name, days, current_year=None):
+    """Recompute the rollup rows of ``table_name`` for ``days``.  Does not commit."""
+    days = sorted(set(days))
+    if not days:
+        return
+    _lock_rollup(table_name)
+    for day in days:
+        params = {'current_year': current_year or datetime.now().year}
+        if day:
+            params['day_start'], params['day_end'] = _day_bounds(day)
+            where = ' WHERE created_at >= :day_start AND created_at < :day_end'
+        else:
+            where = f" WHERE {_day_expr('created_at')} IS NULL"
+        db.session.execute(text(f"DELETE FROM {ROLLUP_TABLE} WHERE yatra_table = :t AND day = :d"),
+                           {'t': table_name, 'd': day})
+        db.session.execute(text(
+            f"INSERT INTO {ROLLUP_TABLE} ({_ROLLUP_COLUMNS}) {_rollup_select(table_name, where, params)}"
+        ), params)
+
+
+def rebuild_rollups(table_names, current_year=None):
+    """Recompute the whole rollup from the yatra tables and record the year it
+    was built for.  Commits."""
+    current_year = current_year or datetime.now().year
+    db.session.execute(text(f"DELETE FROM {ROLLUP_TABLE}"))
+    for table_name in table_names:
+        _lock_rollup(table_name)
+        params = {'current_year': current_year}
+        db.session.execute(text(
+            f"INSERT INTO {ROLLUP_TABLE} ({_ROLLUP_COLUMNS}) {_rollup_select(table_name, '', params)}"
+        ), params)
+    db.session.commit()
+    settings.set_setting(ROLLUP_YEAR_KEY, str(current_year))
+
+
+def ensure_rollups(table_names, current_year=None):
+    """Rebuild the rollup if it was never built or was built for another year
+    (age groups move on 1 January).  Returns True if it rebuilt."""
+    current_year = current_year or datetime.now().year
+    if settings.get_setting(ROLLUP_YEAR_KEY) == str(current_year):
+        return False
+    rebuild_rollups(table_names, current_year)
+    return True
+
+
+def rename_rollup(old_name, new_name):
+    db.session.execute(text(f"UPDATE {ROLLUP_TABLE} SET yatra_table = :new WHERE yatra_table = :old"),
+                       {'old': old_name, 'new': new_name})
+
+
+def drop_rollup(table_name):
+    db.session.execute(text(f"DELETE FROM {ROLLUP_TABLE} WHERE yatra_table = :t"), {'t': table_name})
+
+
+def rollup_analytics(data, table_names, cutoff=None, current_year=None):
+    """Fill ``data`` for ``table_names`` from the rollup.
+
+    Whole days after the cutoff come from the rollup in one statement; the
+    cutoff's own (partial) day is aggregated live, so ``created_at >= cutoff``
+    keeps its exact meaning.
+    """
+    for table_name in table_names:
+        data['yatra_dist'].setdefault(yatra_display_name(table_name), 0)
+    if not table_names:
+        return data
+
+    where = 'yatra_table IN :tables'
+    params = {'tables': list(table_names)}
+    if cutoff:
+        cutoff_day = cutoff[:10]
+        where += ' AND day > :cutoff_day'
+        params['cutoff_day'] = cutoff_day
+    stmt = text(
+        f"SELECT 'total' AS bucket, yatra_table AS tname, day AS value, SUM(registrations) AS n "
+        f"FROM {ROLLUP_TABLE} WHERE {where} AND bucket = 'total' GROUP BY yatra_table, day "
+        f"UNION ALL SELECT bucket, NULL, value, SUM(registrations) "
+        f"FROM {ROLLUP_TABLE} WHERE {where} AND bucket <> 'total' GROUP BY bucket, value"
+    ).bindparams(bindparam('tables', expanding=True))
+
+    targets = {'gender': data['gender'], 'status': data['status'], 'age': data['age_groups'],
+               'hotel': data['packages']['hotel'], 'travel': data['packages']['travel']}
+    for bucket, tname, value, n in db.session.execute(stmt, params).fetchall():
+        n = int(n)
+        if bucket == 'total':
+            display_name = yatra_display_name(tname)
+            data['yatra_dist'][display_name] = data['yatra_dist'].get(display_name, 0) + n
+            if value:
+                data['timeline'][value] = data['timeline'].get(value, 0) + n
+        else:
+            target = targets[bucket]
+            target[value] = target.get(value, 0) + n
+
+    if cutoff:
+        _, next_day = _day_bounds(cutoff_day)
+        for table_name in table_names:
+            totals, groups = table_aggregates(table_name, cutoff=cutoff, until=next_day,
+                                              current_year=current_year)
+            fold_aggregates(data, yatra_display_name(table_name), totals, groups)
+    return data
@@ -1,5 +1,29 @@
+from startup_profile import startup_timer  # first, so the imports below are timed too
 from flask import Flask, render_template, request, redirect, url_for, flash, send_file, Response, session, jsonify
-from models import db, LoginDetails, YatraDetails, AppSettings, CarouselImage
+from models import db, LoginDetails, YatraDetails, CarouselImage, PaymentOrder
+from yatra_store import (fetch_login_registrations, create_yatra_storage, rename_yatra_storage,
+                         drop_yatra_storage)
+from schema_registry import schema_registry
+from cache_utils import LRUCache, VersionStamp
+from settings_service import settings
+from session_store import init_sessions
+from payment_gateway import razorpay_gateway, PaymentsUnavailable, GatewayBusy
+from payment_events import payment_reconciler, record_event, record_order, unpaid_registration_ids
+from passenger_index import (refresh_memberships, rename_memberships, drop_memberships, synced_values,
+                             sync_passenger_rows)
+from schema_migrations import pending_migrations, run_migrations
+from admin_grid import PASSENGERS_GRID, YATRA_DETAILS_GRID, yatra_grid, fetch_page
+from exports import (PASSENGERS_EXPORT, YATRA_DETAILS_EXPORT, yatra_export, iter_rows,
+                     first_and_rest, csv_chunks, write_xlsx)
+from analytics import (empty_analytics, table_aggregates, fold_aggregates, finish_analytics,
+                       yatra_display_name, rows_days, refresh_rollup, ensure_rollups, rollup_analytics,
+                       rename_rollup, drop_rollup)
+from image_variants import variant_manifest, derivatives_root, responsive_image, VariantManifest
+from static_assets import dist_root, cdn_url, pick_encoding, ASSET_MAX_AGE
+from upload_pipeline import upload_pipeline, remove_static_files
+from catalog_index import (catalog_root, is_catalog_image, maybe_scan, scan_catalog, list_albums,
+                           get_album, album_photos, get_photo, add_photo, remove_photo,
+                           photo_version, photo_fingerprint, fingerprint_cache)
 
 import os
 import uuid
@@ -8,6 +32,7 @@ from datetime import datetime
 from dotenv import load_dotenv
 import logging
 from logging.handlers import RotatingFileHandler
+startup_timer.mark('imports')
 
 # Set up robust application logging
 log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -29,15 +54,16 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'fallback-secret-key-change-in-production')
 app.config['TEMPLATES_AUTO_RELOAD'] = True
 
-# Server-side Session Configuration
-from flask_session import Session
-app.config['SESSION_TYPE'] = 'filesystem'
+# Server-side Session Configuration (installed below, once the database URI is known)
+# 'sqlite' (own WAL-mode file), 'database' (table in the app database, e.g. Postgres) or 'filesystem'
+app.config['SESSION_BACKEND'] = os.getenv('SESSION_BACKEND', 'sqlite').strip().lower()
+app.config['SESSION_SQLITE_PATH'] = os.getenv('SESSION_SQLITE_PATH', os.path.join(app.instance_path, 'sessions.sqlite3'))
+# Seconds between sweeps of expired sessions (per worker)
+app.config['SESSION_GC_SECONDS'] = int(os.getenv('SESSION_GC_SECONDS', '300'))
 app.config['SESSION_PERMANENT'] = False
 app.config['SESSION_USE_SIGNER'] = True
 import tempfile as _tempfile
 app.config['SESSION_FILE_DIR'] = os.path.join(_tempfile.gettempdir(), 'flask_session')
-os.makedirs(app.config['SESSION_FILE_DIR'], exist_ok=True)
-Session(app)
 
 # Database Configuration
 database_url = os.getenv('DATABASE_URI', 'sqlite:///yatra.db')
@@ -46,38 +72,44 @@ if database_url.startswith("postgres://"):
 
 app.config['SQLALCHEMY_DATABASE_URI'] = database_url
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+init_sessions(app, logger=app_logger)
+# 'tables' (one table per yatra) or 'registrations' (consolidated table + compat views)
+app.config['REGISTRATION_STORAGE'] = os.getenv('REGISTRATION_STORAGE', 'tables').strip().lower()
+# How often (ms) a worker checks whether another worker changed the yatra table set
+app.config['SCHEMA_VERSION_CHECK_MS'] = int(os.getenv('SCHEMA_VERSION_CHECK_MS', '2000'))
+schema_registry.configure(app.config['SCHEMA_VERSION_CHECK_MS'])
+# Same for admin-edited app_settings (registration / payment toggles etc.)
+app.config['SETTINGS_VERSION_CHECK_MS'] = int(os.getenv('SETTINGS_VERSION_CHECK_MS', '1000'))
+settings.configure(app.config['SETTINGS_VERSION_CHECK_MS'])
+# Admin dashboard grid: rows per page by default, and the most a client may ask for
+app.config['ADMIN_GRID_PAGE_SIZE'] = int(os.getenv('ADMIN_GRID_PAGE_SIZE', '50'))
+app.config['ADMIN_GRID_MAX_PAGE_SIZE'] = int(os.getenv('ADMIN_GRID_MAX_PAGE_SIZE', '500'))
+# Excel exports larger than this (bytes) are spooled to a temp file rather than kept in memory
+app.config['XLSX_SPOOL_MAX_BYTES'] = int(os.getenv('XLSX_SPOOL_MAX_BYTES', str(8 * 1024 * 1024)))
+# How often (seconds) a worker checks static/images for added / removed catalog photos
+app.config['CATALOG_RESCAN_SECONDS'] = int(os.getenv('CATALOG_RESCAN_SECONDS', '60'))
+# Browser cache lifetime (seconds) of catalog image URLs that carry a ?v= content version
+app.config['CATALOG_IMAGE_MAX_AGE'] = int(os.getenv('CATALOG_IMAGE_MAX_AGE', str(365 * 24 * 3600)))
+# Image uploads: processing threads per worker (0 = inside the request), where raw uploads wait,
+# and after how long a job claimed by a vanished worker is retried
+app.config['UPLOAD_WORKERS'] = int(os.getenv('UPLOAD_WORKERS', '2'))
+app.config['UPLOAD_STAGING_DIR'] = os.getenv('UPLOAD_STAGING_DIR', os.path.join(app.instance_path, 'upload_staging'))
+app.config['UPLOAD_JOB_STALE_SECONDS'] = int(os.getenv('UPLOAD_JOB_STALE_SECONDS', '600'))
 
 def _is_postgres():
     """Return True if the configured database is PostgreSQL."""
     return database_url.startswith('postgresql')
 
 def _table_exists(table_name):
-    """Check if a table exists in the database (works for both SQLite and PostgreSQL)."""
-    from sqlalchemy import text as _t
-    if _is_postgres():
-        row = db.session.execute(
-            _t("SELECT tablename FROM pg_catalog.pg_tables WHERE schemaname='public' AND tablename=:n"),
-            {'n': table_name}
-        ).fetchone()
-    else:
-        row = db.session.execute(
-            _t("SELECT name FROM sqlite_master WHERE type='table' AND name=:n"),
-            {'n': table_name}
-        ).fetchone()
-    return row is not None
+    """Check if a dynamic yatra table exists (works for both SQLite and PostgreSQL).
+    Compatibility views of the consolidated registrations storage count as tables.
+    Served from the cached schema registry - no catalog query per call."""
+    return schema_registry.has_table(table_name)
 
 def _get_all_yatra_table_names():
-    """Return a list of all dynamic yatra table names (works for both SQLite and PostgreSQL)."""
-    from sqlalchemy import text as _t
-    if _is_postgres():
-        rows = db.session.execute(
-            _t("SELECT tablename FROM pg_catalog.pg_tables WHERE schemaname='public' AND tablename LIKE 'yatra_%' AND tablename != 'yatra_details'")
-        ).fetchall()
-    else:
-        rows = db.session.execute(
-            _t("SELECT name FROM sqlite_master WHERE type='table' AND name LIKE 'yatra_%' AND name != 'yatra_details'")
-        ).fetchall()
-    return [row[0] for row in rows]
+    """Return a list of all dynamic yatra table names (works for both SQLite and PostgreSQL).
+    Includes the compatibility views of the consolidated registrations storage."""
+    return schema_registry.table_names()
 
 
 
@@ -86,6 +118,34 @@ RAZORPAY_KEY_ID = os.getenv('RAZORPAY_API_KEY', '')
 RAZORPAY_KEY_SECRET = os.getenv('RAZORPAY_API_SECRET', '')
 if not RAZORPAY_KEY_ID or not RAZORPAY_KEY_SECRET:
     print("⚠️ WARNING: RAZORPAY_API_KEY / RAZORPAY_API_SECRET not set. Payment integration will not work.")
+app.config['RAZORPAY_KEY_ID'] = RAZORPAY_KEY_ID
+app.config['RAZORPAY_KEY_SECRET'] = RAZORPAY_KEY_SECRET
+# Razorpay API calls: base URL (a local razorpay_stub.py in development), timeouts in seconds,
+# retries of transient failures, keep-alive connections kept per worker and the seconds one may sit
+# idle (below Razorpay's keep-alive timeout), and the circuit breaker (consecutive failures that open
+# it, seconds before a trial call)
+app.config['RAZORPAY_API_BASE'] = os.getenv('RAZORPAY_API_BASE', 'https://api.razorpay.com/v1')
+app.config['RAZORPAY_CONNECT_TIMEOUT'] = float(os.getenv('RAZORPAY_CONNECT_TIMEOUT', '3'))
+app.config['RAZORPAY_READ_TIMEOUT'] = float(os.getenv('RAZORPAY_READ_TIMEOUT', '10'))
+app.config['RAZORPAY_RETRIES'] = int(os.getenv('RAZORPAY_RETRIES', '2'))
+app.config['RAZORPAY_POOL_SIZE'] = int(os.getenv('RAZORPAY_POOL_SIZE', '10'))
+app.config['RAZORPAY_POOL_MAX_IDLE'] = float(os.getenv('RAZORPAY_POOL_MAX_IDLE', '20'))
+app.config['RAZORPAY_BREAKER_FAILURES'] = int(os.getenv('RAZORPAY_BREAKER_FAILURES', '5'))
+app.config['RAZORPAY_BREAKER_RESET_SECONDS'] = float(os.getenv('RAZORPAY_BREAKER_RESET_SECONDS', '30'))
+# Razorpay calls run on a per-worker pool: threads (0 calls inline), calls allowed to be queued or
+# running before new ones are refused with a retry hint - keep it well below the worker's request
+# threads, each pending call holds one - and seconds a request waits for its answer
+app.config['RAZORPAY_EXECUTOR_WORKERS'] = int(os.getenv('RAZORPAY_EXECUTOR_WORKERS', '2'))
+app.config['RAZORPAY_MAX_PENDING'] = int(os.getenv('RAZORPAY_MAX_PENDING', '4'))
+app.config['RAZORPAY_CALL_DEADLINE'] = float(os.getenv('RAZORPAY_CALL_DEADLINE', '8'))
+# Webhooks: the secret set on the Razorpay dashboard, and the reconciler that applies stored
+# events - batch size, seconds between sweeps (0 applies them inside the webhook request) and
+# seconds before an event claimed by a crashed worker is claimed again
+app.config['RAZORPAY_WEBHOOK_SECRET'] = os.getenv('RAZORPAY_WEBHOOK_SECRET', '')
+app.config['PAYMENT_RECONCILE_BATCH'] = int(os.getenv('PAYMENT_RECONCILE_BATCH', '200'))
+app.config['PAYMENT_RECONCILE_INTERVAL'] = float(os.getenv('PAYMENT_RECONCILE_INTERVAL', '30'))
+app.config['PAYMENT_RECONCILE_STALE_SECONDS'] = int(os.getenv('PAYMENT_RECONCILE_STALE_SECONDS', '600'))
+razorpay_gateway.init_app(app, logger=app_logger)
 
 # Admin credentials
 ADMIN_USERNAME = os.getenv('ADMIN_USERNAME', 'admin')
@@ -93,48 +153,24 @@ ADMIN_PASSWORD = os.getenv('ADMIN_PASSWORD', 'changeme')
 if ADMIN_PASSWORD == 'changeme':
     print("⚠️ WARNING: Please change the default admin password in .env file!")
 
+startup_timer.mark('config, logging, sessions')
+
 db.init_app(app)
 
-# Create database tables if they don't exist
+# Schema: migrations run from migrate.py on deploy (schema_migrations.py).  Startup only compares
+# versions; with SCHEMA_AUTO_MIGRATE the first worker to see pending ones applies them under a lock.
+app.config['SCHEMA_AUTO_MIGRATE'] = os.getenv('SCHEMA_AUTO_MIGRATE', 'true').lower() == 'true'
 with app.app_context():
-    try:
-        db.create_all()
-        print("✅ Database tables created successfully!")
-    except Exception as e:
-        print(f"⚠️ WARNING: Database table creation failed: {e}")
-    
-    # Migration: add is_active column
-    try:
-        from sqlalchemy import text as _text
-        db.session.execute(_text("ALTER TABLE yatra_details ADD COLUMN is_active BOOLEAN DEFAULT TRUE"))
-        db.session.commit()
-    except Exception:
-        db.session.rollback()
-
-    # Migration: add about_image column
-    try:
-        from sqlalchemy import text as _text
-        db.session.execute(_text("ALTER TABLE yatra_details ADD COLUMN about_image VARCHAR(255)"))
-        db.session.commit()
-    except Exception:
-        db.session.rollback()
-
-    # Migration: add yatra_message and yatra_link columns
-    try:
-        from sqlalchemy import text as _text
-        db.session.execute(_text("ALTER TABLE yatra_details ADD COLUMN yatra_message TEXT"))
-        db.session.execute(_text("ALTER TABLE yatra_details ADD COLUMN yatra_link VARCHAR(500)"))
-        db.session.commit()
-    except Exception:
-        db.session.rollback()
-
-    # Migration: add sort_order column to carousel_images
-    try:
-        from sqlalchemy import text as _text
-        db.session.execute(_text("ALTER TABLE carousel_images ADD COLUMN sort_order INTEGER DEFAULT 0"))
-        db.session.commit()
-    except Exception:
-        db.session.rollback()
+    _pending = pending_migrations()
+    if _pending and app.config['SCHEMA_AUTO_MIGRATE']:
+        try:
+            run_migrations()
+            print("✅ Database schema migrated!")
+        except Exception as e:
+            print(f"⚠️ WARNING: Database migration failed (run migrate.py): {e}")
+    elif _pending:
+        print(f"⚠️ WARNING: {len(_pending)} database migration(s) pending - run migrate.py")
+startup_timer.mark('database, schema check')
 
 
 # Authentication decorator
@@ -198,18 +234,13 @@ def index():
     carousel_images = CarouselImage.query.order_by(CarouselImage.sort_order.asc(), CarouselImage.created_at.desc()).all()
     
     youtube_links = []
-    setting = AppSettings.query.filter_by(key='recent_yatra_youtube_list').first()
-    if setting and setting.value:
-        import json
-        try:
-            youtube_links = json.loads(setting.value)
-        except Exception:
-            pass
+    if settings.get_setting('recent_yatra_youtube_list'):
+        youtube_links = settings.get_json('recent_yatra_youtube_list', [])
     else:
         # Fallback to legacy single link
-        old_setting = AppSettings.query.filter_by(key='recent_yatra_youtube').first()
-        if old_setting and old_setting.value:
-            youtube_links.append(old_setting.value)
+        old_link = settings.get_setting('recent_yatra_youtube')
+        if old_link:
+            youtube_links.append(old_link)
         else:
             youtube_links.append("https://www.youtube.com/embed/zTeCw1twHRY")
     
@@ -228,123 +259,241 @@ def index():
     return render_template('index.html', carousel_images=carousel_images, youtube_links=processed_links)
 
 
+# Resized photo variants built offline by build_image_variants.py
+variant_manifest.configure(derivatives_root(app.root_path))
+
+@app.template_global('responsive_image')
+def responsive_image_tag(key, src=None, alt='', sizes='100vw', **attrs):
+    """<picture> with srcset for static/images/<key>; a plain <img> until its variants are built"""
+    return responsive_image(key, src or url_for('static', filename=f'images/{key}'), alt, sizes,
+                            variant_url=lambda f: url_for('static', filename=f'derivatives/{f}'), **attrs)
+
+# Fingerprinted static assets (build_assets.py); same reload-on-change manifest as the image variants
+asset_manifest = VariantManifest()
+asset_manifest.configure(dist_root(app.root_path))
+
+@app.template_global('asset_url')
+def asset_url(filename):
+    """URL of a CSS / JS / JSON asset under static/: the fingerprinted copy once built, else the file
+    itself - or, for a vendored library not downloaded yet, its pinned CDN URL"""
+    hashed = asset_manifest.get(filename)
+    if hashed:
+        return url_for('serve_asset', filename=hashed)
+    cdn = cdn_url(filename)
+    if cdn and not os.path.exists(os.path.join(app.static_folder, filename)):
+        return cdn
+    return url_for('static', filename=filename)
+
+@app.route('/assets/<path:filename>')
+def serve_asset(filename):
+    """Serve a fingerprinted asset from static/dist, precompressed when the client accepts it"""
+    import mimetypes
+    from flask import abort
+    from werkzeug.security import safe_join
+
+    path = safe_join(dist_root(app.root_path), filename)
+    if not path or not os.path.isfile(path):
+        abort(404)
+    served, encoding = pick_encoding(path, request.headers.get('Accept-Encoding'))
+    # The name changes with the content, so the response never needs revalidating
+    rv = send_file(served, mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                   max_age=ASSET_MAX_AGE, conditional=True)
+    rv.cache_control.immutable = True
+    rv.vary.add('Accept-Encoding')
+    if encoding:
+        rv.headers['Content-Encoding'] = encoding
+    return rv
+
 @app.route('/catalog')
 def catalog():
     """Display Yatra memories catalog page with folder counts"""
-    import os
-    
-    # Photos live in static/images/<FolderName>
-    images_base = os.path.join(os.path.dirname(__file__), 'static', 'images')
-    
-    def get_folder_info(folder_name):
-        folder_path = os.path.join(images_base, folder_name)
-        if os.path.exists(folder_path):
-            files = sorted([f for f in os.listdir(folder_path)
-                            if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp'))])
-            count = len(files)
-            thumbnail = files[0] if files else None
-            return count, thumbnail
-        return 0, None
-    
-    vrindavan_count, vrindavan_thumb = get_folder_info('Vrindavan')
-    banaras_count, banaras_thumb     = get_folder_info('Banaras')
-    jagannath_puri_count, jagannath_puri_thumb = get_folder_info('Jagannath Puri')
-    
-    return render_template('catalog.html',
-                           vrindavan_count=vrindavan_count,
-                           banaras_count=banaras_count,
-                           jagannath_puri_count=jagannath_puri_count,
-                           vrindavan_thumb=vrindavan_thumb,
-                           banaras_thumb=banaras_thumb,
-                           jagannath_puri_thumb=jagannath_puri_thumb)
+    # Albums come from the catalog index (static/images/<Folder>), refreshed at most once per interval
+    maybe_scan(catalog_root(app.root_path), app.config['CATALOG_RESCAN_SECONDS'], app_logger)
+    return render_template('catalog.html', albums=list_albums())
 
 @app.route('/catalog/<folder_name>')
 def view_catalog_folder(folder_name):
     """View photos in a specific catalog folder"""
-    import os
-    
-    # Security: Only allow specific folder names
-    allowed_folders = ['Vrindavan', 'Banaras', 'Jagannath Puri']
-    if folder_name not in allowed_folders:
+    maybe_scan(catalog_root(app.root_path), app.config['CATALOG_RESCAN_SECONDS'], app_logger)
+
+    # Security: only indexed albums are served
+    album = get_album(folder_name)
+    if not album:
         flash('Invalid folder name', 'error')
         return redirect(url_for('catalog'))
-    
-    # Photos live in static/images/<folder_name>
-    folder_path = os.path.join(os.path.dirname(__file__), 'static', 'images', folder_name)
-    
-    photos = []
-    if os.path.exists(folder_path):
-        photos = sorted([f for f in os.listdir(folder_path)
-                         if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp'))])
-    
+
     return render_template('catalog_folder.html',
                            folder_name=folder_name,
-                           photos=photos)
+                           photos=album_photos(album))
+
+@app.template_global('catalog_image_url')
+def catalog_image_url(folder_name, filename, content_hash=None):
+    """URL of a catalog photo; with its content hash the URL is versioned and cached for good"""
+    return url_for('serve_catalog_image', folder_name=folder_name, filename=filename,
+                   v=photo_version(content_hash))
 
 @app.route('/catalog/<folder_name>/<filename>')
 def serve_catalog_image(folder_name, filename):
-    """Serve images from static/images/<folder_name>"""
-    import os
-    from flask import send_from_directory
-    
-    # Security: Only allow specific folder names
-    allowed_folders = ['Vrindavan', 'Banaras', 'Jagannath Puri']
-    if folder_name not in allowed_folders:
+    """Serve images from static/images/<folder_name> with ETag / Range support"""
+    import stat
+    from datetime import timezone
+    from flask import abort
+    from werkzeug.http import is_resource_modified
+    from werkzeug.security import safe_join
+
+    path = safe_join(catalog_root(app.root_path), folder_name, filename)
+    try:
+        st = os.stat(path) if path else None
+    except OSError:
+        st = None
+
+    # Files served before are known by path + size + mtime; anything else goes through the index
+    content_hash = fingerprint_cache.get(path, st) if st else None
+    if content_hash is None:
+        # Security: only indexed albums are served
+        album = get_album(folder_name)
+        if not album:
+            flash('Invalid folder name', 'error')
+            return redirect(url_for('catalog'))
+        if st is None or not stat.S_ISREG(st.st_mode) or not is_catalog_image(filename):
+            abort(404)
+        content_hash = photo_fingerprint(album, filename, path, st)
+        fingerprint_cache.put(path, st, content_hash)
+
+    # ?v= matching the content: the URL changes with the photo, so it never needs revalidating
+    versioned = request.args.get('v') == photo_version(content_hash)
+    max_age = app.config['CATALOG_IMAGE_MAX_AGE'] if versioned else 0
+    last_modified = datetime.fromtimestamp(int(st.st_mtime), timezone.utc)
+
+    if not is_resource_modified(request.environ, etag=content_hash, last_modified=last_modified):
+        rv = app.response_class(status=304)
+        rv.set_etag(content_hash)
+        rv.last_modified = last_modified
+        if max_age:
+            rv.cache_control.public = True
+            rv.cache_control.max_age = max_age
+        else:
+            rv.cache_control.no_cache = True
+    else:
+        rv = send_file(path, etag=content_hash, last_modified=last_modified,
+                       max_age=max_age, conditional=True)
+    if versioned:
+        rv.cache_control.immutable = True
+    return rv
+
+@app.route('/admin/catalog')
+@login_required
+def admin_catalog():
+    """Admin: Manage the photos of each catalog album"""
+    try:
+        scan_catalog(catalog_root(app.root_path))
+    except Exception as e:
+        db.session.rollback()
+        app_logger.error(f"Catalog scan failed: {e}")
+    folders_data = {album.folder: album_photos(album) for album in list_albums()}
+    return render_template('admin_catalog.html', folders_data=folders_data)
+
+@app.route('/admin/catalog/upload', methods=['POST'])
+@login_required
+def admin_catalog_upload():
+    """Admin: Upload photo(s) into a catalog album"""
+    from werkzeug.utils import secure_filename
+
+    album = get_album(request.form.get('folder_name', ''))
+    if not album:
         flash('Invalid folder name', 'error')
-        return redirect(url_for('catalog'))
-    
-    images_path = os.path.join(os.path.dirname(__file__), 'static', 'images', folder_name)
-    return send_from_directory(images_path, filename)
+        return redirect(url_for('admin_catalog'))
+
+    files = request.files.getlist('photos')
+    if not files or all(f.filename == '' for f in files):
+        flash('No files selected.', 'error')
+        return redirect(url_for('admin_catalog'))
+
+    folder_path = os.path.join(catalog_root(app.root_path), album.folder)
+    uploaded = 0
+    try:
+        for f in files:
+            if not f or not f.filename or not is_catalog_image(f.filename):
+                continue
+            filename = secure_filename(f.filename)
+            if not filename:
+                continue
+            if os.path.exists(os.path.join(folder_path, filename)):
+                base, extension = os.path.splitext(filename)
+                filename = f"{base}_{uuid.uuid4().hex[:8]}{extension}"
+            f.save(os.path.join(folder_path, filename))
+            add_photo(album, folder_path, filename)
+            uploaded += 1
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        app_logger.error(f"Catalog upload to {album.folder} failed: {e}")
+        flash(f'Error uploading photos: {str(e)}', 'error')
+        return redirect(url_for('admin_catalog'))
+
+    if uploaded:
+        flash(f'✅ Uploaded {uploaded} photo(s) to {album.folder}.', 'success')
+    else:
+        flash('No supported image files were selected.', 'warning')
+    return redirect(url_for('admin_catalog'))
+
+@app.route('/admin/catalog/delete', methods=['POST'])
+@login_required
+def admin_catalog_delete():
+    """Admin: Delete a photo from a catalog album"""
+    data = request.get_json(silent=True) or {}
+    album = get_album(data.get('folder_name', ''))
+    # Only files the index knows about can be deleted - no paths from the client
+    photo = get_photo(album, data.get('filename', '')) if album else None
+    if not photo:
+        return jsonify({'success': False, 'message': 'Photo not found.'})
+
+    filename = photo.filename
+    try:
+        path = os.path.join(catalog_root(app.root_path), album.folder, filename)
+        if os.path.exists(path):
+            os.remove(path)
+        remove_photo(album, photo)
+        db.session.commit()
+        return jsonify({'success': True, 'message': f'Deleted {filename}.'})
+    except Exception as e:
+        db.session.rollback()
+        app_logger.error(f"Catalog delete failed: {e}")
+        return jsonify({'success': False, 'message': str(e)})
 
 @app.route('/admin/carousel')
 @login_required
 def admin_carousel():
     """Admin: Manage homepage carousel photos"""
     images = CarouselImage.query.order_by(CarouselImage.sort_order.asc(), CarouselImage.created_at.desc()).all()
-    return render_template('admin_carousel.html', images=images)
+    return render_template('admin_carousel.html', images=images,
+                           processing_count=upload_pipeline.pending_count('carousel'))
 
 @app.route('/admin/carousel/upload', methods=['POST'])
 @login_required
 def admin_carousel_upload():
     """Admin: Upload photo(s) to carousel"""
-    import os
-    import uuid
-    from werkzeug.utils import secure_filename
-
-    ALLOWED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp'}
     files = request.files.getlist('photos')
 
     if not files or all(f.filename == '' for f in files):
         flash('No files selected.', 'error')
         return redirect(url_for('admin_carousel'))
 
-    upload_folder = os.path.join(app.root_path, 'static', 'uploads', 'carousel')
-    os.makedirs(upload_folder, exist_ok=True)
-
     # Find the current max sort_order
     max_order_img = CarouselImage.query.order_by(CarouselImage.sort_order.desc()).first()
     current_max_order = max_order_img.sort_order if max_order_img else 0
 
+    # Staged here; the upload pipeline adds the CarouselImage rows once resized
     uploaded = 0
     for f in files:
-        if f and f.filename:
-            ext = os.path.splitext(f.filename)[1].lower()
-            if ext not in ALLOWED_EXTENSIONS:
-                continue
-            filename = secure_filename(f.filename)
-            base, extension = os.path.splitext(filename)
-            unique_filename = f"{base}_{uuid.uuid4().hex[:8]}{extension}"
-            save_path = os.path.join(upload_folder, unique_filename)
-            f.save(save_path)
-            
+        if upload_pipeline.stage(f, 'carousel', payload={'sort_order': current_max_order + 1}):
             current_max_order += 1
-            new_image = CarouselImage(image_path=f"uploads/carousel/{unique_filename}", sort_order=current_max_order)
-            db.session.add(new_image)
             uploaded += 1
 
     if uploaded > 0:
         db.session.commit()
-        flash(f'✅ Successfully uploaded {uploaded} carousel image(s).', 'success')
+        upload_pipeline.kick()
+        flash(f'✅ Uploaded {uploaded} carousel image(s). They appear here once processed.', 'success')
     return redirect(url_for('admin_carousel'))
 
 @app.route('/admin/carousel/reorder', methods=['POST'])
@@ -479,10 +628,11 @@ def admin_carousel_delete():
         return jsonify({'success': False, 'message': 'Image not found.'})
 
     try:
-        if img.image_path:
-            full_path = os.path.join(app.root_path, 'static', img.image_path)
-            if os.path.exists(full_path):
-                os.remove(full_path)
+        for path in (img.image_path, img.thumb_path):
+            if path:
+                full_path = os.path.join(app.root_path, 'static', path)
+                if os.path.exists(full_path):
+                    os.remove(full_path)
         
         db.session.delete(img)
         db.session.commit()
@@ -518,14 +668,11 @@ def normalize_phone(phone_str):
 @app.route('/verify-phone', methods=['GET'])
 def verify_phone():
     """Show the mobile OTP verification page"""
-    reg_setting = AppSettings.query.filter_by(key='registration_enabled').first()
-    is_enabled = reg_setting.value != 'false' if reg_setting else True
+    is_enabled = settings.is_registration_enabled()
 
     if not is_enabled:
-        title_setting = AppSettings.query.filter_by(key='registration_closed_title').first()
-        desc_setting = AppSettings.query.filter_by(key='registration_closed_description').first()
-        title = title_setting.value if title_setting else "Registration is now Closed"
-        description = desc_setting.value if desc_setting else "Thank you for your interest! We have reached our maximum capacity for this Yatra and registrations are currently closed. Please check back later for any updates or cancellations."
+        title = settings.get_setting('registration_closed_title', "Registration is now Closed")
+        description = settings.get_setting('registration_closed_description', "Thank you for your interest! We have reached our maximum capacity for this Yatra and registrations are currently closed. Please check back later for any updates or cancellations.")
         return render_template('registration_closed.html', title=title, description=description)
 
     # If already verified in this session, skip to register
@@ -542,9 +689,8 @@ def verify_email():
 @app.route('/send-otp', methods=['POST'])
 def send_otp():
     """Bypassed OTP verification - immediately verify and redirect to dashboard"""
-    # Check registration_enabled from AppSettings
-    reg_setting = AppSettings.query.filter_by(key='registration_enabled').first()
-    is_enabled = reg_setting.value != 'false' if reg_setting else True
+    # Check registration_enabled (cached by settings_service)
+    is_enabled = settings.is_registration_enabled()
     
     data = request.get_json()
     phone_raw = (data or {}).get('phone', '').strip()
@@ -579,61 +725,157 @@ def send_otp():
 
 # ===== DASHBOARD ROUTES =====
 
-@app.route('/dashboard')
-@phone_required
-def dashboard():
-    """Dashboard showing passengers from UNION of login_details + yatra tables"""
-        
-    verified_phone = session.get('verified_phone')
-    from sqlalchemy import text as _txt
+# Per-login cache of the DB-derived dashboard model.  Entries are tagged with the
+# login's revision in dashboard_revisions (bumped by writes for that login, from any
+# session or device, and read on every dashboard view) and a global stamp bumped by
+# admin edits (seen by other workers within SCHEMA_VERSION_CHECK_MS).  A passenger
+# never gets a dashboard from before their own write back from another worker.
+dashboard_cache = LRUCache(maxsize=int(os.getenv('DASHBOARD_CACHE_SIZE', '2048')),
+                           ttl=int(os.getenv('DASHBOARD_CACHE_TTL', '60')))
+dashboard_stamp = VersionStamp('_dashboard_version', app.config['SCHEMA_VERSION_CHECK_MS'])
+
+
+def invalidate_dashboard(login_id=None):
+    """Drop the cached dashboard after a passenger-side write for ``login_id``
+    (defaults to the current verified phone)."""
+    from sqlalchemy import text
+    login_id = login_id or session.get('verified_phone')
+    if not login_id:
+        return
+    dashboard_cache.pop(login_id)
+    try:
+        db.session.execute(text("""
+            INSERT INTO dashboard_revisions (login_id, rev) VALUES (:lid, :rev)
+            ON CONFLICT (login_id) DO UPDATE SET rev = excluded.rev
+        """), {'lid': login_id, 'rev': uuid.uuid4().hex})
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        app_logger.error(f"Dashboard revision bump failed for {login_id}: {e}")
+
+
+def _dashboard_revision(login_id):
+    from sqlalchemy import text
+    row = db.session.execute(text("SELECT rev FROM dashboard_revisions WHERE login_id = :lid"),
+                             {'lid': login_id}).fetchone()
+    return row[0] if row else '0'
+
+
+def invalidate_all_dashboards():
+    """Drop every cached dashboard, in all workers (admin-side writes)."""
+    dashboard_cache.clear()
+    dashboard_stamp.bump()
+
+
+def _upload_processed(job):
+    """upload_pipeline hook: dashboards show traveler photos and yatra images"""
+    if job.kind in ('passenger', 'yatra_about'):
+        invalidate_all_dashboards()
+
+
+startup_timer.mark('routes (part 1)')
+upload_pipeline.init_app(app, on_processed=_upload_processed, logger=app_logger)
+
+
+def start_worker_services():
+    """Per-process startup work that may start threads.  Runs at import, unless gunicorn
+    preloads the app in its master (gunicorn.conf.py sets WORKER_SERVICES_DEFERRED and calls
+    this in each worker after the fork): threads do not survive a fork."""
+    with app.app_context():
+        upload_pipeline.resume()
+    # Sweeps the webhook inbox every PAYMENT_RECONCILE_INTERVAL, also for events a crashed worker left
+    payment_reconciler.start()
+
+
+def refresh_analytics(table_name, days):
+    """Recompute the analytics rollup for ``days`` of ``table_name`` after a committed
+    write (see analytics.rows_days).  Failures are logged, not raised - the write
+    itself already succeeded, and rebuild_analytics.py repairs any drift."""
+    if not days:
+        return
+    try:
+        refresh_rollup(table_name, days)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        app_logger.error(f"Analytics rollup refresh failed for {table_name} {sorted(days)}: {e}")
+
+
+def _payments_applied(touched):
+    """payment_reconciler hook: ``touched`` maps yatra tables to the days whose rows changed"""
+    for table_name, days in touched.items():
+        refresh_analytics(table_name, days)
+    invalidate_all_dashboards()
+
+
+def _payment_table(yatra):
+    tname = sanitize_table_name(yatra.title)
+    return tname if _table_exists(tname) else None
+
+
+payment_reconciler.init_app(app, resolve_table=_payment_table, on_applied=_payments_applied, logger=app_logger)
+
+if os.getenv('WORKER_SERVICES_DEFERRED') != '1':
+    start_worker_services()
+startup_timer.mark('worker services')
+
+
+def _snapshot(obj, **extra):
+    """Detached, read-only copy of a model instance for caching across requests."""
+    from types import SimpleNamespace
+    data = {c.name: getattr(obj, c.name) for c in obj.__table__.columns}
+    data.update(extra)
+    return SimpleNamespace(**data)
+
+
+def _build_dashboard_model(verified_phone):
+    """Assemble passengers, virtual passengers and DB saved packages for one login."""
     from types import SimpleNamespace
     from datetime import datetime
     current_year = datetime.now().year
 
-    # ── 1. Passengers from login_details ──
-    active_passengers = LoginDetails.query.filter_by(login_id=verified_phone).all()
-    deleted_passengers = LoginDetails.query.filter_by(login_id=f"#del#{verified_phone}").all()
+    # ── 1. Passengers from login_details (active + soft-deleted in one query) ──
+    own_passengers = LoginDetails.query.filter(
+        LoginDetails.login_id.in_([verified_phone, f"#del#{verified_phone}"])
+    ).order_by(LoginDetails.id).all()
+    active_passengers = [p for p in own_passengers if p.login_id == verified_phone]
+    deleted_passengers = [p for p in own_passengers if p.login_id != verified_phone]
     # deleted_by_id mapping for quick lookup
     deleted_by_id = {p.id: p for p in deleted_passengers}
 
     active_names = set(p.name for p in active_passengers)
     deleted_names = set(p.name for p in deleted_passengers)
 
-    # Active yatras for the dropdown
-    yatras = YatraDetails.query.filter_by(is_active=True).all()
     # ALL yatras for passenger lookup (including inactive)
     all_yatras = YatraDetails.query.all()
-    selected_yatra_id = session.get('selected_yatra_id', '')
+    # Active yatras for the dropdown
+    yatras = [y for y in all_yatras if y.is_active]
+
+    # ── 2. Fetch this login's rows from ALL yatra tables in a single statement ──
+    existing_tables = set(_get_all_yatra_table_names())
+    yatras_by_table = {}
+    for yatra in all_yatras:
+        tname = sanitize_table_name(yatra.title)
+        if tname in existing_tables:
+            yatras_by_table.setdefault(tname, []).append(yatra)
+    registration_rows = fetch_login_registrations(verified_phone, yatras_by_table.keys())
 
-    # ── 2. Collect passenger keys from ALL yatra tables ──
     # Map passenger_id to boolean (true if exists in any yatra table)
     # Also store name lookup for virtual accounts
     ids_in_yatras = set()
     names_in_yatras = {} # name -> data for virtuals
-    
-    for yatra in all_yatras:
-        tname = sanitize_table_name(yatra.title)
-        try:
-            if not _table_exists(tname):
-                continue
-            # Select relevant fields + passenger_id
-            rows = db.session.execute(
-                _txt(f"SELECT name, year_of_birth, email, phone, gender, city, district, state, passenger_id FROM {tname} WHERE login_id=:lid"),
-                {'lid': verified_phone}
-            ).fetchall()
-            for row in rows:
-                rname = row[0]
-                pid = row[8]
-                if pid:
-                    ids_in_yatras.add(pid)
-                if rname not in names_in_yatras:
-                    names_in_yatras[rname] = {
-                        'name': rname, 'year_of_birth': row[1], 'email': row[2] or '',
-                        'phone': row[3] or '', 'gender': row[4] or '',
-                        'city': row[5] or '', 'district': row[6] or '', 'state': row[7] or '',
-                    }
-        except Exception:
-            pass
+
+    for row in registration_rows:
+        rname = row['name']
+        pid = row['passenger_id']
+        if pid:
+            ids_in_yatras.add(pid)
+        if rname not in names_in_yatras:
+            names_in_yatras[rname] = {
+                'name': rname, 'year_of_birth': row['year_of_birth'], 'email': row['email'] or '',
+                'phone': row['phone'] or '', 'gender': row['gender'] or '',
+                'city': row['city'] or '', 'district': row['district'] or '', 'state': row['state'] or '',
+            }
 
     # ── 3. Build combined passenger list (UNION) ──
     passengers = []
@@ -674,35 +916,68 @@ def dashboard():
         passengers.append(virtual)
 
     # ── 4. Build saved_packages from active yatra tables ──
+    # Match explicitly by passenger_id (new way) or fallback to name (legacy);
+    # the first passenger in list order wins, as before.
+    passengers_by_id = {}
+    passengers_by_name = {}
+    for p in passengers:
+        passengers_by_id.setdefault(p.id, p)
+        passengers_by_name.setdefault(p.name, p)
+
     saved_packages = {}
-    for yatra in yatras:
-        tname = sanitize_table_name(yatra.title)
-        try:
-            if not _table_exists(tname):
+    for row in registration_rows:
+        db_pid = row['passenger_id']
+        if db_pid is not None:
+            p = passengers_by_id.get(db_pid)
+        else:
+            p = passengers_by_name.get(row['name'])
+        if p is None:
+            continue
+        for yatra in yatras_by_table[row['table_name']]:
+            if not yatra.is_active:
                 continue
-            rows = db.session.execute(
-                _txt(f"SELECT name, hotel_package, travel_package, start_date, end_date, status, razorpay_id, passenger_id FROM {tname} WHERE login_id=:lid"),
-                {'lid': verified_phone}
-            ).fetchall()
-            for row in rows:
-                db_name, hotel_pkg, travel_pkg, s_date, e_date, status, razorpay_id, db_pid = row
-                for p in passengers:
-                    # Match explicitly by passenger_id (new way) or fallback to name (legacy)
-                    if (db_pid is not None and p.id == db_pid) or (db_pid is None and p.name == db_name):
-                        key = f"{yatra.id}:{p.id}"
-                        saved_packages[key] = {
-                            'yatra_id': yatra.id,
-                            'passenger_id': p.id,
-                            'hotel_package': hotel_pkg or '',
-                            'travel_package': travel_pkg or '',
-                            'start_date': s_date or '',
-                            'end_date': e_date or '',
-                            'status': status or 'Interest',
-                            'razorpay_id': razorpay_id or '',
-                        }
-                        break
-        except Exception as e:
-            print(f"[WARNING] Could not read saved packages from {tname}: {e}")
+            key = f"{yatra.id}:{p.id}"
+            saved_packages[key] = {
+                'yatra_id': yatra.id,
+                'passenger_id': p.id,
+                'hotel_package': row['hotel_package'] or '',
+                'travel_package': row['travel_package'] or '',
+                'start_date': row['start_date'] or '',
+                'end_date': row['end_date'] or '',
+                'status': row['status'] or 'Interest',
+                'razorpay_id': row['razorpay_id'] or '',
+            }
+
+    return {
+        'passengers': [p if isinstance(p, SimpleNamespace)
+                       else _snapshot(p, _soft_deleted=p._soft_deleted, age=p.age) for p in passengers],
+        'yatras': [_snapshot(y) for y in yatras],
+        'soft_deleted_ids': soft_deleted_ids,
+        'saved_packages': saved_packages,
+        'current_year': current_year,
+    }
+
+
+@app.route('/dashboard')
+@phone_required
+def dashboard():
+    """Dashboard showing passengers from UNION of login_details + yatra tables"""
+        
+    verified_phone = session.get('verified_phone')
+    selected_yatra_id = session.get('selected_yatra_id', '')
+
+    cache_tag = (_dashboard_revision(verified_phone), dashboard_stamp.current())
+    model = dashboard_cache.get(verified_phone, tag=cache_tag)
+    if model is None:
+        model = _build_dashboard_model(verified_phone)
+        dashboard_cache.set(verified_phone, model, tag=cache_tag)
+
+    passengers = model['passengers']
+    yatras = model['yatras']
+    soft_deleted_ids = model['soft_deleted_ids']
+    current_year = model['current_year']
+    # Copy: the session overrides below must not leak into the cached model
+    saved_packages = {k: dict(v) for k, v in model['saved_packages'].items()}
 
     # Session data overrides DB but preserves DB fields like razorpay_id
     for reg in session.get('yatra_registrations', []):
@@ -739,8 +1014,7 @@ def dashboard():
             pass
 
     # ── 6. Load accept_payment_mode setting ──
-    apm_setting = AppSettings.query.filter_by(key='accept_payment_mode').first()
-    accept_payment_mode = apm_setting.value == 'true' if apm_setting else False
+    accept_payment_mode = settings.accept_payment_mode()
 
     return render_template('dashboard.html',
         passengers=passengers,
@@ -821,9 +1095,12 @@ def save_passenger_package():
                 existing_status = old_row[0] if old_row else 'Interest'
                 existing_rzp = old_row[1] if old_row else None
 
+                match_sql = "passenger_id=:pid OR (passenger_id IS NULL AND login_id=:lid AND name=:nm)"
+                match_params = {'pid': p_id, 'lid': session.get('verified_phone'), 'nm': passenger.name}
+                touched_days = rows_days(tname, match_sql, match_params)
+
                 # Delete old entry for this passenger in this yatra table
-                db.session.execute(text(f"DELETE FROM {tname} WHERE passenger_id=:pid OR (passenger_id IS NULL AND login_id=:lid AND name=:nm)"),
-                                   {'pid': p_id, 'lid': session.get('verified_phone'), 'nm': passenger.name})
+                db.session.execute(text(f"DELETE FROM {tname} WHERE {match_sql}"), match_params)
                 # Insert fresh
                 db.session.execute(text(f"""
                     INSERT INTO {tname} (login_id, passenger_id, name, year_of_birth, email, phone, gender, city, district, state,
@@ -848,11 +1125,15 @@ def save_passenger_package():
                     'status': existing_status,
                     'rzp': existing_rzp,
                 })
+                touched_days |= rows_days(tname, match_sql, match_params)
+                refresh_memberships(tname, [p_id])
                 db.session.commit()
+                refresh_analytics(tname, touched_days)
     except Exception as e:
         print(f"[WARNING] Could not insert into Yatra table: {e}")
         existing_status = 'Interest'
 
+    invalidate_dashboard()
     return jsonify({'success': True, 'message': 'Package saved!', 'status': existing_status if 'existing_status' in locals() else 'Interest'})
 
 
@@ -861,8 +1142,7 @@ def save_passenger_package():
 def create_razorpay_order():
     """Create a Razorpay order for a single passenger payment."""
     # Check accept_payment_mode
-    apm_setting = AppSettings.query.filter_by(key='accept_payment_mode').first()
-    accept_payment_mode = apm_setting.value == 'true' if apm_setting else False
+    accept_payment_mode = settings.accept_payment_mode()
     if not accept_payment_mode:
         return jsonify({'success': False, 'message': 'Payment is not currently accepted. Please contact the organizer.'})
 
@@ -875,16 +1155,27 @@ def create_razorpay_order():
         return jsonify({'success': False, 'message': 'Missing required data.'})
 
     try:
-        import razorpay
-        client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
-        order = client.order.create({
-            'amount': int(amount_paise),
-            'currency': 'INR',
-            'receipt': f'yatra_{yatra_id}_p_{passenger_id}_{uuid.uuid4().hex[:6]}',
-            'payment_capture': 1
-        })
+        order = razorpay_gateway.create_order(
+            int(amount_paise), currency='INR',
+            receipt=f'yatra_{yatra_id}_p_{passenger_id}_{uuid.uuid4().hex[:6]}',
+            notes={'yatra_id': str(yatra_id), 'passenger_id': str(passenger_id)})
+        # What the order pays for, so the webhook can settle it if the browser never comes back
+        yatra = db.session.get(YatraDetails, int(yatra_id))
+        tname = _payment_table(yatra) if yatra else None
+        registration_ids = (unpaid_registration_ids(tname, session.get('verified_phone'), passenger_id)
+                            if tname else None)
+        record_order(order['id'], yatra_id, passenger_id, session.get('verified_phone'), order['amount'],
+                     registration_ids)
+        db.session.commit()
         return jsonify({'success': True, 'order_id': order['id'], 'amount': order['amount'], 'currency': order['currency']})
+    except GatewayBusy as e:
+        return jsonify({'success': False, 'message': 'Many payments are in progress. Please try again in a few seconds.',
+                        'retry_after': e.retry_after}), 503, {'Retry-After': str(e.retry_after)}
+    except PaymentsUnavailable:
+        # Already logged by the gateway; answer fast instead of holding the worker
+        return jsonify({'success': False, 'message': 'Payments are temporarily unavailable. Please try again in a few minutes.'}), 503
     except Exception as e:
+        db.session.rollback()
         app_logger.error(f"Razorpay order creation failed: {str(e)}", exc_info=True)
         return jsonify({'success': False, 'message': f'Could not create payment order: {str(e)}'})
 
@@ -903,19 +1194,9 @@ def verify_razorpay_payment():
     if not all([razorpay_order_id, razorpay_payment_id, razorpay_signature, yatra_id, passenger_id]):
         return jsonify({'success': False, 'message': 'Missing payment verification data.'})
 
-    try:
-        import razorpay
-        import hmac, hashlib
-        client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
-        # Verify signature
-        params_dict = {
-            'razorpay_order_id': razorpay_order_id,
-            'razorpay_payment_id': razorpay_payment_id,
-            'razorpay_signature': razorpay_signature
-        }
-        client.utility.verify_payment_signature(params_dict)
-    except Exception as e:
-        app_logger.error(f"Razorpay signature verification failed: {str(e)}", exc_info=True)
+    # Verify signature (computed locally, no call to Razorpay)
+    if not razorpay_gateway.verify_payment_signature(razorpay_order_id, razorpay_payment_id, razorpay_signature):
+        app_logger.error(f"Razorpay signature verification failed for order {razorpay_order_id}")
         return jsonify({'success': False, 'message': 'Payment verification failed. Please contact support.'})
 
     # Signature valid — update DB
@@ -931,10 +1212,16 @@ def verify_razorpay_payment():
 
         db.session.execute(text(f"""
             UPDATE {tname}
-            SET status = 'Paid', razorpay_id = :rzp
+            SET status = 'Paid', razorpay_id = :rzp, order_id = :oid
             WHERE login_id = :lid AND name = :nm
-        """), {'rzp': razorpay_payment_id, 'lid': verified_phone, 'nm': passenger.name})
+        """), {'rzp': razorpay_payment_id, 'oid': razorpay_order_id, 'lid': verified_phone, 'nm': passenger.name})
+        # The webhook for this payment will find the order settled and change nothing
+        PaymentOrder.query.filter_by(order_id=razorpay_order_id).update(
+            {'status': 'paid', 'payment_id': razorpay_payment_id}, synchronize_session=False)
+        touched_days = rows_days(tname, "login_id = :lid AND name = :nm", {'lid': verified_phone, 'nm': passenger.name})
         db.session.commit()
+        invalidate_dashboard()
+        refresh_analytics(tname, touched_days)
 
         # Update session
         regs = session.get('yatra_registrations', [])
@@ -951,6 +1238,32 @@ def verify_razorpay_payment():
         return jsonify({'success': False, 'message': str(e)})
 
 
+@app.route('/razorpay/webhook', methods=['POST'])
+def razorpay_webhook():
+    """Razorpay webhook: store the event and answer at once; payment_reconciler applies it."""
+    body = request.get_data(cache=False)
+    if not razorpay_gateway.verify_webhook_signature(body, request.headers.get('X-Razorpay-Signature')):
+        app_logger.error("Razorpay webhook with an invalid signature rejected")
+        return jsonify({'success': False, 'message': 'Invalid signature.'}), 400
+    try:
+        event = record_event(body, request.headers.get('X-Razorpay-Event-Id'))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Not a Razorpay event.'}), 400
+    except Exception as e:
+        db.session.rollback()
+        app_logger.error(f"Storing Razorpay webhook failed: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'message': 'Could not store event.'}), 500  # Razorpay retries
+    if event is None:
+        return jsonify({'success': True, 'message': 'Duplicate event.'})
+    try:
+        payment_reconciler.kick()
+    except Exception as e:
+        # Stored - the next sweep or replay_payment_events.py applies it
+        db.session.rollback()
+        app_logger.error(f"Applying Razorpay webhook {event.event_id} failed: {str(e)}", exc_info=True)
+    return jsonify({'success': True, 'message': 'Event received.'})
+
+
 @app.route('/pay-all', methods=['POST'])
 @phone_required
 def pay_all():
@@ -982,8 +1295,11 @@ def pay_all():
             SET status = 'Paid', razorpay_id = :rzp
             WHERE login_id = :lid AND (status IS NULL OR status != 'Paid')
         """), {'lid': verified_phone, 'rzp': rzp_id})
+        touched_days = rows_days(tname, "login_id = :lid AND razorpay_id = :rzp", {'lid': verified_phone, 'rzp': rzp_id})
         
         db.session.commit()
+        invalidate_dashboard()
+        refresh_analytics(tname, touched_days)
 
         # Update session override so dashboard doesn't revert to Interest
         regs = session.get('yatra_registrations', [])
@@ -1029,8 +1345,11 @@ def pay_passenger():
             SET status = 'Paid', razorpay_id = :rzp
             WHERE login_id = :lid AND name = :nm AND (status IS NULL OR status != 'Paid')
         """), {'lid': verified_phone, 'nm': passenger.name, 'rzp': dummy_rzp})
+        touched_days = rows_days(tname, "login_id = :lid AND razorpay_id = :rzp", {'lid': verified_phone, 'rzp': dummy_rzp})
         
         db.session.commit()
+        invalidate_dashboard()
+        refresh_analytics(tname, touched_days)
 
         # Update session override
         regs = session.get('yatra_registrations', [])
@@ -1062,6 +1381,7 @@ def delete_traveler(traveler_id):
     try:
         traveler.login_id = f"#del#{traveler.login_id}"
         db.session.commit()
+        invalidate_dashboard()
         flash(f'Traveler "{traveler.name}" removed successfully.', 'success')
     except Exception as e:
         db.session.rollback()
@@ -1078,9 +1398,6 @@ def add_traveler():
     verified_phone = session.get('verified_phone')
     
     if request.method == 'POST':
-        import os
-        from werkzeug.utils import secure_filename
-        
         name = request.form.get('name')
         aadhar = request.form.get('aadhar')
         yob = request.form.get('year_of_birth')
@@ -1111,23 +1428,10 @@ def add_traveler():
             return render_template('add_traveler.html', current_year=datetime.now().year)
         
         photo_file = request.files.get('photo')
-        photo_path = None
-        
-        if photo_file and photo_file.filename != '':
-            filename = secure_filename(photo_file.filename)
-            base, extension = os.path.splitext(filename)
-            unique_filename = f"{base}_{uuid.uuid4().hex[:8]}{extension}"
-            
-            upload_folder = os.path.join(app.root_path, 'static', 'uploads', 'passengers')
-            os.makedirs(upload_folder, exist_ok=True)
-            
-            photo_file.save(os.path.join(upload_folder, unique_filename))
-            photo_path = f"uploads/passengers/{unique_filename}"
         
         try:
             new_traveler = LoginDetails(
                 login_id=verified_phone,
-                photo=photo_path,
                 name=name,
                 aadhar=aadhar,
                 year_of_birth=int(yob) if yob and str(yob).isdigit() else 0,
@@ -1139,7 +1443,15 @@ def add_traveler():
                 state=state
             )
             db.session.add(new_traveler)
+            db.session.flush()
+            # Resized and attached in the background (upload_pipeline)
+            photo_job = upload_pipeline.stage(photo_file, 'passenger', new_traveler.id)
             db.session.commit()
+            if photo_job:
+                upload_pipeline.kick()
+            elif photo_file and photo_file.filename:
+                flash('Photo skipped: please upload a JPG, PNG, WEBP or GIF image.', 'warning')
+            invalidate_dashboard()
             flash('Traveler added successfully!', 'success')
             return redirect(url_for('dashboard'))
         except Exception as e:
@@ -1163,9 +1475,7 @@ def edit_traveler(traveler_id):
         return redirect(url_for('dashboard'))
         
     if request.method == 'POST':
-        import os
-        from werkzeug.utils import secure_filename
-        
+        before = synced_values(traveler)
         traveler.name = request.form.get('name')
         traveler.aadhar = request.form.get('aadhar')
         
@@ -1201,57 +1511,30 @@ def edit_traveler(traveler_id):
             flash(f'A traveler named "{new_name}" is already registered under this phone number. Names must be unique per login.', 'error')
             return render_template('edit_traveler.html', traveler=traveler, current_year=datetime.now().year)
         
+        # The current photo stays until the new one is processed (upload_pipeline replaces it)
         photo_file = request.files.get('photo')
-        if photo_file and photo_file.filename != '':
-            filename = secure_filename(photo_file.filename)
-            base, extension = os.path.splitext(filename)
-            import uuid
-            unique_filename = f"{base}_{uuid.uuid4().hex[:8]}{extension}"
-            
-            upload_folder = os.path.join(app.root_path, 'static', 'uploads', 'passengers')
-            os.makedirs(upload_folder, exist_ok=True)
-            
-            import os
-            if traveler.photo:
-                old_path = os.path.join(app.root_path, 'static', traveler.photo)
-                if os.path.exists(old_path):
-                    try:
-                        os.remove(old_path)
-                    except Exception:
-                        pass
-            
-            photo_file.save(os.path.join(upload_folder, unique_filename))
-            traveler.photo = f"uploads/passengers/{unique_filename}"
+        photo_job = upload_pipeline.stage(photo_file, 'passenger', traveler.id)
+        if not photo_job and photo_file and photo_file.filename:
+            flash('Photo skipped: please upload a JPG, PNG, WEBP or GIF image.', 'warning')
             
         try:
             db.session.commit()
+            if photo_job:
+                upload_pipeline.kick()
             
-            # Sync edits back to dynamic Yatra tables
+            # Sync edits back to the yatra tables this traveler is registered in (none if
+            # only the photo / aadhar changed)
+            changed = {k: v for k, v in synced_values(traveler).items() if before[k] != v}
             try:
-                from sqlalchemy import text
-                tables = get_dynamic_yatra_tables()
-                for yt in tables:
-                    tname = yt['table_name']
-                    sync_query = text(f"""
-                        UPDATE {tname}
-                        SET name = :name, year_of_birth = :yob, gender = :gender, email = :email,
-                            phone = :phone, city = :city, district = :district, state = :state
-                        WHERE passenger_id = :pid
-                    """)
-                    db.session.execute(sync_query, {
-                        'name': traveler.name,
-                        'yob': traveler.year_of_birth,
-                        'gender': traveler.gender,
-                        'email': traveler.email,
-                        'phone': traveler.phone,
-                        'city': traveler.city,
-                        'district': traveler.district,
-                        'state': traveler.state,
-                        'pid': traveler.id
-                    })
+                touched = sync_passenger_rows([traveler.id], changed, table_exists=_table_exists)
                 db.session.commit()
+                # Gender / year of birth feed the analytics buckets
+                for tname, days in touched.items():
+                    refresh_analytics(tname, days)
             except Exception as sync_e:
+                db.session.rollback()
                 app.logger.error(f"Error syncing dynamic tables: {sync_e}")
+            invalidate_dashboard()
                 
             flash('Traveler details updated successfully!', 'success')
             return redirect(url_for('dashboard'))
@@ -1349,8 +1632,7 @@ def inject_tokens():
 @app.route('/admin/registration-status', methods=['GET'])
 @login_required
 def get_registration_status():
-    reg_setting = AppSettings.query.filter_by(key='registration_enabled').first()
-    is_enabled = reg_setting.value != 'false' if reg_setting else True
+    is_enabled = settings.is_registration_enabled()
     return jsonify({'enabled': is_enabled})
 
 @app.route('/admin/toggle-registration', methods=['POST'])
@@ -1359,13 +1641,7 @@ def toggle_registration():
     data = request.get_json()
     enabled = data.get('enabled', True)
     
-    reg_setting = AppSettings.query.filter_by(key='registration_enabled').first()
-    if not reg_setting:
-        reg_setting = AppSettings(key='registration_enabled')
-        db.session.add(reg_setting)
-        
-    reg_setting.value = 'true' if enabled else 'false'
-    db.session.commit()
+    settings.set_setting('registration_enabled', 'true' if enabled else 'false')
     
     msg = "Registration has been enabled." if enabled else "Registration has been disabled."
     return jsonify({'success': True, 'enabled': enabled, 'message': msg})
@@ -1373,8 +1649,7 @@ def toggle_registration():
 @app.route('/admin/accept-payment-status', methods=['GET'])
 @login_required
 def get_accept_payment_status():
-    apm_setting = AppSettings.query.filter_by(key='accept_payment_mode').first()
-    is_mode = apm_setting.value == 'true' if apm_setting else False
+    is_mode = settings.accept_payment_mode()
     return jsonify({'accept_payment_mode': is_mode})
 
 @app.route('/admin/toggle-accept-payment', methods=['POST'])
@@ -1383,13 +1658,7 @@ def toggle_accept_payment():
     data = request.get_json()
     accept_payment = data.get('accept_payment_mode', False)
     
-    apm_setting = AppSettings.query.filter_by(key='accept_payment_mode').first()
-    if not apm_setting:
-        apm_setting = AppSettings(key='accept_payment_mode')
-        db.session.add(apm_setting)
-        
-    apm_setting.value = 'true' if accept_payment else 'false'
-    db.session.commit()
+    settings.set_setting('accept_payment_mode', 'true' if accept_payment else 'false')
     
     msg = "Accept Payment Mode is now ON. Travelers can make payments." if accept_payment else "Accept Payment Mode is now OFF. Payments are paused."
     return jsonify({'success': True, 'accept_payment_mode': accept_payment, 'message': msg})
@@ -1401,27 +1670,15 @@ def admin_registration_closed_settings():
         title = request.form.get('title')
         description = request.form.get('description')
         
-        setting_title = AppSettings.query.filter_by(key='registration_closed_title').first()
-        if not setting_title:
-            setting_title = AppSettings(key='registration_closed_title')
-            db.session.add(setting_title)
-        setting_title.value = title
-        
-        setting_desc = AppSettings.query.filter_by(key='registration_closed_description').first()
-        if not setting_desc:
-            setting_desc = AppSettings(key='registration_closed_description')
-            db.session.add(setting_desc)
-        setting_desc.value = description
-        
-        db.session.commit()
+        settings.set_many({
+            'registration_closed_title': title,
+            'registration_closed_description': description,
+        })
         flash('Registration Closed settings updated successfully.', 'success')
         return redirect(url_for('admin_registration_closed_settings'))
         
-    title_setting = AppSettings.query.filter_by(key='registration_closed_title').first()
-    desc_setting = AppSettings.query.filter_by(key='registration_closed_description').first()
-    
-    current_title = title_setting.value if title_setting else "Registration is now Closed"
-    current_desc = desc_setting.value if desc_setting else "Thank you for your interest! We have reached our maximum capacity for this Yatra and registrations are currently closed. Please check back later for any updates or cancellations."
+    current_title = settings.get_setting('registration_closed_title', "Registration is now Closed")
+    current_desc = settings.get_setting('registration_closed_description', "Thank you for your interest! We have reached our maximum capacity for this Yatra and registrations are currently closed. Please check back later for any updates or cancellations.")
     
     return render_template('admin_registration_closed_settings.html', 
                            title=current_title, 
@@ -1445,33 +1702,21 @@ def admin_youtube_settings():
             else:
                 links.append("")
         
-        setting = AppSettings.query.filter_by(key='recent_yatra_youtube_list').first()
-        if not setting:
-            setting = AppSettings(key='recent_yatra_youtube_list')
-            db.session.add(setting)
-            
-        import json
-        setting.value = json.dumps(links)
-        db.session.commit()
+        settings.set_setting('recent_yatra_youtube_list', json.dumps(links))
         
         flash('YouTube Links updated successfully.', 'success')
         return redirect(url_for('admin_youtube_settings'))
         
-    setting = AppSettings.query.filter_by(key='recent_yatra_youtube_list').first()
     youtube_links = ["", "", ""]
-    if setting and setting.value:
-        import json
-        try:
-            parsed = json.loads(setting.value)
-            for i in range(min(3, len(parsed))):
-                youtube_links[i] = parsed[i]
-        except Exception:
-            pass
+    if settings.get_setting('recent_yatra_youtube_list'):
+        parsed = settings.get_json('recent_yatra_youtube_list', [])
+        for i in range(min(3, len(parsed))):
+            youtube_links[i] = parsed[i]
     else:
         # Fallback
-        old_setting = AppSettings.query.filter_by(key='recent_yatra_youtube').first()
-        if old_setting and old_setting.value:
-            youtube_links[0] = old_setting.value
+        old_link = settings.get_setting('recent_yatra_youtube')
+        if old_link:
+            youtube_links[0] = old_link
         else:
             youtube_links[0] = "https://www.youtube.com/embed/zTeCw1twHRY"
     
@@ -1480,141 +1725,67 @@ def admin_youtube_settings():
 @app.route('/admin/dashboard')
 @login_required
 def admin_dashboard():
-    """Admin dashboard showing all database tables"""
-    from sqlalchemy import text
+    """Admin dashboard showing all database tables.
+    Only the grid's columns are rendered here; rows are paged in from /admin/api/grid."""
     table_type = request.args.get('table', 'passengers')
-    
-    headers = []
-    records = []
-    dynamic_yatra_tables = get_dynamic_yatra_tables()
-    
-    
-    if table_type == 'passengers':
-        headers = ['Photo', 'Profile ID', 'Login Key (Phone)', 'Name', 'Aadhar No', 'Year of Birth', 'Phone', 'Email', 'City', 'District', 'State', 'Created At']
-        items = LoginDetails.query.order_by(LoginDetails.created_at.desc()).all()
-        for item in items:
-            records.append({
-                'id': item.id,
-                'cols': [
-                    {'type': 'photo', 'url': url_for('static', filename=item.photo) if item.photo else None},
-                    item.id,
-                    item.login_id,
-                    item.name,
-                    item.aadhar or '-',
-                    item.year_of_birth,
-                    item.phone or '-',
-                    item.email or '-',
-                    item.city or '-',
-                    item.district or '-',
-                    item.state or '-',
-                    item.created_at.strftime('%Y-%m-%d %H:%M') if item.created_at else '-'
-                ]
-            })
-            
-    elif table_type == 'yatra_details':
-        headers = ['ID', 'Title', 'Starting Date', 'Fixed Start', 'End Date', 'Fixed End', 'Hotel Packages', 'Travel Packages', 'Message', 'Link', 'Created At']
-        items = YatraDetails.query.order_by(YatraDetails.created_at.desc()).all()
-        for item in items:
-            h_str = '-'
-            if item.hotel_packages and item.hotel_packages != 'null':
-                try:
-                    h_list = json.loads(item.hotel_packages)
-                    h_str = ", ".join([f"{x['title']} (₹{x['price']})" if isinstance(x, dict) else str(x) for x in h_list])
-                except Exception:
-                    h_str = item.hotel_packages
-                    
-            t_str = '-'
-            if item.travel_packages and item.travel_packages != 'null':
-                try:
-                    t_list = json.loads(item.travel_packages)
-                    t_str = ", ".join([f"{x['title']} (₹{x['price']})" if isinstance(x, dict) else str(x) for x in t_list])
-                except Exception:
-                    t_str = item.travel_packages
-                    
-            records.append({
-                'id': item.id,
-                'cols': [
-                    item.id,
-                    item.title,
-                    item.starting_date.strftime('%Y-%m-%d') if item.starting_date else '-',
-                    'Yes' if item.is_start_fixed else 'No',
-                    item.end_date.strftime('%Y-%m-%d') if item.end_date else '-',
-                    'Yes' if item.is_end_fixed else 'No',
-                    h_str,
-                    t_str,
-                    item.yatra_message or '-',
-                    item.yatra_link or '-',
-                    item.created_at.strftime('%Y-%m-%d %H:%M') if item.created_at else '-'
-                ]
-            })
-            
-    else:
-        # Strict whitelist via _is_valid_table — prevents SQL injection
-        if _is_valid_table(table_type):
-            from sqlalchemy import text
-            headers = ['Photo', 'Profile ID', 'Record ID', 'Parent Login (Phone)', 'Name', 'Year of Birth', 'Aadhar No', 'Email', 'Phone', 'Gender', 'City', 'District', 'State', 'Hotel Package', 'Travel Package', 'Start Date', 'End Date', 'Status', 'RazorPay ID', 'Created At']
-            query = f"""
-                SELECT id, login_id, name, year_of_birth, email, phone, gender,
-                       city, district, state, hotel_package, travel_package,
-                       start_date, end_date, status, razorpay_id, created_at, passenger_id
-                FROM {table_type} ORDER BY created_at DESC
-            """
-            rows = db.session.execute(text(query)).fetchall()
-
-            # Fetch photos for all passenger IDs in these rows
-            passenger_ids = [row[17] for row in rows if row[17]]
-            login_details = LoginDetails.query.filter(LoginDetails.id.in_(passenger_ids)).all() if passenger_ids else []
-            info_map = {p.id: {'photo': p.photo, 'aadhar': p.aadhar} for p in login_details}
-
-            for row in rows:
-                row_id = row[0]
-                lid = row[1]
-                nm = row[2]
-                passenger_id = row[17]
-                
-                info = info_map.get(passenger_id, {})
-                photo = info.get('photo')
-                aadhar = info.get('aadhar') or '-'
-                photo_col = {'type': 'photo', 'url': url_for('static', filename=photo) if photo else None}
-                
-                cols = [
-                    photo_col,
-                    passenger_id,
-                    row_id,
-                    lid,
-                    nm,
-                    row[3],
-                    aadhar,
-                    row[4],
-                    row[5],
-                    row[6],
-                    row[7],
-                    row[8],
-                    row[9],
-                    row[10],
-                    row[11],
-                    row[12],
-                    row[13],
-                    row[14],
-                    row[15],
-                    row[16]
-                ]
-                records.append({'id': row_id, 'cols': cols, 'status': row[14]})
-        else:
-            # Invalid / unknown table — silent fallback to passengers view
-            table_type = 'passengers'
-            headers = ['Photo', 'Profile ID', 'Login Key (Phone)', 'Name', 'Aadhar No', 'Year of Birth', 'Phone', 'Email', 'City', 'District', 'State', 'Created At']
-            items = LoginDetails.query.order_by(LoginDetails.created_at.desc()).all()
-            for item in items:
-                records.append({'id': item.id, 'cols': [{'type': 'photo', 'url': url_for('static', filename=item.photo) if item.photo else None}, item.id, item.login_id, item.name, item.aadhar or '-', item.year_of_birth, item.phone or '-', item.email or '-', item.city or '-', item.district or '-', item.state or '-', item.created_at.strftime('%Y-%m-%d %H:%M') if item.created_at else '-']})
+    grid = _admin_grid_for(table_type)
+    # Columns the multi-select toolbar may set (none for Yatra Details, edited on their own page)
+    edit_fields = {'passengers': PASSENGER_EDIT_FIELDS, 'yatra_details': {}}.get(grid.name, YATRA_RECORD_EDIT_FIELDS)
 
     return render_template('admin_dashboard.html',
-                         headers=headers,
-                         records=records,
-                         current_table=table_type,
-                         dynamic_yatra_tables=dynamic_yatra_tables,
+                         headers=grid.headers,
+                         bulk_fields=[h for h in grid.headers if h in edit_fields],
+                         grid_columns=grid.describe(),
+                         grid_page_size=app.config['ADMIN_GRID_PAGE_SIZE'],
+                         current_table=grid.name,
+                         dynamic_yatra_tables=get_dynamic_yatra_tables(),
                          admin_tab_token=session.get('admin_tab_token', ''))
 
+
+def _admin_grid_for(table_type):
+    """Grid definition for a dashboard table name; unknown names fall back to passengers."""
+    if table_type == 'yatra_details':
+        return YATRA_DETAILS_GRID
+    # Strict whitelist via _is_valid_table — prevents SQL injection
+    if table_type != 'passengers' and _is_valid_table(table_type):
+        return yatra_grid(table_type)
+    return PASSENGERS_GRID
+
+
+@app.route('/admin/api/grid')
+@login_required
+def admin_grid_data():
+    """One page of the admin grid: keyset-paginated, sorted and filtered in SQL.
+
+    Query args: table, sort, dir (asc|desc), q (search all columns),
+    f_<column key> (per-column filter), cursor (next_cursor of the previous page),
+    page_size.
+    """
+    table_type = request.args.get('table', 'passengers')
+    grid = _admin_grid_for(table_type)
+    if grid.name != table_type:
+        return jsonify({'success': False, 'message': 'Invalid table name.'}), 400
+
+    page_size = request.args.get('page_size', app.config['ADMIN_GRID_PAGE_SIZE'], type=int)
+    page_size = max(1, min(page_size, app.config['ADMIN_GRID_MAX_PAGE_SIZE']))
+    column_filters = {key[2:]: value.strip() for key, value in request.args.items()
+                      if key.startswith('f_') and value.strip()}
+    try:
+        page = fetch_page(grid,
+                          sort=request.args.get('sort'),
+                          direction=request.args.get('dir', 'desc'),
+                          search=request.args.get('q', ''),
+                          column_filters=column_filters,
+                          cursor=request.args.get('cursor'),
+                          page_size=page_size)
+    except Exception as e:
+        db.session.rollback()
+        app_logger.error(f"Admin grid query failed for {table_type}: {e}")
+        return jsonify({'success': False, 'message': 'Could not load records.'}), 500
+
+    page.update({'success': True, 'table': grid.name, 'page_size': page_size})
+    return jsonify(page)
+
 @app.route('/admin/analytics')
 @login_required
 def admin_analytics():
@@ -1631,107 +1802,61 @@ def admin_analytics_data():
     table_type = request.args.get('table', 'all')
     period = request.args.get('period', 'all')
     
-    from sqlalchemy import text
-    from datetime import datetime, timedelta
+    from datetime import timedelta
     
     tables_to_query = []
     if table_type == 'all':
-        tables_to_query = [t for t in _get_all_yatra_table_names() if _is_valid_table(t)]
+        tables_to_query = _get_all_yatra_table_names()
     else:
         if _is_valid_table(table_type):
             tables_to_query = [table_type]
             
-    date_filter = ""
-    params = {}
+    cutoff = None
     if period in ['7', '30', '365']:
         cutoff_date = datetime.now() - timedelta(days=int(period))
-        if _is_postgres():
-            date_filter = " AND created_at >= :cutoff"
-        else:
-            date_filter = " AND created_at >= :cutoff"
-        params['cutoff'] = cutoff_date.strftime('%Y-%m-%d %H:%M:%S')
-
-    data = {
-        'timeline': {},
-        'gender': {'Male': 0, 'Female': 0, 'Other': 0},
-        'status': {'Paid': 0, 'Pending': 0, 'Interest': 0, 'Failed': 0},
-        'age_groups': {'0-18': 0, '19-35': 0, '36-50': 0, '51-65': 0, '65+': 0},
-        'yatra_dist': {},
-        'packages': {'hotel': {}, 'travel': {}}
-    }
-    
-    current_year = datetime.now().year
-    
-    for tname in tables_to_query:
-        import string
-        display_name = string.capwords(tname[6:].replace('_', ' '))
-        data['yatra_dist'][display_name] = 0
-        
-        query = f"SELECT created_at, gender, status, year_of_birth, hotel_package, travel_package FROM {tname} WHERE 1=1 {date_filter}"
-        rows = db.session.execute(text(query), params).fetchall()
-        
-        for row in rows:
-            created_at, gender, status, yob, hotel_pkg, travel_pkg = row
-            
-            # Timeline
-            if created_at:
-                try:
-                    if isinstance(created_at, str):
-                        dt = datetime.strptime(created_at[:10], '%Y-%m-%d')
-                    else:
-                        dt = created_at
-                    d_str = dt.strftime('%Y-%m-%d')
-                    data['timeline'][d_str] = data['timeline'].get(d_str, 0) + 1
-                except:
-                    pass
-            
-            # Gender
-            g = 'Other'
-            if gender:
-                g_lower = gender.lower()
-                if g_lower == 'male' or g_lower == 'm': g = 'Male'
-                elif g_lower == 'female' or g_lower == 'f': g = 'Female'
-            data['gender'][g] = data['gender'].get(g, 0) + 1
-            
-            # Status
-            s = 'Interest'
-            if status:
-                s_lower = status.lower()
-                if s_lower == 'paid': s = 'Paid'
-                elif s_lower == 'pending': s = 'Pending'
-                elif s_lower == 'failed': s = 'Failed'
-            data['status'][s] = data['status'].get(s, 0) + 1
-            
-            # Age
-            if yob:
-                try:
-                    age = current_year - int(yob)
-                    if age <= 18: data['age_groups']['0-18'] += 1
-                    elif age <= 35: data['age_groups']['19-35'] += 1
-                    elif age <= 50: data['age_groups']['36-50'] += 1
-                    elif age <= 65: data['age_groups']['51-65'] += 1
-                    else: data['age_groups']['65+'] += 1
-                except:
-                    pass
-                    
-            # Packages
-            if hotel_pkg and hotel_pkg.strip() and hotel_pkg.lower() != 'none':
-                hp = hotel_pkg.strip()
-                data['packages']['hotel'][hp] = data['packages']['hotel'].get(hp, 0) + 1
-            if travel_pkg and travel_pkg.strip() and travel_pkg.lower() != 'none':
-                tp = travel_pkg.strip()
-                data['packages']['travel'][tp] = data['packages']['travel'].get(tp, 0) + 1
-            
-            data['yatra_dist'][display_name] += 1
+        cutoff = cutoff_date.strftime('%Y-%m-%d %H:%M:%S')
 
-    sorted_dates = sorted(data['timeline'].keys())
-    data['chart_timeline'] = {
-        'labels': sorted_dates,
-        'values': [data['timeline'][d] for d in sorted_dates]
-    }
+    data = empty_analytics()
+    current_year = datetime.now().year
+    try:
+        # Served from the daily rollup (built on first use / at the turn of the year)
+        ensure_rollups(_get_all_yatra_table_names(), current_year)
+        rollup_analytics(data, tables_to_query, cutoff=cutoff, current_year=current_year)
+    except Exception as e:
+        db.session.rollback()
+        app_logger.error(f"Analytics rollup unavailable, aggregating live: {e}")
+        # Bucketing still happens in SQL; only aggregates come back
+        data = empty_analytics()
+        for tname in tables_to_query:
+            totals, groups = table_aggregates(tname, cutoff=cutoff, current_year=current_year)
+            fold_aggregates(data, yatra_display_name(tname), totals, groups)
+
+    finish_analytics(data)
     
     return jsonify({'success': True, 'data': data})
 
+@app.route('/admin/api/cache-stats')
+@login_required
+def admin_cache_stats():
+    """Hit/miss counters of this worker's in-process caches"""
+    return jsonify({'success': True, 'pid': os.getpid(), 'dashboard': dashboard_cache.stats(),
+                    'settings': settings.stats()})
+
+@app.route('/admin/api/payment-stats')
+@login_required
+def admin_payment_stats():
+    """This worker's Razorpay client (circuit breaker, call queue depth and latency) and the webhook inbox"""
+    return jsonify({'success': True, 'pid': os.getpid(), 'gateway': razorpay_gateway.status(),
+                    'webhook_events': payment_reconciler.stats()})
+
+@app.route('/healthz')
+def healthz():
+    """Readiness probe (gunicorn reloads, load balancers): database reachable, schema current"""
+    pending = pending_migrations()  # also what an unreachable database looks like
+    if pending:
+        return jsonify({'success': False, 'message': f'{len(pending)} schema migration(s) pending'}), 503
+    return jsonify({'success': True, 'pid': os.getpid()})
+
 @app.route('/admin/manage-yatra', methods=['GET', 'POST'])
 @login_required
 def admin_manage_yatra():
@@ -1767,19 +1892,7 @@ def admin_manage_yatra():
                 except ValueError:
                     pass
 
-        import os
-        from werkzeug.utils import secure_filename
-        import uuid
-        about_image_path = None
         photo_file = request.files.get('about_image')
-        if photo_file and photo_file.filename != '':
-            filename = secure_filename(photo_file.filename)
-            base, extension = os.path.splitext(filename)
-            unique_filename = f"{base}_{uuid.uuid4().hex[:8]}{extension}"
-            upload_folder = os.path.join(app.root_path, 'static', 'uploads', 'yatra_images')
-            os.makedirs(upload_folder, exist_ok=True)
-            photo_file.save(os.path.join(upload_folder, unique_filename))
-            about_image_path = f"uploads/yatra_images/{unique_filename}"
         
         try:
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str else None
@@ -1793,63 +1906,23 @@ def admin_manage_yatra():
                 is_end_fixed=is_end_fixed,
                 hotel_packages=json.dumps(hotel_packages),
                 travel_packages=json.dumps(travel_packages),
-                about_image=about_image_path,
                 yatra_message=yatra_message,
                 yatra_link=yatra_link
             )
             db.session.add(yatra)
+            db.session.flush()
+            # Resized and attached in the background (upload_pipeline)
+            photo_job = upload_pipeline.stage(photo_file, 'yatra_about', yatra.id)
             db.session.commit()
+            if photo_job:
+                upload_pipeline.kick()
             
-            # Create a dedicated table for this Yatra
-            from sqlalchemy import text
+            # Create a dedicated table (or consolidated-storage view) for this Yatra
             tname = sanitize_table_name(title)
-            if _is_postgres():
-                db.session.execute(text(f'''
-                    CREATE TABLE IF NOT EXISTS {tname} (
-                        id SERIAL PRIMARY KEY,
-                        login_id TEXT,
-                        name TEXT,
-                        year_of_birth INTEGER,
-                        email TEXT,
-                        phone TEXT,
-                        gender TEXT,
-                        city TEXT,
-                        district TEXT,
-                        state TEXT,
-                        hotel_package TEXT,
-                        travel_package TEXT,
-                        start_date TEXT,
-                        end_date TEXT,
-                        status TEXT DEFAULT 'Interest',
-                        razorpay_id TEXT,
-                        passenger_id INTEGER,
-                        created_at TIMESTAMP DEFAULT NOW()
-                    )
-                '''))
-            else:
-                db.session.execute(text(f'''
-                    CREATE TABLE IF NOT EXISTS {tname} (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        login_id TEXT,
-                        name TEXT,
-                        year_of_birth INTEGER,
-                        email TEXT,
-                        phone TEXT,
-                        gender TEXT,
-                        city TEXT,
-                        district TEXT,
-                        state TEXT,
-                        hotel_package TEXT,
-                        travel_package TEXT,
-                        start_date TEXT,
-                        end_date TEXT,
-                        status TEXT DEFAULT 'Interest',
-                        razorpay_id TEXT,
-                        passenger_id INTEGER,
-                        created_at TEXT DEFAULT (datetime('now', 'localtime'))
-                    )
-                '''))
+            create_yatra_storage(tname, yatra.id)
             db.session.commit()
+            schema_registry.invalidate()
+            invalidate_all_dashboards()
             
             flash(f'New Yatra "{title}" created successfully with its dedicated table!', 'success')
             return redirect(url_for('admin_dashboard', table=tname))
@@ -1909,40 +1982,25 @@ def admin_edit_yatra(yatra_id):
             yatra.yatra_message = yatra_message
             yatra.yatra_link = yatra_link
             
-            import os
-            from werkzeug.utils import secure_filename
-            import uuid
-            photo_file = request.files.get('about_image')
-            if photo_file and photo_file.filename != '':
-                filename = secure_filename(photo_file.filename)
-                base, extension = os.path.splitext(filename)
-                unique_filename = f"{base}_{uuid.uuid4().hex[:8]}{extension}"
-                upload_folder = os.path.join(app.root_path, 'static', 'uploads', 'yatra_images')
-                os.makedirs(upload_folder, exist_ok=True)
-                
-                import os
-                if yatra.about_image:
-                    old_path = os.path.join(app.root_path, 'static', yatra.about_image)
-                    if os.path.exists(old_path):
-                        try:
-                            os.remove(old_path)
-                        except Exception:
-                            pass
-                
-                photo_file.save(os.path.join(upload_folder, unique_filename))
-                yatra.about_image = f"uploads/yatra_images/{unique_filename}"
+            # The current image stays until the new one is processed (upload_pipeline replaces it)
+            photo_job = upload_pipeline.stage(request.files.get('about_image'), 'yatra_about', yatra.id)
             
             db.session.commit()
+            if photo_job:
+                upload_pipeline.kick()
+            invalidate_all_dashboards()
             
             # Optionally, rename the associated table if title changed (SQLite does support RENAME TABLE)
             if old_title != title:
                 old_tname = sanitize_table_name(old_title)
                 new_tname = sanitize_table_name(title)
                 if old_tname != new_tname:
-                    from sqlalchemy import text
                     if _table_exists(old_tname):
-                        db.session.execute(text(f"ALTER TABLE {old_tname} RENAME TO {new_tname}"))
+                        rename_yatra_storage(old_tname, new_tname, yatra.id)
+                        rename_rollup(old_tname, new_tname)
+                        rename_memberships(old_tname, new_tname)
                         db.session.commit()
+                        schema_registry.invalidate()
 
             flash(f'Yatra "{title}" updated successfully!', 'success')
             return redirect(url_for('admin_dashboard', table='yatra_details'))
@@ -1965,6 +2023,38 @@ def admin_edit_yatra(yatra_id):
 
 
 
+# Grid column label -> column, for the edit modal and bulk edits (the whitelist of editable columns)
+PASSENGER_EDIT_FIELDS = {
+    'Login ID (Verified Phone)': 'login_id',
+    'Name': 'name',
+    'Aadhar No': 'aadhar',
+    'Year of Birth': 'year_of_birth',
+    'Phone': 'phone',
+    'Email': 'email',
+    'City': 'city',
+    'District': 'district',
+    'State': 'state'
+}
+
+YATRA_RECORD_EDIT_FIELDS = {
+    'Login ID': 'login_id',
+    'Name': 'name',
+    'Year of Birth': 'year_of_birth',
+    'Email': 'email',
+    'Phone': 'phone',
+    'Gender': 'gender',
+    'City': 'city',
+    'District': 'district',
+    'State': 'state',
+    'Hotel Package': 'hotel_package',
+    'Travel Package': 'travel_package',
+    'Start Date': 'start_date',
+    'End Date': 'end_date',
+    'Status': 'status',
+    'RazorPay ID': 'razorpay_id'
+}
+
+
 @app.route('/admin/update-record', methods=['POST'])
 @login_required
 def admin_update_record():
@@ -1981,19 +2071,8 @@ def admin_update_record():
             if not record:
                 return jsonify({'success': False, 'message': 'Passenger record not found.'})
 
-            mapping = {
-                'Login ID (Verified Phone)': 'login_id',
-                'Name': 'name',
-                'Aadhar No': 'aadhar',
-                'Year of Birth': 'year_of_birth',
-                'Phone': 'phone',
-                'Email': 'email',
-                'City': 'city',
-                'District': 'district',
-                'State': 'state'
-            }
-
-            for form_key, model_attr in mapping.items():
+            before = synced_values(record)
+            for form_key, model_attr in PASSENGER_EDIT_FIELDS.items():
                 if form_key in request.form:
                     val = request.form.get(form_key)
                     if model_attr == 'year_of_birth':
@@ -2003,7 +2082,12 @@ def admin_update_record():
                             val = 0
                     setattr(record, model_attr, val)
 
+            changed = {k: v for k, v in synced_values(record).items() if before[k] != v}
+            touched = sync_passenger_rows([record.id], changed, table_exists=_table_exists)
             db.session.commit()
+            invalidate_all_dashboards()
+            for tname, days in touched.items():
+                refresh_analytics(tname, days)
 
             updated = {
                 'Login ID (Verified Phone)': record.login_id or '-',
@@ -2025,29 +2109,11 @@ def admin_update_record():
             if not _is_valid_table(table_name):
                 return jsonify({'success': False, 'message': 'Invalid table name.'})
 
-            mapping = {
-                'Login ID': 'login_id',
-                'Name': 'name',
-                'Year of Birth': 'year_of_birth',
-                'Email': 'email',
-                'Phone': 'phone',
-                'Gender': 'gender',
-                'City': 'city',
-                'District': 'district',
-                'State': 'state',
-                'Hotel Package': 'hotel_package',
-                'Travel Package': 'travel_package',
-                'Start Date': 'start_date',
-                'End Date': 'end_date',
-                'Status': 'status',
-                'RazorPay ID': 'razorpay_id'
-            }
-
             update_parts = []
             update_values = {'id': record_id}
             updated = {}
 
-            for form_key, col_name in mapping.items():
+            for form_key, col_name in YATRA_RECORD_EDIT_FIELDS.items():
                 if form_key in request.form:
                     val = request.form.get(form_key)
                     update_parts.append(f"{col_name} = :{col_name}")
@@ -2058,7 +2124,10 @@ def admin_update_record():
                 from sqlalchemy import text
                 query = text(f"UPDATE {table_name} SET {', '.join(update_parts)} WHERE id = :id")
                 db.session.execute(query, update_values)
+                touched_days = rows_days(table_name, "id = :id", {'id': record_id})
                 db.session.commit()
+                invalidate_all_dashboards()
+                refresh_analytics(table_name, touched_days)
                 return jsonify({'success': True, 'message': 'Record updated successfully!', 'updated_values': updated})
             return jsonify({'success': False, 'message': 'Nothing to update.'})
 
@@ -2085,6 +2154,7 @@ def admin_delete_record():
             if record:
                 db.session.delete(record)
                 db.session.commit()
+                invalidate_all_dashboards()
                 return jsonify({'success': True, 'message': 'Passenger deleted successfully.'})
             return jsonify({'success': False, 'message': 'Passenger not found.'})
             
@@ -2092,22 +2162,21 @@ def admin_delete_record():
             record = YatraDetails.query.get(record_id)
             if record:
                 title = record.title
-                image_path = record.about_image
+                image_paths = [record.about_image, record.about_image_thumb]
                 db.session.delete(record)
                 db.session.commit()
                 
                 # Optionally drop the associated dynamic table
                 tname = sanitize_table_name(title)
-                from sqlalchemy import text
-                db.session.execute(text(f"DROP TABLE IF EXISTS {tname}"))
+                drop_yatra_storage(tname)
+                drop_rollup(tname)
+                drop_memberships(tname)
                 db.session.commit()
+                schema_registry.invalidate()
+                invalidate_all_dashboards()
                 
-                # Delete the physical image from filesystem if it exists
-                if image_path:
-                    import os
-                    full_image_path = os.path.join(app.root_path, 'static', image_path)
-                    if os.path.exists(full_image_path):
-                        os.remove(full_image_path)
+                # Delete the physical images from filesystem if they exist
+                remove_static_files(os.path.join(app.root_path, 'static'), image_paths)
                 
                 return jsonify({'success': True, 'message': 'Yatra deleted successfully.'})
             return jsonify({'success': False, 'message': 'Yatra not found.'})
@@ -2117,26 +2186,128 @@ def admin_delete_record():
             if not _is_valid_table(table_name):
                 return jsonify({'success': False, 'message': 'Invalid table name.'})
             from sqlalchemy import text
+            touched_days = rows_days(table_name, "id = :id", {'id': record_id})
+            passenger_ids = [row[0] for row in db.session.execute(
+                text(f"SELECT passenger_id FROM {table_name} WHERE id = :id"), {'id': record_id})]
             db.session.execute(text(f"DELETE FROM {table_name} WHERE id = :id"), {'id': record_id})
+            refresh_memberships(table_name, passenger_ids)
             db.session.commit()
+            invalidate_all_dashboards()
+            refresh_analytics(table_name, touched_days)
             return jsonify({'success': True, 'message': 'Record deleted successfully.'})
-                
+
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': str(e)})
 
+
+BULK_MAX_RECORDS = 1000
+
+
+@app.route('/admin/bulk-records', methods=['POST'])
+@login_required
+def admin_bulk_records():
+    """Update or delete many grid rows at once: one set-based statement in one transaction.
+
+    JSON body: ``table_name``, ``record_ids`` and either ``changes`` ({column label: value},
+    as in the edit modal) or ``delete: true``.  Returns a result per requested id.
+    """
+    data = request.get_json(silent=True) or {}
+    table_name = data.get('table_name')
+    changes = data.get('changes') or {}
+    delete = bool(data.get('delete'))
+
+    try:
+        record_ids = list(dict.fromkeys(int(i) for i in data.get('record_ids') or []))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Record ids must be numbers.'})
+    if not table_name or not record_ids:
+        return jsonify({'success': False, 'message': 'Invalid data provided.'})
+    if len(record_ids) > BULK_MAX_RECORDS:
+        return jsonify({'success': False, 'message': f'At most {BULK_MAX_RECORDS} records per request.'})
+    if delete == bool(changes):
+        return jsonify({'success': False, 'message': 'Send either changes or delete.'})
+
+    if table_name == 'passengers':
+        physical, fields = 'login_details', PASSENGER_EDIT_FIELDS
+    elif table_name == 'yatra_details':
+        return jsonify({'success': False, 'message': 'Please manage Yatras one at a time.'})
+    elif _is_valid_table(table_name):  # validated once for the whole batch
+        physical, fields = table_name, YATRA_RECORD_EDIT_FIELDS
+    else:
+        return jsonify({'success': False, 'message': 'Invalid table name.'})
+
+    update_values, updated = {}, {}
+    for label, val in changes.items():
+        col_name = fields.get(label)
+        if not col_name:
+            return jsonify({'success': False, 'message': f'"{label}" cannot be edited.'})
+        if table_name == 'passengers' and col_name == 'year_of_birth':
+            val = int(val) if val and str(val).strip().isdigit() else 0
+        update_values[col_name] = val
+        updated[label] = str(val) if val not in (None, '') else '-'
+
+    from sqlalchemy import text
+    # Numbered placeholders rather than an expanding bind, so rows_days can reuse the clause
+    id_params = {f'id{n}': record_id for n, record_id in enumerate(record_ids)}
+    id_clause = f"id IN ({', '.join(':' + key for key in id_params)})"
+    try:
+        found, passenger_ids = set(), set()
+        for row_id, passenger_id in db.session.execute(
+                text(f"SELECT id, {'id' if table_name == 'passengers' else 'passenger_id'} "
+                     f"FROM {physical} WHERE {id_clause}"), id_params):
+            found.add(row_id)
+            passenger_ids.add(passenger_id)
+        touched = {}  # yatra table -> rollup days to refresh
+        if found and table_name != 'passengers':
+            touched[physical] = rows_days(physical, id_clause, id_params)
+        if found and delete:
+            db.session.execute(text(f"DELETE FROM {physical} WHERE {id_clause}"), id_params)
+            if table_name != 'passengers':
+                refresh_memberships(physical, passenger_ids)
+        elif found:
+            assignments = ', '.join(f"{col} = :set_{col}" for col in update_values)
+            db.session.execute(text(f"UPDATE {physical} SET {assignments} WHERE {id_clause}"),
+                               dict(id_params, **{f'set_{col}': val for col, val in update_values.items()}))
+            if table_name == 'passengers':
+                # Same batch, same transaction: their copies in the yatras they are registered in
+                touched = sync_passenger_rows(found, update_values, table_exists=_table_exists)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        app_logger.error(f"Bulk {'delete' if delete else 'update'} on {table_name} failed: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'message': f'Error updating records: {str(e)}'})
+
+    if found:
+        invalidate_all_dashboards()
+        for tname, days in touched.items():
+            refresh_analytics(tname, days)
+
+    verb = 'deleted' if delete else 'updated'
+    results = [{'id': record_id, 'success': record_id in found,
+                'message': verb.capitalize() if record_id in found else 'Record not found.'}
+               for record_id in record_ids]
+    message = f"{len(found)} record{'s' if len(found) != 1 else ''} {verb}."
+    if len(found) < len(record_ids):
+        message += f" {len(record_ids) - len(found)} not found."
+    return jsonify({'success': bool(found), 'message': message, 'results': results,
+                    'updated_values': updated if not delete else None})
+
 @app.route('/admin/delete-yatra-table/<table_name>', methods=['POST'])
 @login_required
 def admin_delete_yatra_table(table_name):
     """Drop a specific dynamic Yatra table from the database"""
-    from sqlalchemy import text
     # Strict whitelist prevents SQL injection in DROP TABLE
     if not _is_valid_table(table_name):
         flash('Invalid table name. Cannot delete.', 'error')
         return redirect(url_for('admin_dashboard'))
     try:
-        db.session.execute(text(f'DROP TABLE IF EXISTS {table_name}'))
+        drop_yatra_storage(table_name)
+        drop_rollup(table_name)
+        drop_memberships(table_name)
         db.session.commit()
+        schema_registry.invalidate()
+        invalidate_all_dashboards()
         flash(f'Table "{table_name}" deleted successfully.', 'success')
     except Exception as e:
         flash(f'Error deleting table: {str(e)}', 'error')
@@ -2150,218 +2321,95 @@ def admin_toggle_yatra(yatra_id):
     yatra = YatraDetails.query.get_or_404(yatra_id)
     yatra.is_active = not yatra.is_active
     db.session.commit()
+    invalidate_all_dashboards()
     return jsonify({'success': True, 'is_active': yatra.is_active})
 
 
+def _export_spec_for(table_type):
+    """Export layout for a dashboard table name, or None if the name is not allowed."""
+    if table_type == 'passengers':
+        return PASSENGERS_EXPORT
+    if table_type == 'yatra_details':
+        return YATRA_DETAILS_EXPORT
+    # dynamic yatra table — validate before any SQL
+    if _is_valid_table(table_type):
+        return yatra_export(table_type)
+    return None
+
+
 @app.route('/admin/export/excel')
 @login_required
 def export_excel():
-    """Export data to Excel (admin only)"""
-    import pandas as pd
-    import io
-
+    """Export data to Excel (admin only).
+    Rows are streamed from a server-side cursor into a write-only workbook; large
+    files are spooled to a temp file instead of being held in memory."""
     table_type = request.args.get('table', 'passengers')
-    data = []
-    filename = "export.xlsx"
+    spec = _export_spec_for(table_type)
+    if spec is None:
+        flash('Invalid table name.', 'error')
+        return redirect(url_for('admin_dashboard'))
 
     try:
-        if table_type == 'passengers':
-            passengers = LoginDetails.query.order_by(LoginDetails.created_at.desc()).all()
-            for p in passengers:
-                data.append({
-                    'Login ID': p.login_id,
-                    'Name': p.name,
-                    'Aadhar No': p.aadhar or '',
-                    'Year of Birth': p.year_of_birth,
-                    'Gender': p.gender or '',
-                    'Phone': p.phone or '',
-                    'Email': p.email or '',
-                    'City': p.city or '',
-                    'District': p.district or '',
-                    'State': p.state or '',
-                    'Created At': p.created_at.strftime('%Y-%m-%d %H:%M') if p.created_at else ''
-                })
-            filename = "passengers.xlsx"
-
-        elif table_type == 'yatra_details':
-            items = YatraDetails.query.order_by(YatraDetails.created_at.desc()).all()
-            for item in items:
-                data.append({
-                    'ID': item.id,
-                    'Title': item.title,
-                    'Starting Date': item.starting_date.strftime('%Y-%m-%d') if item.starting_date else '',
-                    'Fixed Start': 'Yes' if item.is_start_fixed else 'No',
-                    'End Date': item.end_date.strftime('%Y-%m-%d') if item.end_date else '',
-                    'Fixed End': 'Yes' if item.is_end_fixed else 'No',
-                    'Hotel Packages': item.hotel_packages or '',
-                    'Travel Packages': item.travel_packages or '',
-                    'Message': item.yatra_message or '',
-                    'Link': item.yatra_link or '',
-                    'Created At': item.created_at.strftime('%Y-%m-%d %H:%M') if item.created_at else ''
-                })
-            filename = "yatra_details.xlsx"
-
-        else: # dynamic yatra table — validate before any SQL
-            if not _is_valid_table(table_type):
-                flash('Invalid table name.', 'error')
-                return redirect(url_for('admin_dashboard'))
-            from sqlalchemy import text
-            query = f"""
-                SELECT id, login_id, name, year_of_birth, email, phone, gender,
-                       city, district, state, hotel_package, travel_package,
-                       start_date, end_date, status, razorpay_id, order_id, created_at
-                FROM {table_type} ORDER BY created_at DESC
-            """
-            rows = db.session.execute(text(query)).fetchall()
-            for row in rows:
-                data.append({
-                    'Order ID': row[16],
-                    'ID': row[0],
-                    'Login ID': row[1],
-                    'Name': row[2],
-                    'Year of Birth': row[3],
-                    'Email': row[4],
-                    'Phone': row[5],
-                    'Gender': row[6],
-                    'City': row[7],
-                    'District': row[8],
-                    'State': row[9],
-                    'Hotel Package': row[10],
-                    'Travel Package': row[11],
-                    'Start Date': row[12],
-                    'End Date': row[13],
-                    'Status': row[14],
-                    'Razorpay ID': row[15],
-                    'Created At': row[17],
-                })
-            filename = f"{table_type}_export.xlsx"
-
-        if not data:
+        first, rows = first_and_rest(iter_rows(spec))
+        if first is None:
             flash('No data to export', 'warning')
             return redirect(url_for('admin_dashboard', table=table_type))
 
-        df = pd.DataFrame(data)
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Data')
-        output.seek(0)
-
+        output = write_xlsx(spec, rows, spool_max_bytes=app.config['XLSX_SPOOL_MAX_BYTES'])
         return send_file(
             output,
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
             as_attachment=True,
-            download_name=filename
+            download_name=f"{spec.filename}.xlsx"
         )
 
     except Exception as e:
+        db.session.rollback()
         flash(f'Error exporting to Excel: {str(e)}', 'error')
         return redirect(url_for('admin_dashboard', table=table_type))
 
 
-
 @app.route('/admin/export/csv')
 @login_required
 def export_csv():
-    """Export data to CSV (admin only)"""
-    import pandas as pd
-    import io
-    
+    """Export data to CSV (admin only).
+    Rows are streamed from a server-side cursor, so memory use does not grow with the table."""
+    from flask import stream_with_context
+
     table_type = request.args.get('table', 'passengers')
-    data = []
-    filename = "export.csv"
+    spec = _export_spec_for(table_type)
+    if spec is None:
+        flash('Invalid table name.', 'error')
+        return redirect(url_for('admin_dashboard'))
 
     try:
-        if table_type == 'passengers':
-            passengers = LoginDetails.query.order_by(LoginDetails.created_at.desc()).all()
-            for p in passengers:
-                data.append({
-                    'Login ID': p.login_id,
-                    'Name': p.name,
-                    'Aadhar No': p.aadhar or '',
-                    'Year of Birth': p.year_of_birth,
-                    'Gender': p.gender or '',
-                    'Phone': p.phone or '',
-                    'Email': p.email or '',
-                    'City': p.city or '',
-                    'District': p.district or '',
-                    'State': p.state or '',
-                    'Created At': p.created_at.strftime('%Y-%m-%d %H:%M') if p.created_at else ''
-                })
-            filename = "passengers.csv"
-
-        elif table_type == 'yatra_details':
-            items = YatraDetails.query.order_by(YatraDetails.created_at.desc()).all()
-            for item in items:
-                data.append({
-                    'ID': item.id,
-                    'Title': item.title,
-                    'Starting Date': item.starting_date.strftime('%Y-%m-%d') if item.starting_date else '',
-                    'Fixed Start': 'Yes' if item.is_start_fixed else 'No',
-                    'End Date': item.end_date.strftime('%Y-%m-%d') if item.end_date else '',
-                    'Fixed End': 'Yes' if item.is_end_fixed else 'No',
-                    'Hotel Packages': item.hotel_packages or '',
-                    'Travel Packages': item.travel_packages or '',
-                    'Message': item.yatra_message or '',
-                    'Link': item.yatra_link or '',
-                    'Created At': item.created_at.strftime('%Y-%m-%d %H:%M') if item.created_at else ''
-                })
-            filename = "yatra_details.csv"
-
-        else: # dynamic yatra table — validate before any SQL
-            if not _is_valid_table(table_type):
-                flash('Invalid table name.', 'error')
-                return redirect(url_for('admin_dashboard'))
-            from sqlalchemy import text
-            query = f"""
-                SELECT id, login_id, name, year_of_birth, email, phone, gender,
-                       city, district, state, hotel_package, travel_package,
-                       start_date, end_date, status, razorpay_id, order_id, created_at
-                FROM {table_type} ORDER BY created_at DESC
-            """
-            rows = db.session.execute(text(query)).fetchall()
-            for row in rows:
-                data.append({
-                    'Order ID': row[16],
-                    'ID': row[0],
-                    'Login ID': row[1],
-                    'Name': row[2],
-                    'Year of Birth': row[3],
-                    'Email': row[4],
-                    'Phone': row[5],
-                    'Gender': row[6],
-                    'City': row[7],
-                    'District': row[8],
-                    'State': row[9],
-                    'Hotel Package': row[10],
-                    'Travel Package': row[11],
-                    'Start Date': row[12],
-                    'End Date': row[13],
-                    'Status': row[14],
-                    'Razorpay ID': row[15],
-                    'Created At': row[17],
-                })
-            filename = f"{table_type}_export.csv"
-
-        if not data:
-            flash('No data to export', 'warning')
-            return redirect(url_for('admin_dashboard', table=table_type))
-
-        df = pd.DataFrame(data)
-        output = io.StringIO()
-        df.to_csv(output, index=False)
-        output.seek(0)
-
-        return send_file(
-            io.BytesIO(output.getvalue().encode('utf-8')),
-            mimetype='text/csv',
-            as_attachment=True,
-            download_name=filename
-        )
-
+        first, rows = first_and_rest(iter_rows(spec))
     except Exception as e:
+        db.session.rollback()
         flash(f'Error exporting to CSV: {str(e)}', 'error')
         return redirect(url_for('admin_dashboard', table=table_type))
 
+    if first is None:
+        flash('No data to export', 'warning')
+        return redirect(url_for('admin_dashboard', table=table_type))
+
+    def generate():
+        try:
+            yield from csv_chunks(spec, rows)
+        except Exception as e:
+            # Headers are already sent - all we can do is log and cut the download short
+            app_logger.error(f"CSV export of {table_type} failed mid-stream: {e}")
+            raise
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={
+            'Content-Disposition': f'attachment; filename={spec.filename}.csv',
+            'X-Accel-Buffering': 'no',  # let nginx pass chunks straight through
+        }
+    )
+
 
 @app.route('/admin/create-registration', methods=['GET', 'POST'])
 @login_required
@@ -2465,12 +2513,13 @@ def admin_create_registration():
             tname = sanitize_table_name(yatra.title)
             tbl_exists = _table_exists(tname)
 
+            touched_days = set()
             if tbl_exists:
                 # Remove any existing entry for this phone+name combo in this yatra
-                db.session.execute(
-                    text(f"DELETE FROM {tname} WHERE passenger_id=:pid OR (passenger_id IS NULL AND login_id=:lid AND name=:nm)"),
-                    {'pid': p_id, 'lid': norm_phone, 'nm': name}
-                )
+                match_sql = "passenger_id=:pid OR (passenger_id IS NULL AND login_id=:lid AND name=:nm)"
+                match_params = {'pid': p_id, 'lid': norm_phone, 'nm': name}
+                touched_days = rows_days(tname, match_sql, match_params)
+                db.session.execute(text(f"DELETE FROM {tname} WHERE {match_sql}"), match_params)
                 db.session.execute(text(f"""
                     INSERT INTO {tname}
                         (login_id, passenger_id, name, year_of_birth, email, phone, gender,
@@ -2498,8 +2547,13 @@ def admin_create_registration():
                     'status':     pay_status,
                     'rzp_id':     payment_id,
                 })
+                touched_days |= rows_days(tname, match_sql, match_params)
+                refresh_memberships(tname, [p_id])
 
             db.session.commit()
+            invalidate_all_dashboards()
+            if tbl_exists:
+                refresh_analytics(tname, touched_days)
             flash(f'✅ Registration for "{name}" in "{yatra.title}" created successfully! Final Amount: ₹{final_amount:.2f}', 'success')
             return redirect(url_for('admin_dashboard', table=tname))
 
@@ -2511,6 +2565,10 @@ def admin_create_registration():
     return render_template('admin_create_registration.html', yatras=yatras)
 
 
+startup_timer.mark('routes (part 2)')
+startup_timer.report()
+
+
 if __name__ == '__main__':
     # debug mode is controlled by FLASK_DEBUG in .env (default: off)
     _debug = os.getenv('FLASK_DEBUG', 'False').strip().lower() in ('1', 'true', 'yes')
@@ -0,0 +1,197 @@
+"""Benchmark: /admin/api/analytics-data, daily rollup vs. live GROUP BY vs. the old Python loop.
+
+Fills two dynamic yatra tables with ``--rows`` synthetic registrations in
+total (mixed-case genders and statuses, missing birth years / packages / dates,
+like real data), then for each period filter times
+
+* ``python loop`` - the original implementation: fetch every row, bucket in Python
+* ``sql group by`` - aggregating the yatra tables live (``table_aggregates``),
+  the endpoint's fallback
+* ``rollup`` - the real endpoint, reading analytics_daily_rollup
+
+and checks all three return exactly the same JSON.
+
+Usage:
+    python benchmarks/bench_analytics.py [--rows 10000 100000 1000000]
+
+Runs against a throw-away SQLite database in a temp directory.
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix='yatra_bench_')
+os.environ['DATABASE_URI'] = 'sqlite:///' + os.path.join(WORKDIR, 'bench.db')
+os.environ['ADMIN_PASSWORD'] = 'bench'
+sys.path.insert(0, ROOT)
+os.chdir(WORKDIR)
+
+from sqlalchemy import text  # noqa: E402
+
+from app import app, db, ADMIN_USERNAME  # noqa: E402
+from analytics import (empty_analytics, finish_analytics, fold_aggregates,  # noqa: E402
+                       rebuild_rollups, table_aggregates, yatra_display_name)
+from yatra_store import create_yatra_table, ensure_yatra_indexes  # noqa: E402
+
+TABLES = ('yatra_bench_kashi', 'yatra_bench_char_dham')
+GENDERS = ['Male', 'Female', 'male', 'F', 'M', 'Other', '', None]
+STATUSES = ['Paid', 'Pending', 'Interest', 'Failed', 'not_initiated', 'PAID', None]
+HOTELS = ['Standard', 'Deluxe', ' Deluxe ', 'None', '', None]
+TRAVELS = ['Bus', 'AC Bus', 'Train', None]
+BOUNDARY_MARGIN = timedelta(minutes=30)
+
+
+def seed(n_rows):
+    rng = random.Random(42)
+    now = datetime.now()
+    boundaries = [now - timedelta(days=int(p)) for p in ('7', '30', '365')]
+    for tname in TABLES:
+        db.session.execute(text(f"DELETE FROM {tname}"))
+    batch = {tname: [] for tname in TABLES}
+    for i in range(n_rows):
+        tname = TABLES[i % len(TABLES)]
+        created = now - timedelta(days=rng.randrange(500), minutes=rng.randrange(1440))
+        if any(abs(created - boundary) < BOUNDARY_MARGIN for boundary in boundaries):
+            # Both paths compute their own cutoff a few seconds apart - keep rows clear of it
+            created -= 2 * BOUNDARY_MARGIN
+        batch[tname].append({
+            'lid': f'+91{9000000000 + i % 25000}', 'nm': f'Pilgrim {i}',
+            'yob': rng.choice([None, 0] + list(range(1940, 2020))),
+            'g': rng.choice(GENDERS), 'st': rng.choice(STATUSES),
+            'hp': rng.choice(HOTELS), 'tp': rng.choice(TRAVELS),
+            'ts': None if i % 97 == 0 else created.strftime('%Y-%m-%d %H:%M:%S'),
+        })
+        if len(batch[tname]) == 5000:
+            _insert(tname, batch[tname])
+            batch[tname] = []
+    for tname, rows in batch.items():
+        if rows:
+            _insert(tname, rows)
+    db.session.commit()
+
+
+def _insert(tname, rows):
+    db.session.execute(text(
+        f"INSERT INTO {tname} (login_id, name, year_of_birth, gender, status, hotel_package, travel_package, created_at) "
+        f"VALUES (:lid, :nm, :yob, :g, :st, :hp, :tp, :ts)"), rows)
+
+
+def python_loop(tables, period):
+    """The admin_analytics_data body as it was before the GROUP BY rewrite."""
+    date_filter = ""
+    params = {}
+    if period in ['7', '30', '365']:
+        cutoff_date = datetime.now() - timedelta(days=int(period))
+        date_filter = " AND created_at >= :cutoff"
+        params['cutoff'] = cutoff_date.strftime('%Y-%m-%d %H:%M:%S')
+    data = {
+        'timeline': {},
+        'gender': {'Male': 0, 'Female': 0, 'Other': 0},
+        'status': {'Paid': 0, 'Pending': 0, 'Interest': 0, 'Failed': 0},
+        'age_groups': {'0-18': 0, '19-35': 0, '36-50': 0, '51-65': 0, '65+': 0},
+        'yatra_dist': {},
+        'packages': {'hotel': {}, 'travel': {}}
+    }
+    current_year = datetime.now().year
+    for tname in tables:
+        display_name = string.capwords(tname[6:].replace('_', ' '))
+        data['yatra_dist'][display_name] = 0
+        query = f"SELECT created_at, gender, status, year_of_birth, hotel_package, travel_package FROM {tname} WHERE 1=1 {date_filter}"
+        for created_at, gender, status, yob, hotel_pkg, travel_pkg in db.session.execute(text(query), params).fetchall():
+            if created_at:
+                try:
+                    dt = datetime.strptime(created_at[:10], '%Y-%m-%d') if isinstance(created_at, str) else created_at
+                    d_str = dt.strftime('%Y-%m-%d')
+                    data['timeline'][d_str] = data['timeline'].get(d_str, 0) + 1
+                except Exception:
+                    pass
+            g = 'Other'
+            if gender:
+                g_lower = gender.lower()
+                if g_lower == 'male' or g_lower == 'm': g = 'Male'
+                elif g_lower == 'female' or g_lower == 'f': g = 'Female'
+            data['gender'][g] = data['gender'].get(g, 0) + 1
+            s = 'Interest'
+            if status:
+                s_lower = status.lower()
+                if s_lower == 'paid': s = 'Paid'
+                elif s_lower == 'pending': s = 'Pending'
+                elif s_lower == 'failed': s = 'Failed'
+            data['status'][s] = data['status'].get(s, 0) + 1
+            if yob:
+                age = current_year - int(yob)
+                if age <= 18: data['age_groups']['0-18'] += 1
+                elif age <= 35: data['age_groups']['19-35'] += 1
+                elif age <= 50: data['age_groups']['36-50'] += 1
+                elif age <= 65: data['age_groups']['51-65'] += 1
+                else: data['age_groups']['65+'] += 1
+            if hotel_pkg and hotel_pkg.strip() and hotel_pkg.lower() != 'none':
+                hp = hotel_pkg.strip()
+                data['packages']['hotel'][hp] = data['packages']['hotel'].get(hp, 0) + 1
+            if travel_pkg and travel_pkg.strip() and travel_pkg.lower() != 'none':
+                tp = travel_pkg.strip()
+                data['packages']['travel'][tp] = data['packages']['travel'].get(tp, 0) + 1
+            data['yatra_dist'][display_name] += 1
+    sorted_dates = sorted(data['timeline'].keys())
+    data['chart_timeline'] = {'labels': sorted_dates, 'values': [data['timeline'][d] for d in sorted_dates]}
+    return data
+
+
+def live_group_by(tables, period):
+    """The endpoint body without the rollup."""
+    cutoff = None
+    if period in ['7', '30', '365']:
+        cutoff = (datetime.now() - timedelta(days=int(period))).strftime('%Y-%m-%d %H:%M:%S')
+    data = empty_analytics()
+    for tname in tables:
+        totals, groups = table_aggregates(tname, cutoff=cutoff, current_year=datetime.now().year)
+        fold_aggregates(data, yatra_display_name(tname), totals, groups)
+    return finish_analytics(data)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    client = app.test_client()
+    r = client.post('/admin224151/login', json={'username': ADMIN_USERNAME, 'password': 'bench'})
+    assert r.get_json()['success'], r.data
+    with app.app_context():
+        for tname in TABLES:
+            create_yatra_table(tname)
+            ensure_yatra_indexes(tname)  # same index set the app gives every yatra table
+        db.session.commit()
+
+    print(f"{'rows':>8} {'period':>6} {'python loop s':>14} {'sql group by s':>15} {'rollup s':>9} {'speedup':>8}")
+    for n_rows in args.rows:
+        with app.app_context():
+            seed(n_rows)
+            # Seeded behind the app's back - build the rollup the way rebuild_analytics.py does
+            build_s, _ = timed(lambda: rebuild_rollups(list(TABLES)))
+        print(f"{n_rows:>8} rollup rebuild {build_s:.3f}s")
+        for period in ('all', '365', '30', '7'):
+            with app.app_context():
+                old_s, expected = timed(lambda: python_loop(list(TABLES), period))
+                live_s, live = timed(lambda: live_group_by(list(TABLES), period))
+            new_s, response = timed(lambda: client.get(f'/admin/api/analytics-data?table=all&period={period}'))
+            got = response.get_json()['data']
+            assert live == expected, f'live analytics mismatch at {n_rows} rows, period {period}'
+            assert got == expected, f'rollup analytics mismatch at {n_rows} rows, period {period}'
+            print(f"{n_rows:>8} {period:>6} {old_s:>14.3f} {live_s:>15.3f} {new_s:>9.3f} {old_s / new_s:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""Benchmark: dashboard registration loading vs. number of yatras.
+
+Compares the old per-table loop (a ``_table_exists`` check plus one SELECT per
+yatra, run twice, then a nested passenger match) with the single UNION ALL
+statement from ``yatra_store.fetch_login_registrations``.
+
+Usage:
+    python benchmarks/bench_dashboard.py [--yatras 5,10,20,40] [--rows 200] [--repeat 50]
+
+Runs against a throw-away SQLite database in a temp directory.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix='yatra_bench_')
+os.environ['DATABASE_URI'] = 'sqlite:///' + os.path.join(WORKDIR, 'bench.db')
+sys.path.insert(0, ROOT)
+os.chdir(WORKDIR)
+
+from sqlalchemy import event, text  # noqa: E402
+
+from app import app, db, sanitize_table_name, _table_exists, _get_all_yatra_table_names  # noqa: E402
+from models import LoginDetails, YatraDetails  # noqa: E402
+from yatra_store import fetch_login_registrations  # noqa: E402
+
+LOGIN = '+919000000001'
+PASSENGERS_PER_LOGIN = 4
+
+
+def _create_yatra_table(tname):
+    db.session.execute(text(f'''
+        CREATE TABLE IF NOT EXISTS {tname} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, login_id TEXT, name TEXT, year_of_birth INTEGER,
+            email TEXT, phone TEXT, gender TEXT, city TEXT, district TEXT, state TEXT,
+            hotel_package TEXT, travel_package TEXT, start_date TEXT, end_date TEXT,
+            status TEXT DEFAULT 'Interest', razorpay_id TEXT, passenger_id INTEGER, order_id TEXT,
+            created_at TEXT DEFAULT (datetime('now', 'localtime'))
+        )
+    '''))
+
+
+def seed(n_yatras, rows_per_yatra):
+    db.drop_all()
+    for tname in _get_all_yatra_table_names():
+        db.session.execute(text(f'DROP TABLE IF EXISTS {tname}'))
+    db.create_all()
+    passengers = [LoginDetails(login_id=LOGIN, name=f'Pilgrim {i}', year_of_birth=1970 + i, gender='Male')
+                  for i in range(PASSENGERS_PER_LOGIN)]
+    db.session.add_all(passengers)
+    db.session.flush()
+    for y in range(n_yatras):
+        yatra = YatraDetails(title=f'Bench Yatra {y}', is_active=(y % 2 == 0))
+        db.session.add(yatra)
+        tname = sanitize_table_name(yatra.title)
+        _create_yatra_table(tname)
+        filler = [{'lid': f'+91{8000000000 + i}', 'nm': f'Other {i}', 'pid': None} for i in range(rows_per_yatra)]
+        mine = [{'lid': LOGIN, 'nm': p.name, 'pid': p.id} for p in passengers]
+        db.session.execute(
+            text(f"INSERT INTO {tname} (login_id, name, year_of_birth, passenger_id, hotel_package, travel_package, status) "
+                 f"VALUES (:lid, :nm, 1980, :pid, 'Standard', 'Bus', 'Interest')"),
+            filler + mine)
+    db.session.commit()
+
+
+def legacy_load():
+    """The pre-refactor dashboard access pattern."""
+    passengers = LoginDetails.query.filter_by(login_id=LOGIN).all()
+    LoginDetails.query.filter_by(login_id=f'#del#{LOGIN}').all()
+    yatras = YatraDetails.query.filter_by(is_active=True).all()
+    all_yatras = YatraDetails.query.all()
+    for yatra in all_yatras:
+        tname = sanitize_table_name(yatra.title)
+        if not _table_exists(tname):
+            continue
+        db.session.execute(text(
+            f"SELECT name, year_of_birth, email, phone, gender, city, district, state, passenger_id FROM {tname} WHERE login_id=:lid"),
+            {'lid': LOGIN}).fetchall()
+    saved = {}
+    for yatra in yatras:
+        tname = sanitize_table_name(yatra.title)
+        if not _table_exists(tname):
+            continue
+        rows = db.session.execute(text(
+            f"SELECT name, hotel_package, travel_package, start_date, end_date, status, razorpay_id, passenger_id FROM {tname} WHERE login_id=:lid"),
+            {'lid': LOGIN}).fetchall()
+        for row in rows:
+            for p in passengers:
+                if (row[7] is not None and p.id == row[7]) or (row[7] is None and p.name == row[0]):
+                    saved[f'{yatra.id}:{p.id}'] = row
+                    break
+    return saved
+
+
+def new_load():
+    """The dashboard access pattern after the refactor."""
+    passengers = LoginDetails.query.filter(LoginDetails.login_id.in_([LOGIN, f'#del#{LOGIN}'])).all()
+    all_yatras = YatraDetails.query.all()
+    existing = set(_get_all_yatra_table_names())
+    by_table = {}
+    for yatra in all_yatras:
+        tname = sanitize_table_name(yatra.title)
+        if tname in existing:
+            by_table.setdefault(tname, []).append(yatra)
+    by_id = {p.id: p for p in passengers}
+    saved = {}
+    for row in fetch_login_registrations(LOGIN, by_table.keys()):
+        p = by_id.get(row['passenger_id'])
+        if p is None:
+            continue
+        for yatra in by_table[row['table_name']]:
+            if yatra.is_active:
+                saved[f'{yatra.id}:{p.id}'] = row
+    return saved
+
+
+def measure(fn, repeat):
+    counter = {'n': 0}
+
+    def _count(*_args, **_kwargs):
+        counter['n'] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', _count)
+    try:
+        fn()  # warm-up (also primes statement caches)
+        db.session.expire_all()
+        counter['n'] = 0
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+            db.session.expire_all()
+        elapsed = time.perf_counter() - start
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', _count)
+    return counter['n'] / repeat, elapsed / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--yatras', default='5,10,20,40')
+    parser.add_argument('--rows', type=int, default=200, help='unrelated rows per yatra table')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'yatras':>7} | {'legacy q/req':>12} {'legacy ms':>10} | {'union q/req':>11} {'union ms':>9}")
+    with app.app_context():
+        for n in [int(x) for x in args.yatras.split(',')]:
+            seed(n, args.rows)
+            assert len(legacy_load()) == len(new_load())
+            lq, lms = measure(legacy_load, args.repeat)
+            nq, nms = measure(new_load, args.repeat)
+            print(f"{n:>7} | {lq:>12.0f} {lms:>10.2f} | {nq:>11.0f} {nms:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""Benchmark: CSV export memory and throughput, streamed vs. the old pandas path.
+
+Fills one dynamic yatra table with ``--rows`` registrations, then exports it
+twice:
+
+* ``streaming`` - the real /admin/export/csv route (server-side cursor ->
+  csv.writer -> chunked response), consumed chunk by chunk like a client would.
+* ``pandas`` - the previous implementation: fetchall -> list of dicts ->
+  DataFrame -> StringIO -> BytesIO.  Skipped if pandas is not installed.
+
+Peak memory is Python heap allocations measured with tracemalloc (numpy and
+pandas report theirs there too).
+
+Usage:
+    python benchmarks/bench_export.py [--rows 100000 200000 ...]
+
+Runs against a throw-away SQLite database in a temp directory.
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix='yatra_bench_')
+os.environ['DATABASE_URI'] = 'sqlite:///' + os.path.join(WORKDIR, 'bench.db')
+os.environ['ADMIN_PASSWORD'] = 'bench'
+sys.path.insert(0, ROOT)
+os.chdir(WORKDIR)
+
+from sqlalchemy import text  # noqa: E402
+
+from app import app, db, ADMIN_USERNAME  # noqa: E402
+from yatra_store import create_yatra_table  # noqa: E402
+
+TABLE = 'yatra_export_bench'
+
+
+def seed(n_rows):
+    db.session.execute(text(f"DELETE FROM {TABLE}"))
+    batch = []
+    for i in range(n_rows):
+        batch.append({
+            'lid': f'+91{9000000000 + i % 25000}', 'nm': f'Pilgrim {i}', 'pid': i + 1,
+            'em': f'pilgrim{i}@example.com', 'st': ('Paid', 'Pending', 'Interest')[i % 3],
+            'ts': f'2026-{1 + i % 12:02d}-{1 + i % 28:02d} {i % 24:02d}:{i % 60:02d}:00',
+        })
+        if len(batch) == 5000:
+            _insert(batch)
+            batch = []
+    if batch:
+        _insert(batch)
+    db.session.commit()
+
+
+def _insert(batch):
+    db.session.execute(text(
+        f"INSERT INTO {TABLE} (login_id, name, year_of_birth, email, phone, gender, city, district, state, "
+        f"hotel_package, travel_package, start_date, end_date, status, razorpay_id, passenger_id, created_at) "
+        f"VALUES (:lid, :nm, 1975, :em, :lid, 'Female', 'Varanasi', 'Varanasi', 'Uttar Pradesh', "
+        f"'Deluxe', 'AC Bus', '2026-03-01', '2026-03-10', :st, 'pay_XXXXXXXXXXXX', :pid, :ts)"), batch)
+
+
+def pandas_export():
+    """The export_csv body as it was before streaming."""
+    import pandas as pd
+    rows = db.session.execute(text(f"""
+        SELECT id, login_id, name, year_of_birth, email, phone, gender,
+               city, district, state, hotel_package, travel_package,
+               start_date, end_date, status, razorpay_id, order_id, created_at
+        FROM {TABLE} ORDER BY created_at DESC
+    """)).fetchall()
+    data = []
+    for row in rows:
+        data.append({
+            'Order ID': row[16], 'ID': row[0], 'Login ID': row[1], 'Name': row[2],
+            'Year of Birth': row[3], 'Email': row[4], 'Phone': row[5], 'Gender': row[6],
+            'City': row[7], 'District': row[8], 'State': row[9], 'Hotel Package': row[10],
+            'Travel Package': row[11], 'Start Date': row[12], 'End Date': row[13],
+            'Status': row[14], 'Razorpay ID': row[15], 'Created At': row[17],
+        })
+    df = pd.DataFrame(data)
+    output = io.StringIO()
+    df.to_csv(output, index=False)
+    output.seek(0)
+    body = io.BytesIO(output.getvalue().encode('utf-8'))
+    return len(body.getvalue())
+
+
+def streaming_export(client):
+    response = client.get(f'/admin/export/csv?table={TABLE}', buffered=False)
+    assert response.status_code == 200, response.status_code
+    size = 0
+    for chunk in response.response:
+        size += len(chunk)
+    response.close()
+    return size
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 300000])
+    args = parser.parse_args()
+
+    try:
+        import pandas  # noqa: F401
+        have_pandas = True
+    except ImportError:
+        have_pandas = False
+        print("pandas not installed - only the streaming path is measured")
+
+    client = app.test_client()
+    r = client.post('/admin224151/login', json={'username': ADMIN_USERNAME, 'password': 'bench'})
+    assert r.get_json()['success'], r.data
+
+    with app.app_context():
+        create_yatra_table(TABLE)
+        db.session.commit()
+
+    print(f"{'rows':>8} {'path':<10} {'seconds':>8} {'rows/s':>10} {'peak MiB':>9} {'MiB out':>8}")
+    for n_rows in args.rows:
+        with app.app_context():
+            seed(n_rows)
+        paths = [('streaming', lambda: streaming_export(client))]
+        if have_pandas:
+            def legacy():
+                with app.app_context():
+                    return pandas_export()
+            paths.append(('pandas', legacy))
+        for label, fn in paths:
+            elapsed, peak, size = measure(fn)
+            print(f"{n_rows:>8} {label:<10} {elapsed:>8.2f} {n_rows / elapsed:>10.0f} "
+                  f"{peak / 2**20:>9.1f} {size / 2**20:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
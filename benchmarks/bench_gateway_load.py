@@ -0,0 +1,147 @@
+"""Benchmark: site responsiveness while Razorpay is slow.
+
+Serves the app from one worker process with a fixed number of request
+threads (like ``gunicorn --worker-class gthread --threads N``) against
+razorpay_stub.py answering every call after ``--delay`` seconds.  ``--payers``
+clients keep calling /create-razorpay-order while a prober fetches a
+non-payment page (/verify-phone); the prober's latency is reported with the
+gateway calls made inline (the old behaviour) and through the bounded
+executor (``RAZORPAY_EXECUTOR_WORKERS`` / ``RAZORPAY_MAX_PENDING``).
+
+Usage:
+    python benchmarks/bench_gateway_load.py [--threads 8] [--payers 16] [--delay 3] [--seconds 10]
+
+Runs against a throw-away SQLite database in a temp directory.
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix='yatra_bench_')
+STUB_PORT, APP_PORT = 8197, 5197
+os.environ['DATABASE_URI'] = 'sqlite:///' + os.path.join(WORKDIR, 'bench.db')
+os.environ['SESSION_SQLITE_PATH'] = os.path.join(WORKDIR, 'sessions.sqlite3')
+os.environ['RAZORPAY_API_BASE'] = f'http://127.0.0.1:{STUB_PORT}/v1'
+os.environ.setdefault('RAZORPAY_API_KEY', 'rzp_bench')
+os.environ.setdefault('RAZORPAY_API_SECRET', 'stub_secret')
+sys.path.insert(0, ROOT)
+os.chdir(WORKDIR)
+
+from werkzeug.serving import BaseWSGIServer  # noqa: E402
+
+import razorpay_stub  # noqa: E402
+from app import app, settings  # noqa: E402
+from payment_gateway import razorpay_gateway, GatewayExecutor, CircuitBreaker  # noqa: E402
+
+
+class ThreadPoolServer(BaseWSGIServer):
+    """At most ``threads`` requests in progress; the rest wait in the accept queue."""
+
+    def __init__(self, host, port, wsgi_app, threads):
+        super().__init__(host, port, wsgi_app)
+        self.pool = ThreadPoolExecutor(threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def login():
+    conn = http.client.HTTPConnection('127.0.0.1', APP_PORT, timeout=60)
+    conn.request('POST', '/send-otp', body=json.dumps({'phone': '9000000001'}),
+                 headers={'Content-Type': 'application/json'})
+    response = conn.getresponse()
+    response.read()
+    return response.getheader('Set-Cookie').split(';', 1)[0]
+
+
+def payer(cookie, stop, results):
+    body = json.dumps({'yatra_id': 1, 'passenger_id': 1, 'amount_paise': 50000})
+    while not stop.is_set():
+        conn = http.client.HTTPConnection('127.0.0.1', APP_PORT, timeout=60)
+        try:
+            conn.request('POST', '/create-razorpay-order', body=body,
+                         headers={'Content-Type': 'application/json', 'Cookie': cookie})
+            response = conn.getresponse()
+            response.read()
+            results.append(response.status)
+        except OSError:
+            results.append('error')
+        finally:
+            conn.close()
+
+
+def probe(stop, latencies):
+    while not stop.is_set():
+        start = time.perf_counter()
+        conn = http.client.HTTPConnection('127.0.0.1', APP_PORT, timeout=60)
+        conn.request('GET', '/verify-phone')
+        conn.getresponse().read()
+        conn.close()
+        latencies.append(time.perf_counter() - start)
+        time.sleep(0.05)
+
+
+def run(mode, cookie, payers, seconds, executor_workers, max_pending):
+    razorpay_gateway.executor = GatewayExecutor(executor_workers if mode == 'executor' else 0, max_pending,
+                                                app.config['RAZORPAY_CALL_DEADLINE'])
+    razorpay_gateway.breaker = CircuitBreaker(10 ** 6)  # measure queueing, not the breaker
+    stop, latencies, statuses = threading.Event(), [], []
+    threads = [threading.Thread(target=payer, args=(cookie, stop, statuses)) for _ in range(payers)]
+    threads.append(threading.Thread(target=probe, args=(stop, latencies)))
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    latencies.sort()
+    counts = {s: statuses.count(s) for s in sorted(set(statuses), key=str)}
+    print(f"{mode:<9} {len(latencies):>7} {statistics.median(latencies) * 1000:>8.0f} "
+          f"{latencies[int(len(latencies) * 0.95)] * 1000:>8.0f} {latencies[-1] * 1000:>8.0f}   {counts}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8, help='request threads of the worker')
+    parser.add_argument('--payers', type=int, default=16, help='concurrent clients creating orders')
+    parser.add_argument('--delay', type=float, default=3.0, help='seconds the stub takes per call')
+    parser.add_argument('--seconds', type=float, default=10.0, help='duration of each run')
+    parser.add_argument('--executor-workers', type=int, default=app.config['RAZORPAY_EXECUTOR_WORKERS'])
+    parser.add_argument('--max-pending', type=int, default=app.config['RAZORPAY_MAX_PENDING'])
+    args = parser.parse_args()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    razorpay_stub.serve(STUB_PORT, os.environ['RAZORPAY_API_SECRET'], delay=args.delay, block=False)
+    with app.app_context():
+        settings.set_many({'accept_payment_mode': 'true'})
+    server = ThreadPoolServer('127.0.0.1', APP_PORT, app, args.threads)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    cookie = login()
+
+    print(f"{args.threads} request threads, {args.payers} payers, gateway {args.delay:g}s per call, "
+          f"executor {args.executor_workers} threads / {args.max_pending} pending")
+    print(f"{'mode':<9} {'probes':>7} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}   order responses")
+    for mode in ('inline', 'executor'):
+        run(mode, cookie, args.payers, args.seconds, args.executor_workers, args.max_pending)
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
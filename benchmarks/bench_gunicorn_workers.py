@@ -0,0 +1,139 @@
+"""Benchmark: throughput of gunicorn sync vs gthread workers (gunicorn.conf.py).
+
+Starts gunicorn with the shipped configuration twice - ``--workers`` sync
+workers, then as many gthread workers with ``--threads`` threads each -
+against razorpay_stub.py answering after ``--delay`` seconds.  ``--clients``
+concurrent clients spend ``--seconds`` alternating between an I/O-bound
+request (/create-razorpay-order, waiting on the stub) and a quick page (the
+home page); requests per second and latencies are reported per worker
+class.  The Razorpay executor is sized to the request threads so that it is
+the worker model being measured, not the payment call limit.
+
+Usage:
+    python benchmarks/bench_gunicorn_workers.py [--workers 2] [--threads 8] [--clients 32] [--delay 0.2] [--seconds 10]
+
+Needs gunicorn (requirements.txt); runs against a throw-away SQLite database
+in a temp directory.
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix='yatra_bench_')
+STUB_PORT, APP_PORT = 8198, 5198
+os.environ['DATABASE_URI'] = 'sqlite:///' + os.path.join(WORKDIR, 'bench.db')
+os.environ['SESSION_SQLITE_PATH'] = os.path.join(WORKDIR, 'sessions.sqlite3')
+os.environ['RAZORPAY_API_BASE'] = f'http://127.0.0.1:{STUB_PORT}/v1'
+os.environ.setdefault('RAZORPAY_API_KEY', 'rzp_bench')
+os.environ.setdefault('RAZORPAY_API_SECRET', 'stub_secret')
+sys.path.insert(0, ROOT)
+os.chdir(WORKDIR)
+
+import razorpay_stub  # noqa: E402
+from app import app, settings  # noqa: E402  (migrates the new database)
+
+
+def start_gunicorn(worker_class, workers, threads):
+    env = dict(os.environ, GUNICORN_WORKER_CLASS=worker_class, GUNICORN_WORKERS=str(workers),
+               GUNICORN_THREADS=str(threads), GUNICORN_BIND=f'127.0.0.1:{APP_PORT}',
+               RAZORPAY_EXECUTOR_WORKERS=str(threads), RAZORPAY_MAX_PENDING=str(threads * 2),
+               PYTHONPATH=ROOT)
+    proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py')],
+                            env=env, cwd=WORKDIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', APP_PORT, timeout=2)
+            conn.request('GET', '/healthz')
+            if conn.getresponse().status == 200:
+                return proc
+        except OSError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError('gunicorn did not become ready')
+
+
+def login():
+    conn = http.client.HTTPConnection('127.0.0.1', APP_PORT, timeout=60)
+    conn.request('POST', '/send-otp', body=json.dumps({'phone': '9000000001'}),
+                 headers={'Content-Type': 'application/json'})
+    response = conn.getresponse()
+    response.read()
+    return response.getheader('Set-Cookie').split(';', 1)[0]
+
+
+def client(cookie, stop, latencies):
+    order = json.dumps({'yatra_id': 1, 'passenger_id': 1, 'amount_paise': 50000})
+    requests = (('order', 'POST', '/create-razorpay-order', order), ('page', 'GET', '/', None))
+    n = 0
+    while not stop.is_set():
+        label, method, path, body = requests[n % 2]
+        n += 1
+        start = time.perf_counter()
+        conn = http.client.HTTPConnection('127.0.0.1', APP_PORT, timeout=60)
+        try:
+            conn.request(method, path, body=body, headers={'Content-Type': 'application/json', 'Cookie': cookie})
+            status = conn.getresponse().status
+        except OSError:
+            status = 'error'
+        finally:
+            conn.close()
+        latencies[label].append((time.perf_counter() - start, status))
+
+
+def run(worker_class, args):
+    proc = start_gunicorn(worker_class, args.workers, args.threads)
+    try:
+        cookie = login()
+        stop, latencies = threading.Event(), {'order': [], 'page': []}
+        threads = [threading.Thread(target=client, args=(cookie, stop, latencies)) for _ in range(args.clients)]
+        for t in threads:
+            t.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+    finally:
+        proc.terminate()
+        proc.wait()
+    total = sum(len(samples) for samples in latencies.values())
+    row = [f"{worker_class:<8} {total / args.seconds:>8.1f}"]
+    for label in ('order', 'page'):
+        times = sorted(t for t, _ in latencies[label])
+        errors = sum(1 for _, status in latencies[label] if status != 200)
+        row.append(f"{statistics.median(times) * 1000:>8.0f} {times[int(len(times) * 0.95)] * 1000:>8.0f} {errors:>6}")
+    print('  '.join(row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8, help='threads per gthread worker')
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--delay', type=float, default=0.2, help='seconds the stub takes per call')
+    parser.add_argument('--seconds', type=float, default=10.0, help='duration of each run')
+    args = parser.parse_args()
+
+    razorpay_stub.serve(STUB_PORT, os.environ['RAZORPAY_API_SECRET'], delay=args.delay, block=False)
+    with app.app_context():
+        settings.set_many({'accept_payment_mode': 'true'})
+
+    print(f"{args.workers} workers ({args.threads} threads each for gthread), {args.clients} clients, "
+          f"gateway {args.delay:g}s per call")
+    print(f"{'workers':<8} {'req/s':>8}  {'ord p50':>8} {'ord p95':>8} {'errors':>6}  "
+          f"{'page p50':>8} {'page p95':>8} {'errors':>6}   (latencies in ms)")
+    for worker_class in ('sync', 'gthread'):
+        run(worker_class, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Benchmark: session backends under concurrent workers.
+
+Runs the same request mix against a minimal Flask app using each backend
+from ``session_store.init_sessions``: Flask-Session's filesystem store (the
+old configuration) and the SQLite / WAL table.  The store is first filled
+with ``--existing`` other visitors' sessions, then ``--workers`` processes
+each log a client in and send ``--requests`` requests, one in
+``--write-every`` of which changes the session (the rest only read it, like
+page views).
+
+Usage:
+    python benchmarks/bench_sessions.py [--workers 4] [--requests 2000] [--existing 10000] [--write-every 10]
+
+Runs in a throw-away temp directory.
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix='yatra_bench_')
+sys.path.insert(0, ROOT)
+
+from flask import Flask, session  # noqa: E402
+
+from session_store import init_sessions  # noqa: E402
+
+BACKENDS = ('filesystem', 'sqlite')
+
+
+def make_app(backend):
+    app = Flask(__name__)
+    app.config.update(
+        SECRET_KEY='bench', SESSION_BACKEND=backend, SESSION_PERMANENT=False, SESSION_USE_SIGNER=True,
+        SESSION_FILE_DIR=os.path.join(WORKDIR, 'flask_session'),
+        SESSION_SQLITE_PATH=os.path.join(WORKDIR, 'sessions.sqlite3'),
+        SQLALCHEMY_DATABASE_URI='sqlite://', SESSION_GC_SECONDS=0,
+        PERMANENT_SESSION_LIFETIME=timedelta(days=31))
+    init_sessions(app)
+
+    @app.route('/login')
+    def login():
+        session['phone_verified'] = True
+        session['verified_phone'] = '+919000000000'
+        session['yatra_registrations'] = [{'yatra_id': i, 'passenger_id': i, 'hotel': 'Standard',
+                                           'travel': 'Bus', 'status': 'Interest'} for i in range(4)]
+        return 'ok'
+
+    @app.route('/page')
+    def page():
+        return str(len(session.get('yatra_registrations', [])))
+
+    @app.route('/select/<int:n>')
+    def select(n):
+        session['selected_yatra_id'] = n
+        return 'ok'
+
+    return app
+
+
+def fill(backend, n):
+    client = make_app(backend).test_client()
+    for _ in range(n):
+        client.get('/login')
+        client.delete_cookie('session')
+
+
+def worker(args):
+    backend, n_requests, write_every = args
+    client = make_app(backend).test_client()
+    client.get('/login')
+    latencies = []
+    for i in range(n_requests):
+        url = f'/select/{i}' if i % write_every == 0 else '/page'
+        start = time.perf_counter()
+        client.get(url)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run(backend, workers, n_requests, existing, write_every):
+    fill(backend, existing)
+    start = time.perf_counter()
+    with multiprocessing.get_context('fork').Pool(workers) as pool:
+        results = pool.map(worker, [(backend, n_requests, write_every)] * workers)
+    elapsed = time.perf_counter() - start
+    latencies = sorted(l for r in results for l in r)
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000
+    return len(latencies) / elapsed, statistics.median(latencies) * 1000, p95
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=2000, help='per worker')
+    parser.add_argument('--existing', type=int, default=10000, help='other sessions in the store')
+    parser.add_argument('--write-every', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers x {args.requests} requests, {args.existing} existing sessions, "
+          f"1 in {args.write_every} requests writes")
+    print(f"{'backend':<12} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for backend in BACKENDS:
+        rate, p50, p95 = run(backend, args.workers, args.requests, args.existing, args.write_every)
+        print(f"{backend:<12} {rate:>9.0f} {p50:>8.2f} {p95:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Benchmark: cold start of a worker (import of app.py) and the memory it starts with.
+
+Imports the app ``--runs`` times, each in a fresh interpreter like a newly
+forked gunicorn worker, against a throw-away SQLite database that is already
+migrated (the first, uncounted, start migrates it).  Reports the import time,
+process start to ready, and RSS after import, and exits with status 1 when
+the medians exceed ``--max-ms`` / ``--max-rss-mb`` or regress by more than
+``--tolerance`` against a ``--baseline`` saved earlier with ``--save-baseline``
+- so CI, or a developer before and after a change, can catch a slow import
+creeping back in.  ``python startup_profile.py`` shows where the time goes.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 7] [--max-ms 2000] [--max-rss-mb 120]
+    python benchmarks/bench_startup.py --save-baseline startup.json
+    python benchmarks/bench_startup.py --baseline startup.json [--tolerance 0.25]
+
+Runs in a throw-away temp directory.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix='yatra_bench_')
+sys.path.insert(0, ROOT)
+
+from startup_profile import run_child  # noqa: E402
+
+ENV = {
+    'DATABASE_URI': 'sqlite:///' + os.path.join(WORKDIR, 'bench.db'),
+    'SESSION_SQLITE_PATH': os.path.join(WORKDIR, 'sessions.sqlite3'),
+    'UPLOAD_STAGING_DIR': os.path.join(WORKDIR, 'upload_staging'),
+    'STARTUP_PROFILE': '0',
+}
+
+
+def measure(runs):
+    run_child(dict(ENV, SCHEMA_AUTO_MIGRATE='true'), cwd=WORKDIR)  # migrate the new database
+    samples = [run_child(ENV, cwd=WORKDIR)[:3] for _ in range(runs)]
+    walls, imports, rss = zip(*samples)
+    return {'import_ms': statistics.median(imports) * 1000, 'ready_ms': statistics.median(walls) * 1000,
+            'rss_mb': statistics.median(rss) / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--max-ms', type=float, default=2000, help='limit on the median import time of app')
+    parser.add_argument('--max-rss-mb', type=float, default=120, help='limit on the median RSS after import')
+    parser.add_argument('--baseline', help='JSON written by --save-baseline to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed regression against the baseline')
+    parser.add_argument('--save-baseline', help='write this run\'s medians to a JSON file')
+    args = parser.parse_args()
+
+    result = measure(args.runs)
+    print(f"{args.runs} cold starts (medians): import of app {result['import_ms']:.0f} ms, "
+          f"process start to ready {result['ready_ms']:.0f} ms, RSS after import {result['rss_mb']:.1f} MB")
+
+    failures = []
+    if result['import_ms'] > args.max_ms:
+        failures.append(f"import {result['import_ms']:.0f} ms > limit {args.max_ms:.0f} ms")
+    if result['rss_mb'] > args.max_rss_mb:
+        failures.append(f"RSS {result['rss_mb']:.1f} MB > limit {args.max_rss_mb:.1f} MB")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for key in ('import_ms', 'rss_mb'):
+            allowed = baseline[key] * (1 + args.tolerance)
+            if result[key] > allowed:
+                failures.append(f"{key} {result[key]:.1f} > baseline {baseline[key]:.1f} + {args.tolerance:.0%}")
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"Baseline written to {args.save_baseline}")
+
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
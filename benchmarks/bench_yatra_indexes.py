@@ -0,0 +1,123 @@
+"""Benchmark: hot yatra-table queries before and after the standard index set.
+
+Fills one dynamic yatra table with ``--rows`` registrations (default 100k),
+times the queries the app runs against it, then applies
+``yatra_store.ensure_yatra_indexes`` and times them again.
+
+Usage:
+    python benchmarks/bench_yatra_indexes.py [--rows 100000] [--repeat 200]
+
+Runs against a throw-away SQLite database in a temp directory.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix='yatra_bench_')
+os.environ['DATABASE_URI'] = 'sqlite:///' + os.path.join(WORKDIR, 'bench.db')
+sys.path.insert(0, ROOT)
+os.chdir(WORKDIR)
+
+from sqlalchemy import text  # noqa: E402
+
+from app import app, db  # noqa: E402
+from yatra_store import create_yatra_table, ensure_yatra_indexes  # noqa: E402
+
+TABLE = 'yatra_index_bench'
+LOGINS = 25000  # ~4 travellers per login
+
+
+def seed(n_rows):
+    create_yatra_table(TABLE)
+    rng = random.Random(42)
+    statuses = ['Interest'] * 6 + ['Paid'] * 3 + ['Pending']
+    batch = []
+    for i in range(n_rows):
+        login = i % LOGINS
+        batch.append({
+            'lid': f'+91{9000000000 + login}', 'nm': f'Pilgrim {i}', 'pid': i + 1,
+            'st': rng.choice(statuses),
+            'ts': f'2026-{1 + i % 12:02d}-{1 + i % 28:02d} {i % 24:02d}:{i % 60:02d}:00',
+        })
+        if len(batch) == 5000:
+            _insert(batch)
+            batch = []
+    if batch:
+        _insert(batch)
+    db.session.commit()
+
+
+def _insert(batch):
+    db.session.execute(text(
+        f"INSERT INTO {TABLE} (login_id, name, year_of_birth, gender, passenger_id, status, created_at, hotel_package, travel_package) "
+        f"VALUES (:lid, :nm, 1975, 'Female', :pid, :st, :ts, 'Standard', 'Bus')"), batch)
+
+
+def workloads(n_rows):
+    rng = random.Random(7)
+
+    def pick():
+        i = rng.randrange(n_rows)
+        return {'lid': f'+91{9000000000 + i % LOGINS}', 'nm': f'Pilgrim {i}', 'pid': i + 1}
+
+    return [
+        ('dashboard SELECT by login_id',
+         f"SELECT name, status, passenger_id FROM {TABLE} WHERE login_id = :lid", pick),
+        ('save_package SELECT passenger/name',
+         f"SELECT status, razorpay_id FROM {TABLE} WHERE passenger_id = :pid OR (passenger_id IS NULL AND login_id = :lid AND name = :nm)",
+         pick),
+        ('payment UPDATE by login+name',
+         f"UPDATE {TABLE} SET razorpay_id = razorpay_id WHERE login_id = :lid AND name = :nm", pick),
+        ('edit sync UPDATE by passenger_id',
+         f"UPDATE {TABLE} SET city = city WHERE passenger_id = :pid", pick),
+        ('admin grid first page by created_at',
+         f"SELECT id, name, status FROM {TABLE} ORDER BY created_at DESC LIMIT 50", lambda: {}),
+        ('admin Paid filter page',
+         f"SELECT id, name FROM {TABLE} WHERE status = 'Paid' ORDER BY created_at DESC LIMIT 50", lambda: {}),
+    ]
+
+
+def run(n_rows, repeat):
+    results = {}
+    for label, sql, params in workloads(n_rows):
+        stmt = text(sql)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = db.session.execute(stmt, params())
+            if result.returns_rows:
+                result.fetchall()
+        db.session.rollback()
+        results[label] = (time.perf_counter() - start) / repeat * 1000
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    with app.app_context():
+        print(f"Seeding {args.rows} rows into {TABLE}...")
+        seed(args.rows)
+        before = run(args.rows, args.repeat)
+        start = time.perf_counter()
+        created = ensure_yatra_indexes(TABLE)
+        db.session.commit()
+        build_s = time.perf_counter() - start
+        after = run(args.rows, args.repeat)
+        assert ensure_yatra_indexes(TABLE) == [], 'backfill must be idempotent'
+
+    print(f"Built {len(created)} indexes in {build_s:.2f}s")
+    print(f"{'query':<38} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for label in before:
+        b, a = before[label], after[label]
+        print(f"{label:<38} {b:>10.3f} {a:>10.3f} {b / a if a else float('inf'):>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Vendor, fingerprint and precompress the CSS / JS / JSON assets under static/.
+
+Downloads the pinned third-party files (static_assets.VENDOR_FILES) that are
+missing from static/vendor, then writes content-hashed copies of every asset
+with .gz / .br siblings to static/dist and updates its manifest.  Pages pick
+up the new names within seconds.  The deploy (.github/workflows/deploy.yml)
+runs it on every release.
+
+Usage:
+    python build_assets.py [--offline] [--force-vendor] [--prune]
+
+--offline       skip downloading; use what is already in static/vendor
+--force-vendor  download the vendored files again
+--prune         afterwards delete built files the manifest no longer uses
+                (only once no cached page can still link to the old ones)
+"""
+import argparse
+import os
+import time
+
+from static_assets import build_assets, dist_root, prune_assets, vendor_assets
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def build(offline=False, force_vendor=False, prune=False):
+    static_root = os.path.join(ROOT, 'static')
+    out_root = dist_root(ROOT)
+    start = time.perf_counter()
+    if not offline:
+        print("Vendoring third-party assets...")
+        print(f"{vendor_assets(static_root, force=force_vendor)} files downloaded.")
+    print(f"Fingerprinting assets into {out_root}...")
+    written, unchanged = build_assets(static_root, out_root)
+    print(f"Assets complete in {time.perf_counter() - start:.1f}s ({written} written, {unchanged} unchanged).")
+    if prune:
+        print(f"Pruned {prune_assets(out_root)} unused files.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--offline', action='store_true')
+    parser.add_argument('--force-vendor', action='store_true')
+    parser.add_argument('--prune', action='store_true')
+    args = parser.parse_args()
+    build(args.offline, args.force_vendor, args.prune)
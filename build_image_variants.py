@@ -0,0 +1,40 @@
+"""Build the resized WebP / JPEG variants of everything under static/images.
+
+Incremental: photos whose size and mtime match the manifest are skipped, and
+outputs are keyed by content hash, so only new or changed photos are resized.
+Run it after adding photos (the deploy does it on every release).
+
+Usage:
+    python build_image_variants.py [--workers N] [--force] [--prune]
+
+--force  re-encode everything (e.g. after changing the quality settings)
+--prune  afterwards delete variant files no photo uses any more
+"""
+import argparse
+import os
+import time
+
+from image_variants import VARIANT_WIDTHS, build_variants, derivatives_root, prune_variants
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def build(workers=None, force=False, prune=False):
+    images_root = os.path.join(ROOT, 'static', 'images')
+    out_root = derivatives_root(ROOT)
+    print(f"Building image variants ({', '.join(map(str, VARIANT_WIDTHS))}px) into {out_root}...")
+    start = time.perf_counter()
+    processed, skipped, removed = build_variants(images_root, out_root, workers=workers, force=force)
+    print(f"Image variants complete in {time.perf_counter() - start:.1f}s "
+          f"({processed} processed, {skipped} unchanged, {removed} sources gone).")
+    if prune:
+        print(f"Pruned {prune_variants(out_root)} unused variant files.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: one per CPU)')
+    parser.add_argument('--force', action='store_true')
+    parser.add_argument('--prune', action='store_true')
+    args = parser.parse_args()
+    build(args.workers, args.force, args.prune)
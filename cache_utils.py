@@ -0,0 +1,124 @@
+"""Small building blocks for the in-process caches.
+
+Each gunicorn worker keeps its own copy of cached data, so a change made in one
+worker has to be announced to the others.  ``VersionStamp`` does that with a
+single row in ``app_settings``: writers bump it, readers compare it against the
+value they loaded with, re-reading it at most once per ``check_interval_ms``.
+``LRUCache`` is a size- and age-bounded map with hit/miss counters.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from sqlalchemy import text
+
+from models import db, AppSettings
+
+
+class VersionStamp:
+    """A shared version marker stored as an ``app_settings`` row."""
+
+    def __init__(self, key, check_interval_ms=1000):
+        self.key = key
+        self.check_interval = check_interval_ms / 1000.0
+        self._value = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self, force=False):
+        """Return the stamp, re-reading it from the database if the check interval elapsed."""
+        now = time.monotonic()
+        if force or self._value is None or now - self._checked_at >= self.check_interval:
+            row = db.session.execute(
+                text("SELECT value FROM app_settings WHERE key = :k"), {'k': self.key}
+            ).fetchone()
+            with self._lock:
+                self._value = row[0] if row and row[0] else '0'
+                self._checked_at = now
+        return self._value
+
+    def bump(self):
+        """Publish a new stamp so every worker drops what it cached.
+
+        Commits on its own, so call it *after* the change it announces has been
+        committed.
+        """
+        stamp = uuid.uuid4().hex
+        for _ in range(2):
+            try:
+                row = AppSettings.query.filter_by(key=self.key).first()
+                if not row:
+                    row = AppSettings(key=self.key)
+                    db.session.add(row)
+                row.value = stamp
+                db.session.commit()
+                break
+            except Exception:
+                # Another worker inserted the row at the same time - retry as an update
+                db.session.rollback()
+        with self._lock:
+            self._value = stamp
+            self._checked_at = time.monotonic()
+        return stamp
+
+
+class LRUCache:
+    """Thread-safe LRU map with a TTL and hit/miss counters.
+
+    Entries can carry a ``tag`` (e.g. a version stamp); ``get`` with a different
+    tag treats the entry as stale, drops it and reports a miss.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get(self, key, tag=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, entry_tag, stored_at = entry
+                if entry_tag == tag and now - stored_at < self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value, tag=None):
+        with self._lock:
+            self._data[key] = (value, tag, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key):
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,328 @@
+"""Database index of the photo catalog under static/images.
+
+The catalog pages used to ``os.listdir`` and sort whole folders of multi-MB
+photos on every hit, with the allowed folder names hardcoded in each route.
+Now every sub-directory of static/images is an album (``CatalogAlbum``) and
+every image in it a ``CatalogPhoto`` row holding its size, pixel dimensions,
+sha256 and natural sort key.  The routes only query those rows.
+
+``scan_catalog`` keeps the index in step with the disk.  A folder is listed
+again only when its mtime moved (a file was added, removed or renamed), and
+within it a file is re-read only when its size or mtime changed.  Replacing a
+file in place does not touch the folder mtime - run ``scan_catalog.py --force``
+after doing that by hand.  Uploads and deletes through the admin catalog
+manager update the index directly.
+
+The stored sha256 doubles as the photo's HTTP validator: image URLs carry
+``?v=<hash prefix>`` (``photo_version``) so browsers may cache them for good,
+and ``FingerprintCache`` lets the image route answer conditional requests
+from one ``stat`` of the file.
+"""
+import hashlib
+import os
+import re
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, CatalogAlbum, CatalogPhoto, get_india_time
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+# Albums that existed before the index, in the order the catalog page always showed them
+DEFAULT_ALBUM_ORDER = ('Vrindavan', 'Banaras', 'Jagannath Puri')
+_HASH_CHUNK = 1024 * 1024
+
+
+def catalog_root(app_root):
+    return os.path.join(app_root, 'static', 'images')
+
+
+def is_catalog_image(filename):
+    return filename.lower().endswith(IMAGE_EXTENSIONS) and not filename.startswith('.')
+
+
+def natural_sort_key(filename):
+    """Case-insensitive key that orders embedded numbers by value ('img 2' < 'img 10')."""
+    return re.sub(r'\d+', lambda m: m.group(0).zfill(10), filename.lower())[:255]
+
+
+# ── File metadata ──
+
+def image_size(path):
+    """``(width, height)`` read from the image header, ``(None, None)`` if unknown.
+
+    Only the first few bytes are read - enough for PNG, GIF, WebP and the
+    JPEG frame header, which is all the catalog accepts.
+    """
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(32)
+            if head[:8] == b'\x89PNG\r\n\x1a\n' and head[12:16] == b'IHDR':
+                return struct.unpack('>II', head[16:24])
+            if head[:6] in (b'GIF87a', b'GIF89a'):
+                return struct.unpack('<HH', head[6:10])
+            if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+                return _webp_size(head)
+            if head[:2] == b'\xff\xd8':
+                f.seek(2)
+                return _jpeg_size(f)
+    except (OSError, struct.error):
+        pass
+    return None, None
+
+
+def _webp_size(head):
+    chunk = head[12:16]
+    if chunk == b'VP8 ':
+        w, h = struct.unpack('<HH', head[26:30])
+        return w & 0x3fff, h & 0x3fff
+    if chunk == b'VP8L':
+        b = head[21:25]
+        w = 1 + (((b[1] & 0x3f) << 8) | b[0])
+        h = 1 + (((b[3] & 0x0f) << 10) | (b[2] << 2) | ((b[1] & 0xc0) >> 6))
+        return w, h
+    if chunk == b'VP8X':
+        w = 1 + int.from_bytes(head[24:27], 'little')
+        h = 1 + int.from_bytes(head[27:30], 'little')
+        return w, h
+    return None, None
+
+
+def _jpeg_size(f):
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xff:
+            return None, None
+        code = marker[1]
+        if code == 0xff:  # padding
+            f.seek(-1, os.SEEK_CUR)
+            continue
+        if code in (0x01, 0xd8) or 0xd0 <= code <= 0xd7:  # markers without a length
+            continue
+        length = struct.unpack('>H', f.read(2))[0]
+        # SOF0..SOF15 except DHT (c4), JPG (c8) and DAC (cc)
+        if 0xc0 <= code <= 0xcf and code not in (0xc4, 0xc8, 0xcc):
+            h, w = struct.unpack('>xHH', f.read(5))
+            return w, h
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _fill_photo(photo, path, st):
+    photo.size_bytes = st.st_size
+    photo.file_mtime = st.st_mtime
+    photo.width, photo.height = image_size(path)
+    photo.content_hash = file_sha256(path)
+    photo.sort_key = natural_sort_key(photo.filename)
+
+
+# ── Scanning ──
+
+def _refresh_album_summary(album):
+    first = album.photos.order_by(CatalogPhoto.sort_key, CatalogPhoto.filename).first()
+    album.cover_filename = first.filename if first else None
+    album.cover_hash = first.content_hash if first else None
+    album.photo_count = album.photos.count()
+
+
+def scan_album(album, folder_path, force=False):
+    """Bring the rows of ``album`` in line with ``folder_path``.  Returns the
+    number of files (re-)read.  Does not commit."""
+    on_disk = {}
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if entry.is_file() and is_catalog_image(entry.name):
+                on_disk[entry.name] = entry.stat()
+
+    read = 0
+    known = {photo.filename: photo for photo in album.photos}
+    for filename, photo in known.items():
+        if filename not in on_disk:
+            db.session.delete(photo)
+    for filename, st in on_disk.items():
+        photo = known.get(filename)
+        if photo and not force and photo.size_bytes == st.st_size and photo.file_mtime == st.st_mtime:
+            continue
+        if photo is None:
+            photo = CatalogPhoto(album=album, filename=filename)
+            db.session.add(photo)
+        _fill_photo(photo, os.path.join(folder_path, filename), st)
+        read += 1
+
+    db.session.flush()
+    _refresh_album_summary(album)
+    album.scanned_at = get_india_time()
+    return read
+
+
+def scan_catalog(root, force=False, log=None):
+    """Index every sub-directory of ``root``; only folders whose mtime changed
+    (all of them with ``force``) are listed.  Commits.  Returns a summary dict."""
+    stats = {'albums': 0, 'rescanned': 0, 'files_read': 0, 'removed': 0}
+    albums = {album.folder: album for album in CatalogAlbum.query.all()}
+    folders = {}
+    if os.path.isdir(root):
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.is_dir() and not entry.name.startswith('.'):
+                    folders[entry.name] = entry.stat().st_mtime
+
+    for folder, album in albums.items():
+        if folder not in folders:
+            db.session.delete(album)
+            stats['removed'] += 1
+
+    next_order = max([a.sort_order or 0 for a in albums.values()] + [len(DEFAULT_ALBUM_ORDER)])
+    for folder in sorted(folders, key=natural_sort_key):
+        mtime = folders[folder]
+        album = albums.get(folder)
+        if album is None:
+            if folder in DEFAULT_ALBUM_ORDER:
+                order = DEFAULT_ALBUM_ORDER.index(folder)
+            else:
+                next_order += 1
+                order = next_order
+            album = CatalogAlbum(folder=folder, sort_order=order)
+            db.session.add(album)
+        stats['albums'] += 1
+        if not force and album.dir_mtime == mtime:
+            continue
+        stats['files_read'] += scan_album(album, os.path.join(root, folder), force=force)
+        album.dir_mtime = mtime
+        stats['rescanned'] += 1
+        if log:
+            log(f"{folder}: {album.photo_count} photos")
+
+    db.session.commit()
+    return stats
+
+
+_scan_lock = threading.Lock()
+_last_scan = 0.0
+
+
+def maybe_scan(root, interval_seconds, logger=None):
+    """Run ``scan_catalog`` at most once per ``interval_seconds`` in this worker.
+
+    Unchanged folders cost one ``stat`` each, so this is cheap to call from the
+    catalog routes.  Errors are logged and swallowed - the pages then serve
+    the index as it was.
+    """
+    global _last_scan
+    now = time.monotonic()
+    if now - _last_scan < interval_seconds or not _scan_lock.acquire(blocking=False):
+        return
+    try:
+        _last_scan = now
+        scan_catalog(root)
+    except IntegrityError:
+        # Another worker indexed the same folder at the same moment
+        db.session.rollback()
+    except Exception as e:
+        db.session.rollback()
+        if logger:
+            logger.error(f"Catalog scan failed: {e}")
+    finally:
+        _scan_lock.release()
+
+
+# ── Lookups and admin changes ──
+
+def list_albums():
+    return CatalogAlbum.query.order_by(CatalogAlbum.sort_order, CatalogAlbum.folder).all()
+
+
+def get_album(folder):
+    return CatalogAlbum.query.filter_by(folder=folder).first()
+
+
+def album_photos(album):
+    return album.photos.order_by(CatalogPhoto.sort_key, CatalogPhoto.filename).all()
+
+
+def get_photo(album, filename):
+    return album.photos.filter_by(filename=filename).first()
+
+
+def add_photo(album, folder_path, filename):
+    """Index a file just written into ``folder_path``.  Does not commit."""
+    path = os.path.join(folder_path, filename)
+    photo = get_photo(album, filename) or CatalogPhoto(album=album, filename=filename)
+    db.session.add(photo)
+    _fill_photo(photo, path, os.stat(path))
+    db.session.flush()
+    _refresh_album_summary(album)
+    return photo
+
+
+def remove_photo(album, photo):
+    """Drop ``photo`` from the index.  Does not commit or touch the file."""
+    db.session.delete(photo)
+    db.session.flush()
+    _refresh_album_summary(album)
+
+
+# ── Serving ──
+
+VERSION_LENGTH = 12
+
+
+def photo_version(content_hash):
+    """The ``?v=`` value put in image URLs; changes whenever the content does."""
+    return content_hash[:VERSION_LENGTH] if content_hash else None
+
+
+class FingerprintCache:
+    """Content hashes of served catalog files, keyed by path.
+
+    An entry is reused while ``os.stat`` reports the size and mtime it was
+    recorded with, so a repeat request costs one ``stat`` - the file is not
+    opened, hashed or looked up in the database.  Least recently used entries
+    are dropped past ``max_entries``.
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, st):
+        with self._lock:
+            hit = self._entries.get(path)
+            if hit and hit[0] == st.st_size and hit[1] == st.st_mtime:
+                self._entries.move_to_end(path)
+                return hit[2]
+        return None
+
+    def put(self, path, st, content_hash):
+        with self._lock:
+            self._entries[path] = (st.st_size, st.st_mtime, content_hash)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def photo_fingerprint(album, filename, path, st):
+    """sha256 of ``path``: the indexed hash while the row still matches the
+    file on disk, otherwise read from the file."""
+    photo = get_photo(album, filename)
+    if photo and photo.content_hash and photo.size_bytes == st.st_size and photo.file_mtime == st.st_mtime:
+        return photo.content_hash
+    return file_sha256(path)
+
+
+fingerprint_cache = FingerprintCache()
@@ -0,0 +1,229 @@
+"""Streaming table exports for the admin panel.
+
+The exports used to collect every row into a list of dicts, build a pandas
+DataFrame from it and serialise that into an in-memory buffer - several full
+copies of the table inside one worker.  Here rows are read through a
+server-side cursor (``yield_per``: a named cursor on PostgreSQL, SQLite's own
+lazy cursor otherwise) and written out as they arrive: CSV in small chunks,
+XLSX through openpyxl's write-only workbook, which streams each sheet to disk
+instead of building the whole object model.
+
+Each ``ExportSpec`` keeps the column layout the exports always had.
+"""
+import csv
+import io
+import itertools
+import tempfile
+from collections import namedtuple
+from datetime import date, datetime
+
+from sqlalchemy import text
+
+from models import db
+
+# Rows fetched from the database per round trip
+EXPORT_BATCH_SIZE = 1000
+# Rows written per chunk handed to the WSGI server
+CSV_CHUNK_ROWS = 500
+# Finished workbooks up to this size stay in memory; larger ones go to a temp file
+XLSX_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+# kind: text, int, date (YYYY-MM-DD), datetime (YYYY-MM-DD HH:MM),
+#       timestamp (as stored), bool (Yes / No)
+ExportColumn = namedtuple('ExportColumn', 'header expr kind')
+
+
+class ExportSpec:
+    def __init__(self, name, filename, from_sql, columns, order_by='created_at DESC'):
+        self.name = name
+        self.filename = filename
+        self.from_sql = from_sql
+        self.columns = columns
+        self.order_by = order_by
+
+    @property
+    def headers(self):
+        return [c.header for c in self.columns]
+
+    def sql(self):
+        return (f"SELECT {', '.join(c.expr for c in self.columns)} "
+                f"FROM {self.from_sql} ORDER BY {self.order_by}")
+
+
+PASSENGERS_EXPORT = ExportSpec('passengers', 'passengers', 'login_details', [
+    ExportColumn('Login ID', 'login_id', 'text'),
+    ExportColumn('Name', 'name', 'text'),
+    ExportColumn('Aadhar No', 'aadhar', 'text'),
+    ExportColumn('Year of Birth', 'year_of_birth', 'int'),
+    ExportColumn('Gender', 'gender', 'text'),
+    ExportColumn('Phone', 'phone', 'text'),
+    ExportColumn('Email', 'email', 'text'),
+    ExportColumn('City', 'city', 'text'),
+    ExportColumn('District', 'district', 'text'),
+    ExportColumn('State', 'state', 'text'),
+    ExportColumn('Created At', 'created_at', 'datetime'),
+])
+
+YATRA_DETAILS_EXPORT = ExportSpec('yatra_details', 'yatra_details', 'yatra_details', [
+    ExportColumn('ID', 'id', 'int'),
+    ExportColumn('Title', 'title', 'text'),
+    ExportColumn('Starting Date', 'starting_date', 'date'),
+    ExportColumn('Fixed Start', 'is_start_fixed', 'bool'),
+    ExportColumn('End Date', 'end_date', 'date'),
+    ExportColumn('Fixed End', 'is_end_fixed', 'bool'),
+    ExportColumn('Hotel Packages', 'hotel_packages', 'text'),
+    ExportColumn('Travel Packages', 'travel_packages', 'text'),
+    ExportColumn('Message', 'yatra_message', 'text'),
+    ExportColumn('Link', 'yatra_link', 'text'),
+    ExportColumn('Created At', 'created_at', 'datetime'),
+])
+
+_YATRA_EXPORT_COLUMNS = [
+    ExportColumn('Order ID', 'order_id', 'text'),
+    ExportColumn('ID', 'id', 'int'),
+    ExportColumn('Login ID', 'login_id', 'text'),
+    ExportColumn('Name', 'name', 'text'),
+    ExportColumn('Year of Birth', 'year_of_birth', 'int'),
+    ExportColumn('Email', 'email', 'text'),
+    ExportColumn('Phone', 'phone', 'text'),
+    ExportColumn('Gender', 'gender', 'text'),
+    ExportColumn('City', 'city', 'text'),
+    ExportColumn('District', 'district', 'text'),
+    ExportColumn('State', 'state', 'text'),
+    ExportColumn('Hotel Package', 'hotel_package', 'text'),
+    ExportColumn('Travel Package', 'travel_package', 'text'),
+    ExportColumn('Start Date', 'start_date', 'text'),
+    ExportColumn('End Date', 'end_date', 'text'),
+    ExportColumn('Status', 'status', 'text'),
+    ExportColumn('Razorpay ID', 'razorpay_id', 'text'),
+    ExportColumn('Created At', 'created_at', 'timestamp'),
+]
+
+
+def yatra_export(table_name):
+    """Spec for a dynamic yatra table.  ``table_name`` must already have passed
+    ``_is_valid_table`` - it is inlined into the SQL."""
+    return ExportSpec(table_name, f'{table_name}_export', table_name, _YATRA_EXPORT_COLUMNS)
+
+
+def iter_rows(spec, batch_size=EXPORT_BATCH_SIZE):
+    """Yield raw result rows of ``spec`` without loading the whole table."""
+    result = db.session.execute(text(spec.sql()).execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        yield from partition
+
+
+def first_and_rest(rows):
+    """Split off the first row so callers can bail out on an empty export
+    before committing to a streamed response.  Returns ``(None, None)`` if empty."""
+    first = next(rows, None)
+    if first is None:
+        return None, None
+    return first, itertools.chain([first], rows)
+
+
+# ── CSV ──
+
+def _csv_value(kind, value):
+    if kind == 'bool':
+        return 'Yes' if value in (True, 1, '1', 'true') else 'No'
+    if value is None:
+        return ''
+    if kind == 'datetime':
+        return value.strftime('%Y-%m-%d %H:%M') if isinstance(value, datetime) else str(value)[:16]
+    if kind == 'date':
+        return value.strftime('%Y-%m-%d') if isinstance(value, date) else str(value)[:10]
+    return value
+
+
+def csv_chunks(spec, rows, chunk_rows=CSV_CHUNK_ROWS):
+    """Encode ``rows`` as UTF-8 CSV, yielding a bytes chunk every ``chunk_rows`` rows."""
+    kinds = [c.kind for c in spec.columns]
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator='\n')
+    writer.writerow(spec.headers)
+    for count, row in enumerate(rows, 1):
+        writer.writerow([_csv_value(kind, value) for kind, value in zip(kinds, row)])
+        if count % chunk_rows == 0:
+            yield buf.getvalue().encode('utf-8')
+            buf.seek(0)
+            buf.truncate(0)
+    if buf.tell():
+        yield buf.getvalue().encode('utf-8')
+
+
+# ── XLSX ──
+
+# Excel number formats matching how the CSV export prints these kinds
+_XLSX_FORMATS = {
+    'date': 'yyyy-mm-dd',
+    'datetime': 'yyyy-mm-dd hh:mm',
+    'timestamp': 'yyyy-mm-dd hh:mm:ss',
+}
+
+
+def _to_datetime(value):
+    """Real datetime for a DB value (SQLite hands timestamps back as text)."""
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)  # Excel has no time zones
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    try:
+        return datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        return None
+
+
+def _xlsx_value(kind, value):
+    if kind == 'bool':
+        return 'Yes' if value in (True, 1, '1', 'true') else 'No'
+    if value is None or value == '':
+        return None
+    if kind in _XLSX_FORMATS:
+        parsed = _to_datetime(value)
+        if parsed is None:
+            return str(value)  # not a recognisable date - keep what was stored
+        return parsed.date() if kind == 'date' else parsed
+    return value
+
+
+def write_xlsx(spec, rows, spool_max_bytes=XLSX_SPOOL_MAX_BYTES):
+    """Write ``rows`` into a one-sheet workbook with openpyxl's write-only mode.
+
+    Returns a file object positioned at 0: in memory while the workbook is
+    below ``spool_max_bytes``, a temp file on disk above it.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Border, Font, Side
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Data')
+
+    # Same header look pandas' to_excel gave the old export
+    thin = Side(style='thin')
+    header_font = Font(bold=True)
+    header_border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    header_align = Alignment(horizontal='center', vertical='top')
+    header_row = []
+    for header in spec.headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font, cell.border, cell.alignment = header_font, header_border, header_align
+        header_row.append(cell)
+    ws.append(header_row)
+
+    kinds = [c.kind for c in spec.columns]
+    date_cols = {i: _XLSX_FORMATS[kind] for i, kind in enumerate(kinds) if kind in _XLSX_FORMATS}
+    for row in rows:
+        values = [_xlsx_value(kind, value) for kind, value in zip(kinds, row)]
+        for i, number_format in date_cols.items():
+            if isinstance(values[i], (date, datetime)):
+                cell = WriteOnlyCell(ws, value=values[i])
+                cell.number_format = number_format
+                values[i] = cell
+        ws.append(values)
+
+    output = tempfile.SpooledTemporaryFile(max_size=spool_max_bytes)
+    wb.save(output)
+    output.seek(0)
+    return output
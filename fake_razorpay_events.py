@@ -0,0 +1,117 @@
+"""Send fake, correctly signed Razorpay webhook events to the app.
+
+For load-testing /razorpay/webhook and the reconciler without Razorpay.
+Events are ``payment.captured`` (with ``--failed-share`` of them
+``payment.failed``) for random order ids, or - with ``--from-db`` - for the
+unpaid orders in payment_orders, so they really mark registrations Paid.
+``--duplicates`` of the deliveries repeat an earlier event id, as Razorpay's
+redeliveries do.
+
+Usage:
+    RAZORPAY_WEBHOOK_SECRET=whsec python app.py
+    python fake_razorpay_events.py --url http://127.0.0.1:5000/razorpay/webhook --secret whsec \\
+        [--events 2000] [--concurrency 16] [--duplicates 0.1] [--failed-share 0.05] [--from-db]
+"""
+import argparse
+import hashlib
+import hmac
+import http.client
+import json
+import random
+import statistics
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+
+def make_event(order_id, amount, status='captured'):
+    """A webhook body shaped like Razorpay's, and its event id."""
+    event = 'payment.captured' if status == 'captured' else 'payment.failed'
+    payment = {'id': f"pay_{uuid.uuid4().hex[:14]}", 'entity': 'payment', 'amount': amount, 'currency': 'INR',
+               'status': status, 'order_id': order_id, 'method': 'upi', 'captured': status == 'captured'}
+    body = {'entity': 'event', 'account_id': 'acc_fake', 'event': event, 'contains': ['payment'],
+            'payload': {'payment': {'entity': payment}}, 'created_at': int(time.time())}
+    return f"evt_{uuid.uuid4().hex[:14]}", json.dumps(body).encode()
+
+
+def orders_from_db():
+    from app import app
+    from models import PaymentOrder
+    with app.app_context():
+        return [(o.order_id, o.amount) for o in PaymentOrder.query.filter(PaymentOrder.status != 'paid').all()]
+
+
+def send_all(url, secret, deliveries, concurrency):
+    """POST ``deliveries`` [(event_id, body)] from ``concurrency`` keep-alive
+    connections; returns (latencies, status counts, elapsed seconds)."""
+    parts = urlsplit(url)
+    latencies, statuses, lock = [], {}, threading.Lock()
+    queue = list(reversed(deliveries))
+
+    def worker():
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        while True:
+            with lock:
+                if not queue:
+                    break
+                event_id, body = queue.pop()
+            headers = {'Content-Type': 'application/json', 'X-Razorpay-Event-Id': event_id,
+                       'X-Razorpay-Signature': hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()}
+            start = time.perf_counter()
+            try:
+                conn.request('POST', parts.path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+                status = type(e).__name__
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+        conn.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, statuses, time.perf_counter() - start
+
+
+def run(url, secret, n_events, concurrency, duplicates, failed_share, from_db):
+    orders = orders_from_db() if from_db else []
+    if from_db and not orders:
+        print("No unpaid orders in payment_orders.")
+        return
+    deliveries = []
+    for i in range(n_events):
+        if deliveries and random.random() < duplicates:
+            deliveries.append(random.choice(deliveries))
+            continue
+        order_id, amount = orders[i % len(orders)] if orders else (f"order_{uuid.uuid4().hex[:14]}", 100000)
+        deliveries.append(make_event(order_id, amount, 'failed' if random.random() < failed_share else 'captured'))
+
+    latencies, statuses, elapsed = send_all(url, secret, deliveries, concurrency)
+    latencies.sort()
+    print(f"{len(latencies)} deliveries in {elapsed:.2f}s ({len(latencies) / elapsed:.0f}/s), "
+          f"concurrency {concurrency}")
+    print(f"latency p50 {statistics.median(latencies) * 1000:.1f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms")
+    print(f"responses: {dict(sorted(statuses.items(), key=str))}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5000/razorpay/webhook')
+    parser.add_argument('--secret', required=True, help='the app\'s RAZORPAY_WEBHOOK_SECRET')
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duplicates', type=float, default=0.1, help='share of deliveries that repeat an event')
+    parser.add_argument('--failed-share', type=float, default=0.05, help='share of payment.failed events')
+    parser.add_argument('--from-db', action='store_true', help='pay the unpaid orders in payment_orders')
+    args = parser.parse_args()
+    run(args.url, args.secret, args.events, args.concurrency, args.duplicates, args.failed_share, args.from_db)
@@ -1,4 +1,5 @@
-from app import app, db, AppSettings
+from app import app, db
+from models import AppSettings
 with app.app_context():
     setting = AppSettings.query.filter_by(key='recent_yatra_youtube').first()
     if setting and 'youtu.be' in setting.value:
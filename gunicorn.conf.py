@@ -0,0 +1,130 @@
+"""Production gunicorn settings (read automatically from the working directory).
+
+* gthread workers: requests mostly wait on the database and Razorpay, so each
+  worker serves ``GUNICORN_THREADS`` of them at once.  Workers default to
+  CPU count + 1; resizing photos happens on background threads
+  (upload_pipeline) and variants are built offline.
+* ``preload_app``: the master imports the app once and workers fork from it,
+  sharing its memory and skipping the ~1s import each.  Database connections
+  the master opened during the import are closed before forking, and
+  start-up work that starts threads (``app.start_worker_services``) runs in
+  each worker after the fork.
+* Workers are replaced after ``GUNICORN_MAX_REQUESTS`` requests (with
+  jitter, so they do not all restart together) or once their RSS passes
+  ``GUNICORN_MAX_WORKER_RSS_MB``; the old worker finishes what it is serving.
+* ``kill -HUP <master>`` (``ExecReload=/bin/kill -s HUP $MAINPID`` in the
+  systemd unit, so the deploy's ``systemctl reload-or-restart`` uses it)
+  reloads without dropping requests: the master imports the new code and
+  checks /healthz against it (database reachable, schema current) before
+  forking new workers, and the old ones get ``graceful_timeout`` to finish
+  their requests.  If the import or the check fails, the new workers run the
+  code already loaded and the error is logged.  Without preload, HUP just
+  starts new workers that import the code themselves.
+
+Command line options still override these, e.g. ``gunicorn -w 2 app:app``.
+"""
+import multiprocessing
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+wsgi_app = 'app:app'
+bind = os.getenv('GUNICORN_BIND', '127.0.0.1:8000')
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.getenv('GUNICORN_WORKERS', '0')) or multiprocessing.cpu_count() + 1
+# Keep RAZORPAY_MAX_PENDING well below this (see app.py)
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Seconds: silent worker before it is killed, in-flight requests allowed to finish on
+# reload / shutdown (above RAZORPAY_CALL_DEADLINE), keep-alive behind the proxy
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = max_requests // 10
+max_worker_rss_mb = int(os.getenv('GUNICORN_MAX_WORKER_RSS_MB', '300'))
+
+proc_name = 'yatra'
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'  # worker heartbeat files off the (possibly slow) disk
+
+if preload_app:
+    os.environ['WORKER_SERVICES_DEFERRED'] = '1'
+
+
+def _rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # peak, KB on Linux
+
+
+def _close_db_connections(flask_app, close=True):
+    db = flask_app.extensions['sqlalchemy']  # this app's own, also for the code replaced on reload
+    with flask_app.app_context():
+        db.engine.dispose(close=close)
+
+
+def _app_modules():
+    """Modules of this repository (not of the virtualenv inside it)."""
+    found = {}
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, '__file__', None) or ''
+        if path.startswith(ROOT + os.sep) and 'site-packages' not in path and name != '__config__':
+            found[name] = module
+    return found
+
+
+def when_ready(server):
+    if preload_app:
+        _close_db_connections(server.app.wsgi())  # workers open their own
+    server.log.info(f"{workers} {worker_class} workers x {threads} threads, preload={preload_app}")
+
+
+def on_reload(server):
+    """HUP: load the new code in the master, if it passes /healthz (see above)."""
+    if not preload_app:
+        return
+    old_app, old_modules = server.app.callable, _app_modules()
+    for name in old_modules:
+        del sys.modules[name]
+    server.app.callable = None
+    try:
+        new_app = server.app.wsgi()
+        # The view itself: a test request would start per-process threads (session GC) in the master
+        with new_app.app_context():
+            response = new_app.make_response(new_app.view_functions['healthz']())
+        if response.status_code != 200:
+            raise RuntimeError(f"/healthz answered {response.status_code}: {response.get_data(as_text=True)}")
+        _close_db_connections(new_app)
+    except Exception as e:
+        server.log.error(f"Reload: new code not ready, workers keep the running code: {e}")
+        if server.app.callable is not None:
+            _close_db_connections(server.app.callable)
+        for name in _app_modules():
+            del sys.modules[name]
+        sys.modules.update(old_modules)
+        server.app.callable = old_app
+        return
+    _close_db_connections(old_app)
+    server.log.info("Reload: new code loaded and ready")
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    flask_app = server.app.wsgi()
+    # Connections are closed in the master before forking; drop anything inherited regardless
+    _close_db_connections(flask_app, close=False)
+    sys.modules[flask_app.import_name].start_worker_services()
+
+
+def post_request(worker, req, environ, resp):
+    if max_worker_rss_mb and worker.alive and _rss_mb() > max_worker_rss_mb:
+        worker.log.info(f"Worker {worker.pid} uses {_rss_mb():.0f} MB (> {max_worker_rss_mb}); recycling it")
+        worker.alive = False  # finishes its current requests, then the master starts a fresh one
@@ -0,0 +1,261 @@
+"""Resized WebP / JPEG variants of the photos under static/images.
+
+The site used to send the full-resolution originals everywhere - 3-4 MB
+photos for 300px cards, 80 large PNGs for one gallery grid.
+``build_variants`` (run offline through build_image_variants.py) writes
+each photo at a few widths to static/derivatives, one process per CPU, and
+records them in ``static/derivatives/manifest.json``.  Output files are named
+after the content hash, so a re-run only touches new or changed photos and a
+renamed photo reuses what was already built.
+
+Templates call ``responsive_image`` (a Jinja global).  It emits a
+``<picture>`` element with WebP and JPEG (PNG if transparent) ``srcset``s
+from the manifest, or a plain ``<img>`` of the original while no variants
+exist.  Pillow is needed only to build variants; serving reads the manifest
+alone.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from markupsafe import Markup, escape
+
+from catalog_index import is_catalog_image
+
+VARIANT_WIDTHS = (320, 640, 1024, 1600)
+JPEG_QUALITY = 80
+WEBP_QUALITY = 76
+MANIFEST_NAME = 'manifest.json'
+_HASH_CHUNK = 1024 * 1024
+
+
+def derivatives_root(app_root):
+    return os.path.join(app_root, 'static', 'derivatives')
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _variant_widths(width, widths):
+    """The requested widths narrower than the original, plus the original
+    width itself (capped at the largest requested one)."""
+    top = min(width, max(widths))
+    return sorted({w for w in widths if w < top} | {top})
+
+
+# ── Building (offline) ──
+
+def _load_manifest(out_root):
+    try:
+        with open(os.path.join(out_root, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(out_root, manifest):
+    path = os.path.join(out_root, MANIFEST_NAME)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)  # readers never see a half-written manifest
+
+
+def _source_files(images_root):
+    """``{key: absolute path}`` of every image below ``images_root``; the key
+    is the path relative to it with forward slashes."""
+    found = {}
+    for dirpath, dirnames, filenames in os.walk(images_root):
+        dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+        for filename in filenames:
+            if is_catalog_image(filename):
+                path = os.path.join(dirpath, filename)
+                found[os.path.relpath(path, images_root).replace(os.sep, '/')] = path
+    return found
+
+
+def _outputs_exist(out_root, entry):
+    return all(os.path.exists(os.path.join(out_root, v['file'])) for v in entry.get('variants', []))
+
+
+def _render(job):
+    """Worker: hash one source and write its variants.  Runs in a child process."""
+    from PIL import Image, ImageOps
+
+    key, path, out_root, widths, known = job
+    st = os.stat(path)
+    content_hash = _sha256(path)
+    reuse = known.get(content_hash)
+    if reuse and _outputs_exist(out_root, reuse):
+        # Unchanged content (only touched or renamed) - keep the existing variants
+        return key, dict(reuse, size=st.st_size, mtime=st.st_mtime)
+
+    with Image.open(path) as img:
+        img = ImageOps.exif_transpose(img)  # bake in phone camera orientation
+        has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+        img = img.convert('RGBA' if has_alpha else 'RGB')
+        width, height = img.size
+        fallback = ('png', 'PNG', {'optimize': True}) if has_alpha else \
+            ('jpg', 'JPEG', {'quality': JPEG_QUALITY, 'optimize': True, 'progressive': True})
+
+        subdir = content_hash[:2]
+        os.makedirs(os.path.join(out_root, subdir), exist_ok=True)
+        variants = []
+        for w in _variant_widths(width, widths):
+            h = max(1, round(height * w / width))
+            resized = img if w == width else img.resize((w, h), Image.LANCZOS)
+            for ext, fmt, options in (('webp', 'WEBP', {'quality': WEBP_QUALITY, 'method': 4}), fallback):
+                rel = f"{subdir}/{content_hash[:20]}-{w}.{ext}"
+                target = os.path.join(out_root, rel)
+                if not os.path.exists(target):
+                    tmp = f"{target}.{os.getpid()}.tmp"
+                    resized.save(tmp, fmt, **options)
+                    os.replace(tmp, target)
+                variants.append({'width': w, 'height': h, 'type': f'image/{ext.replace("jpg", "jpeg")}',
+                                 'file': rel})
+    return key, {'hash': content_hash, 'size': st.st_size, 'mtime': st.st_mtime,
+                 'width': width, 'height': height, 'variants': variants}
+
+
+def build_variants(images_root, out_root, widths=VARIANT_WIDTHS, workers=None, force=False, log=print):
+    """Write missing variants for every image below ``images_root`` and update
+    the manifest.  Sources whose size and mtime match the manifest are not even
+    re-hashed.  Returns ``(processed, skipped, removed)``."""
+    widths = tuple(sorted(widths))
+    os.makedirs(out_root, exist_ok=True)
+    manifest = _load_manifest(out_root)
+    sources = _source_files(images_root)
+    # Variants already built, by content hash - a renamed or touched photo reuses them
+    known = {} if force else {entry['hash']: entry for entry in manifest.values()
+                              if entry.get('widths') == list(widths)}
+
+    jobs, skipped = [], 0
+    for key, path in sorted(sources.items()):
+        entry = manifest.get(key)
+        st = os.stat(path)
+        fresh = (entry and not force and entry.get('widths') == list(widths)
+                 and entry.get('size') == st.st_size and entry.get('mtime') == st.st_mtime
+                 and _outputs_exist(out_root, entry))
+        if fresh:
+            skipped += 1
+            continue
+        jobs.append((key, path, out_root, widths, known))
+
+    removed = [key for key in manifest if key not in sources]
+    for key in removed:
+        del manifest[key]
+
+    processed = 0
+    if jobs:
+        from concurrent.futures import ProcessPoolExecutor  # build script only, not the workers
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for key, entry in pool.map(_render, jobs):
+                entry['widths'] = list(widths)
+                manifest[key] = entry
+                processed += 1
+                if log:
+                    log(f"{key}: {', '.join(str(v['width']) for v in entry['variants'] if v['type'] == 'image/webp')}")
+                if processed % 20 == 0:
+                    _save_manifest(out_root, manifest)  # keep progress if interrupted
+    _save_manifest(out_root, manifest)
+    return processed, skipped, len(removed)
+
+
+def prune_variants(out_root):
+    """Delete variant files that the manifest no longer references.  Returns the count."""
+    manifest = _load_manifest(out_root)
+    referenced = {v['file'] for entry in manifest.values() for v in entry.get('variants', [])}
+    deleted = 0
+    for dirpath, _, filenames in os.walk(out_root):
+        for filename in filenames:
+            rel = os.path.relpath(os.path.join(dirpath, filename), out_root).replace(os.sep, '/')
+            if rel != MANIFEST_NAME and rel not in referenced:
+                os.remove(os.path.join(dirpath, filename))
+                deleted += 1
+    return deleted
+
+
+# ── Serving ──
+
+class VariantManifest:
+    """The manifest, reloaded when the file changes (checked at most once per
+    ``check_interval`` seconds)."""
+
+    def __init__(self, check_interval=5.0):
+        self.path = None
+        self.check_interval = check_interval
+        self._entries = {}
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def configure(self, out_root):
+        self.path = os.path.join(out_root, MANIFEST_NAME)
+        self._mtime = None
+        self._checked_at = 0.0
+
+    def get(self, key):
+        now = time.monotonic()
+        if self.path and now - self._checked_at >= self.check_interval:
+            with self._lock:
+                self._checked_at = now
+                try:
+                    mtime = os.stat(self.path).st_mtime
+                except OSError:
+                    mtime, self._entries = None, {}
+                if mtime is not None and mtime != self._mtime:
+                    try:
+                        with open(self.path) as f:
+                            self._entries = json.load(f)
+                        self._mtime = mtime
+                    except (OSError, ValueError):
+                        pass  # mid-deploy or corrupt: keep serving what we had
+        return self._entries.get(key)
+
+
+variant_manifest = VariantManifest()
+
+
+def _attrs(attrs):
+    # class_ -> class, data_image -> data-image
+    return ''.join(f' {escape(name.rstrip("_").replace("_", "-"))}="{escape(value)}"'
+                   for name, value in attrs.items() if value is not None)
+
+
+def responsive_image(key, src, alt='', sizes='100vw', variant_url=None, **attrs):
+    """``<picture>`` for the image ``key`` (path under static/images), falling
+    back to a plain ``<img src=src>`` if it has no variants yet.
+
+    ``variant_url`` maps a file under static/derivatives to its URL.  Extra
+    keyword arguments become ``<img>`` attributes; ``width`` / ``height``
+    left unset (or None) come from the manifest when it knows the image, so
+    the browser can reserve its space either way.
+    """
+    entry = variant_manifest.get(key)
+    for dimension in ('width', 'height'):
+        if attrs.get(dimension) is None and entry:
+            attrs[dimension] = entry.get(dimension)
+    if not entry or not entry.get('variants') or variant_url is None:
+        return Markup(f'<img src="{escape(src)}" alt="{escape(alt)}"{_attrs(attrs)}>')
+
+    srcsets = {}
+    for v in entry['variants']:
+        srcsets.setdefault(v['type'], []).append(f"{variant_url(v['file'])} {v['width']}w")
+    fallback_type = next(t for t in srcsets if t != 'image/webp')
+    fallback_src = srcsets[fallback_type][-1].rsplit(' ', 1)[0]
+    # display:contents keeps the <img> laid out as if it had no wrapper
+    return Markup(
+        f'<picture style="display: contents">'
+        f'<source type="image/webp" srcset="{escape(", ".join(srcsets["image/webp"]))}" sizes="{escape(sizes)}">'
+        f'<img src="{escape(fallback_src)}" srcset="{escape(", ".join(srcsets[fallback_type]))}" '
+        f'sizes="{escape(sizes)}" alt="{escape(alt)}"{_attrs(attrs)}>'
+        f'</picture>'
+    )
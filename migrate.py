@@ -0,0 +1,43 @@
+"""Apply pending database schema migrations (see schema_migrations.py).
+
+Run on every deploy before the workers restart; safe to run repeatedly and
+alongside running workers (one process migrates at a time, the others wait
+and then find nothing to do).  The app is imported with SCHEMA_AUTO_MIGRATE
+off so the migrations run, and report, here.
+
+Usage:
+    python migrate.py            # apply pending migrations
+    python migrate.py --status   # list applied / pending versions
+"""
+import os
+import sys
+
+os.environ.setdefault('SCHEMA_AUTO_MIGRATE', 'false')
+
+from app import app  # noqa: E402
+from schema_migrations import MIGRATIONS, applied_versions, run_migrations  # noqa: E402
+
+
+def status():
+    with app.app_context():
+        applied = applied_versions()
+    for version, name, _ in MIGRATIONS:
+        print(f"{version:03d}  {'applied' if version in applied else 'PENDING':<8} {name}")
+
+
+def migrate():
+    print("Starting schema migration...")
+    with app.app_context():
+        try:
+            done = run_migrations()
+        except Exception as e:
+            print(f"Schema migration failed: {e}")
+            sys.exit(1)
+    print(f"Schema migration complete ({len(done)} applied)." if done else "Schema is up to date.")
+
+
+if __name__ == '__main__':
+    if '--status' in sys.argv[1:]:
+        status()
+    else:
+        migrate()
@@ -0,0 +1,48 @@
+"""Move every per-yatra table into the consolidated `registrations` table.
+
+Runs online: rows are copied in small batches while the site keeps taking
+registrations, then each table is swapped for a compatibility view of the same
+name.  The original table is kept as legacy_<name> until you drop it.
+
+Usage:
+    python migrate_consolidate_registrations.py [--batch-size 1000]
+
+Afterwards set REGISTRATION_STORAGE=registrations in .env so new yatras are
+created as views too.
+"""
+import argparse
+
+from app import app, db, sanitize_table_name, _get_all_yatra_table_names
+from models import YatraDetails
+from schema_registry import schema_registry
+from yatra_store import consolidate_yatra_table
+
+
+def migrate(batch_size=1000):
+    print("Starting consolidation...")
+    with app.app_context():
+        db.create_all()  # make sure `registrations` exists
+        yatra_by_table = {}
+        for yatra in YatraDetails.query.order_by(YatraDetails.id).all():
+            yatra_by_table.setdefault(sanitize_table_name(yatra.title), yatra)
+
+        for table_name in _get_all_yatra_table_names():
+            yatra = yatra_by_table.get(table_name)
+            if not yatra:
+                print(f"{table_name}: no matching yatra_details row, leaving it alone")
+                continue
+            try:
+                consolidate_yatra_table(table_name, yatra.id, batch_size=batch_size)
+            except Exception as e:
+                db.session.rollback()
+                print(f"{table_name}: consolidation failed, table left untouched: {e}")
+        # Tables turned into views - let running workers reload their schema registry
+        schema_registry.invalidate()
+
+    print("Consolidation complete. Set REGISTRATION_STORAGE=registrations to create new yatras as views.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Consolidate per-yatra tables into `registrations`.')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    migrate(parser.parse_args().batch_size)
@@ -0,0 +1,54 @@
+"""Run existing uploads through the upload pipeline.
+
+Traveler photos, yatra images and carousel images uploaded before the
+pipeline existed are full-size originals with their EXIF data.  This queues
+every one that has no thumbnail yet and processes the queue in this process:
+the rows then point at the resized, metadata-free variants and the originals
+are removed.  A file the pipeline rejects (unreadable, too large) keeps its
+row and original.  Idempotent - processed rows have a thumbnail and are skipped.
+
+Usage:
+    python migrate_upload_variants.py
+"""
+import os
+import shutil
+import uuid
+
+from app import app, db
+from models import LoginDetails, YatraDetails, CarouselImage, UploadJob
+from upload_pipeline import upload_pipeline
+
+
+def _queue(kind, target_id, path, payload=None):
+    source = os.path.join(app.root_path, 'static', path)
+    if not os.path.exists(source):
+        print(f"  {path}: file missing, skipped")
+        return False
+    staging_path = os.path.join(upload_pipeline.staging_dir, f"{uuid.uuid4().hex}{os.path.splitext(path)[1].lower()}")
+    shutil.copyfile(source, staging_path)
+    db.session.add(UploadJob(kind=kind, target_id=target_id, staging_path=staging_path,
+                             original_name=os.path.basename(path), payload=payload))
+    return True
+
+
+def migrate():
+    print("Queueing existing uploads...")
+    with app.app_context():
+        queued = 0
+        for traveler in LoginDetails.query.filter(LoginDetails.photo.isnot(None), LoginDetails.photo != '',
+                                                  LoginDetails.photo_thumb.is_(None)):
+            queued += _queue('passenger', traveler.id, traveler.photo)
+        for yatra in YatraDetails.query.filter(YatraDetails.about_image.isnot(None), YatraDetails.about_image != '',
+                                               YatraDetails.about_image_thumb.is_(None)):
+            queued += _queue('yatra_about', yatra.id, yatra.about_image)
+        # Existing slides are updated in place: the original stays until its job succeeds
+        for img in CarouselImage.query.filter(CarouselImage.thumb_path.is_(None)):
+            queued += _queue('carousel', img.id, img.image_path)
+        db.session.commit()
+        print(f"Processing {queued} uploads...")
+        upload_pipeline.process_pending()
+        print(f"Upload migration complete ({upload_pipeline.stats()}).")
+
+
+if __name__ == '__main__':
+    migrate()
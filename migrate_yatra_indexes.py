@@ -0,0 +1,30 @@
+"""Backfill the standard secondary indexes on existing dynamic yatra tables.
+
+New yatra tables get them on creation; this brings older tables in line.
+Idempotent - tables that already have an index on the same columns are left
+alone.  On Postgres the indexes are built CONCURRENTLY so the site can stay up.
+
+Usage:
+    python migrate_yatra_indexes.py
+"""
+from app import app, db, _get_all_yatra_table_names
+from yatra_store import ensure_yatra_indexes
+
+
+def migrate():
+    print("Starting index backfill...")
+    with app.app_context():
+        total = 0
+        for table_name in _get_all_yatra_table_names():
+            try:
+                created = ensure_yatra_indexes(table_name, concurrently=True, log=print)
+                db.session.commit()
+                total += len(created)
+            except Exception as e:
+                db.session.rollback()
+                print(f"{table_name}: index backfill failed: {e}")
+    print(f"Index backfill complete ({total} indexes created).")
+
+
+if __name__ == '__main__':
+    migrate()
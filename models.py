@@ -16,6 +16,7 @@ class LoginDetails(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     login_id = db.Column(db.String(20), nullable=False) # The phone number used for login
     photo = db.Column(db.String(255), nullable=True) # file path or string
+    photo_thumb = db.Column(db.String(255), nullable=True) # small square variant (upload_pipeline)
     name = db.Column(db.String(100), nullable=False)
     aadhar = db.Column(db.String(20), nullable=True)
     year_of_birth = db.Column(db.Integer, nullable=False)
@@ -41,6 +42,7 @@ class YatraDetails(db.Model):
     is_active = db.Column(db.Boolean, default=True)  # Controls visibility on passenger dashboard
     created_at = db.Column(db.DateTime, default=get_india_time)
     about_image = db.Column(db.String(255), nullable=True) # Attached image for details
+    about_image_thumb = db.Column(db.String(255), nullable=True) # small variant (upload_pipeline)
     yatra_message = db.Column(db.Text, nullable=True) # Message for passengers
     yatra_link = db.Column(db.String(500), nullable=True) # External link for passengers
 
@@ -48,6 +50,7 @@ class CarouselImage(db.Model):
     __tablename__ = 'carousel_images'
     id = db.Column(db.Integer, primary_key=True)
     image_path = db.Column(db.String(255), nullable=False)
+    thumb_path = db.Column(db.String(255), nullable=True) # small variant (upload_pipeline)
     created_at = db.Column(db.DateTime, default=get_india_time)
     sort_order = db.Column(db.Integer, default=0)
 
@@ -57,3 +60,194 @@ class AppSettings(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     key = db.Column(db.String(100), unique=True, nullable=False)
     value = db.Column(db.Text, nullable=True)
+
+class Registration(db.Model):
+    """Consolidated registrations for every Yatra (used when REGISTRATION_STORAGE=registrations).
+
+    Replaces the per-yatra ``yatra_<title>`` tables; those names survive as
+    compatibility views over this table (see yatra_store.py).
+    """
+    __tablename__ = 'registrations'
+    id = db.Column(db.Integer, primary_key=True)
+    yatra_id = db.Column(db.Integer, nullable=False)
+    passenger_id = db.Column(db.Integer, nullable=True) # login_details.id (NULL for legacy rows)
+    login_id = db.Column(db.String(20), nullable=True)
+    name = db.Column(db.Text, nullable=True)
+    year_of_birth = db.Column(db.Integer, nullable=True)
+    email = db.Column(db.Text, nullable=True)
+    phone = db.Column(db.Text, nullable=True)
+    gender = db.Column(db.Text, nullable=True)
+    city = db.Column(db.Text, nullable=True)
+    district = db.Column(db.Text, nullable=True)
+    state = db.Column(db.Text, nullable=True)
+    hotel_package = db.Column(db.Text, nullable=True)
+    travel_package = db.Column(db.Text, nullable=True)
+    start_date = db.Column(db.Text, nullable=True)
+    end_date = db.Column(db.Text, nullable=True)
+    status = db.Column(db.Text, nullable=True, server_default='Interest')
+    razorpay_id = db.Column(db.Text, nullable=True)
+    order_id = db.Column(db.Text, nullable=True)
+    source_row_id = db.Column(db.Integer, nullable=True) # id in the pre-consolidation yatra table
+    created_at = db.Column(db.DateTime, default=get_india_time, server_default=db.func.current_timestamp())
+
+    __table_args__ = (
+        db.Index('ix_registrations_yatra_passenger', 'yatra_id', 'passenger_id'),
+        db.Index('ix_registrations_login_name', 'login_id', 'name'),
+        db.Index('ix_registrations_yatra_status', 'yatra_id', 'status'),
+        db.Index('ix_registrations_yatra_created', 'yatra_id', 'created_at'),
+        db.Index('ix_registrations_order', 'order_id'),
+    )
+
+class AnalyticsDailyRollup(db.Model):
+    """Registration counts per yatra table and day, split by the analytics buckets.
+
+    Kept up to date by every write to a yatra table (see analytics.refresh_rollup)
+    so /admin/api/analytics-data never has to scan the registrations themselves.
+    rebuild_analytics.py recomputes it from scratch.
+    """
+    __tablename__ = 'analytics_daily_rollup'
+    id = db.Column(db.Integer, primary_key=True)
+    yatra_table = db.Column(db.String(200), nullable=False)
+    day = db.Column(db.String(10), nullable=False, default='') # 'YYYY-MM-DD'; '' when created_at is missing
+    bucket = db.Column(db.String(10), nullable=False)      # total / gender / status / age / hotel / travel
+    value = db.Column(db.Text, nullable=False, default='') # e.g. 'Female', '19-35', 'Deluxe'; '' for total
+    registrations = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ux_analytics_rollup_key', 'yatra_table', 'day', 'bucket', 'value', unique=True),
+    )
+
+class CatalogAlbum(db.Model):
+    """A folder of photos under static/images shown in the public catalog.
+
+    Built by catalog_index.scan_catalog; ``dir_mtime`` is the folder mtime at the
+    last scan, so unchanged folders are not listed again.
+    """
+    __tablename__ = 'catalog_albums'
+    id = db.Column(db.Integer, primary_key=True)
+    folder = db.Column(db.String(200), unique=True, nullable=False) # directory name, also the URL segment
+    sort_order = db.Column(db.Integer, default=0)
+    photo_count = db.Column(db.Integer, nullable=False, default=0)
+    cover_filename = db.Column(db.String(255), nullable=True)
+    cover_hash = db.Column(db.String(64), nullable=True)        # content_hash of the cover photo
+    dir_mtime = db.Column(db.Float, nullable=True)
+    scanned_at = db.Column(db.DateTime, default=get_india_time)
+    photos = db.relationship('CatalogPhoto', backref='album', lazy='dynamic',
+                             cascade='all, delete-orphan', order_by='CatalogPhoto.sort_key')
+
+class CatalogPhoto(db.Model):
+    """One image file of a ``CatalogAlbum``"""
+    __tablename__ = 'catalog_photos'
+    id = db.Column(db.Integer, primary_key=True)
+    album_id = db.Column(db.Integer, db.ForeignKey('catalog_albums.id', ondelete='CASCADE'), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    sort_key = db.Column(db.String(255), nullable=False) # natural order: 'img 2' before 'img 10'
+    size_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    width = db.Column(db.Integer, nullable=True)
+    height = db.Column(db.Integer, nullable=True)
+    content_hash = db.Column(db.String(64), nullable=True) # sha256 hex of the file
+    file_mtime = db.Column(db.Float, nullable=True)
+    created_at = db.Column(db.DateTime, default=get_india_time)
+
+    __table_args__ = (
+        db.UniqueConstraint('album_id', 'filename', name='ux_catalog_photos_album_filename'),
+        db.Index('ix_catalog_photos_album_sort', 'album_id', 'sort_key'),
+    )
+
+class UploadJob(db.Model):
+    """An uploaded image waiting in the staging area for upload_pipeline to process.
+
+    ``kind`` says what the result is for (see upload_pipeline.KINDS) and
+    ``target_id`` which row gets the variant paths (none for a new carousel
+    slide); ``payload`` holds extra JSON the kind needs (e.g. a carousel slot).
+    """
+    __tablename__ = 'upload_jobs'
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    target_id = db.Column(db.Integer, nullable=True)
+    staging_path = db.Column(db.String(255), nullable=False)
+    original_name = db.Column(db.String(255), nullable=True)
+    payload = db.Column(db.Text, nullable=True)
+    status = db.Column(db.String(12), nullable=False, default='pending') # pending / processing / done / failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=get_india_time)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_upload_jobs_status', 'status', 'id'),
+    )
+
+class PassengerYatra(db.Model):
+    """Which yatra tables hold rows for a passenger (by ``passenger_id``).
+
+    Kept up to date by every registration write (see passenger_index) so a
+    profile edit only has to update the yatras the passenger is actually in.
+    rebuild_passenger_index.py recomputes it from the yatra tables.
+    """
+    __tablename__ = 'passenger_yatras'
+    passenger_id = db.Column(db.Integer, primary_key=True)
+    yatra_table = db.Column(db.String(200), primary_key=True)
+
+    __table_args__ = (
+        db.Index('ix_passenger_yatras_table', 'yatra_table'),
+    )
+
+class PaymentOrder(db.Model):
+    """A Razorpay order created by /create-razorpay-order, with what it pays for.
+
+    ``passenger_id`` 0 means every unpaid registration of ``login_id`` in the
+    yatra (the dashboard's "pay all").  ``registration_ids`` (JSON list of yatra
+    table row ids) pins down which registrations those were when the order was
+    created, so a late webhook never settles a traveler added afterwards.  The
+    reconciler uses this row to find the registrations a webhook event is about.
+    """
+    __tablename__ = 'payment_orders'
+    order_id = db.Column(db.String(64), primary_key=True)         # Razorpay order id
+    yatra_id = db.Column(db.Integer, nullable=False)
+    passenger_id = db.Column(db.Integer, nullable=False, default=0)
+    login_id = db.Column(db.String(20), nullable=False)
+    amount = db.Column(db.Integer, nullable=False)                # paise
+    status = db.Column(db.String(12), nullable=False, default='created') # created / paid / failed
+    payment_id = db.Column(db.String(64), nullable=True)
+    registration_ids = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=get_india_time)
+    updated_at = db.Column(db.DateTime, default=get_india_time, onupdate=get_india_time)
+
+class PaymentEvent(db.Model):
+    """A Razorpay webhook event, stored as received (the inbox) and applied later
+    by payment_events.PaymentReconciler.  ``event_id`` is Razorpay's
+    X-Razorpay-Event-Id - redeliveries of one event are stored once."""
+    __tablename__ = 'payment_events'
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.String(64), unique=True, nullable=False)
+    event = db.Column(db.String(50), nullable=False)              # e.g. payment.captured
+    order_id = db.Column(db.String(64), nullable=True, index=True)
+    payment_id = db.Column(db.String(64), nullable=True)
+    payload = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(12), nullable=False, default='pending') # pending / processing / applied / ignored / unmatched / failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    claim_token = db.Column(db.String(32), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    received_at = db.Column(db.DateTime, default=get_india_time)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    processed_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_payment_events_status', 'status', 'id'),
+    )
+
+class DashboardRevision(db.Model):
+    """Per-login dashboard revision, bumped by that login's writes; tags its cached
+    dashboard in every worker (app.py)."""
+    __tablename__ = 'dashboard_revisions'
+    login_id = db.Column(db.String(100), primary_key=True)
+    rev = db.Column(db.String(32), nullable=False)
+
+class SchemaVersion(db.Model):
+    """One row per applied schema migration (see schema_migrations.py)."""
+    __tablename__ = 'schema_version'
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, default=get_india_time)
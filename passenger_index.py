@@ -0,0 +1,106 @@
+"""Passenger -> yatra table membership index (``passenger_yatras``).
+
+Yatra tables keep a denormalised copy of each passenger's profile (name,
+gender, city...).  A profile edit used to UPDATE every yatra table to keep
+those copies in step, although a passenger is usually in one or two.  The
+index records which tables hold rows for each ``passenger_id`` so
+``sync_passenger_rows`` touches only those:
+
+* write paths call ``refresh_memberships(table, passenger_ids)`` after adding
+  or removing rows (idempotent: it re-reads the table for those passengers);
+* renaming / dropping a yatra table calls ``rename_memberships`` /
+  ``drop_memberships``, like the analytics rollup;
+* ``rebuild_memberships`` recomputes everything (rebuild_passenger_index.py,
+  and the schema migration that first filled the index).
+
+Rows without a ``passenger_id`` (registrations from before passenger ids)
+are never synced, so they are not indexed either.  Nothing here commits.
+"""
+from sqlalchemy import text
+
+from analytics import rows_days
+from models import db
+
+INDEX_TABLE = 'passenger_yatras'
+
+# login_details columns copied into the yatra tables (same names there)
+SYNCED_FIELDS = ('name', 'year_of_birth', 'gender', 'email', 'phone', 'city', 'district', 'state')
+
+
+def _id_params(passenger_ids):
+    """``passenger_id IN (...)`` with numbered placeholders (reusable by rows_days)."""
+    params = {f'pid{n}': int(pid) for n, pid in enumerate(dict.fromkeys(passenger_ids))}
+    return f"passenger_id IN ({', '.join(':' + key for key in params)})", params
+
+
+def refresh_memberships(table_name, passenger_ids):
+    """Re-read ``table_name``'s rows for ``passenger_ids`` into the index."""
+    passenger_ids = [pid for pid in passenger_ids if pid is not None]
+    if not passenger_ids:
+        return
+    clause, params = _id_params(passenger_ids)
+    params['t'] = table_name
+    db.session.execute(text(f"DELETE FROM {INDEX_TABLE} WHERE yatra_table = :t AND {clause}"), params)
+    db.session.execute(text(
+        f"INSERT INTO {INDEX_TABLE} (passenger_id, yatra_table) "
+        f"SELECT DISTINCT passenger_id, :t FROM {table_name} WHERE {clause} "
+        f"ON CONFLICT DO NOTHING"), params)
+
+
+def rename_memberships(old_name, new_name):
+    db.session.execute(text(f"UPDATE {INDEX_TABLE} SET yatra_table = :new WHERE yatra_table = :old"),
+                       {'old': old_name, 'new': new_name})
+
+
+def drop_memberships(table_name):
+    db.session.execute(text(f"DELETE FROM {INDEX_TABLE} WHERE yatra_table = :t"), {'t': table_name})
+
+
+def rebuild_memberships(table_names):
+    """Recompute the whole index from ``table_names``."""
+    db.session.execute(text(f"DELETE FROM {INDEX_TABLE}"))
+    for table_name in table_names:
+        db.session.execute(text(
+            f"INSERT INTO {INDEX_TABLE} (passenger_id, yatra_table) "
+            f"SELECT DISTINCT passenger_id, :t FROM {table_name} WHERE passenger_id IS NOT NULL "
+            f"ON CONFLICT DO NOTHING"), {'t': table_name})
+
+
+def tables_for_passengers(passenger_ids):
+    """``{table_name: [passenger_id, ...]}`` for the tables holding these passengers."""
+    passenger_ids = [pid for pid in passenger_ids if pid is not None]
+    if not passenger_ids:
+        return {}
+    clause, params = _id_params(passenger_ids)
+    tables = {}
+    for pid, table_name in db.session.execute(
+            text(f"SELECT passenger_id, yatra_table FROM {INDEX_TABLE} WHERE {clause}"), params):
+        tables.setdefault(table_name, []).append(pid)
+    return tables
+
+
+def synced_values(passenger):
+    """The ``SYNCED_FIELDS`` of a LoginDetails row, to compare before / after an edit."""
+    return {field: getattr(passenger, field) for field in SYNCED_FIELDS}
+
+
+def sync_passenger_rows(passenger_ids, values, table_exists=None):
+    """Copy ``values`` ({SYNCED_FIELDS column: value}, same for every passenger) into the
+    yatra table rows of ``passenger_ids``: one UPDATE per indexed table.
+
+    Returns ``{table_name: days}`` of the changed rows for the analytics refresh.
+    """
+    values = {col: val for col, val in values.items() if col in SYNCED_FIELDS}
+    if not values:
+        return {}
+    touched = {}
+    assignments = ', '.join(f"{col} = :set_{col}" for col in values)
+    for table_name, pids in tables_for_passengers(passenger_ids).items():
+        if table_exists and not table_exists(table_name):
+            continue  # stale entry; rebuild_passenger_index.py tidies up
+        clause, params = _id_params(pids)
+        params.update({f'set_{col}': val for col, val in values.items()})
+        db.session.execute(text(f"UPDATE {table_name} SET {assignments} WHERE {clause}"), params)
+        # Not result.rowcount: SQLite reports 0 for updates through the compatibility views
+        touched[table_name] = rows_days(table_name, clause, params)
+    return touched
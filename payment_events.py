@@ -0,0 +1,269 @@
+"""Razorpay webhook inbox and the reconciler that applies it.
+
+Payment state used to be written only by the browser (/verify-razorpay-payment,
+/pay-all): if the tab closed between paying and that call, the registration
+stayed "Interest" until an admin fixed it by hand.  Razorpay also reports
+every payment to our webhook, so now:
+
+* ``record_event`` stores the verified webhook body in ``payment_events``
+  and the route answers at once.  ``event_id`` is unique, so a redelivered
+  event is stored (and applied) only once.
+* ``PaymentReconciler`` drains the inbox in batches on a background thread:
+  it claims up to ``batch_size`` events atomically, finds the registrations of
+  each event's order through ``payment_orders`` (written when the order was
+  created), updates them, and commits the whole batch at once - then refreshes
+  analytics once per touched table and dashboards once per batch.
+
+Applying is idempotent: rows already Paid are left alone, so the browser
+path, a webhook and a replay (replay_payment_events.py) can all report the
+same payment.  ``payment.captured`` / ``order.paid`` mark the rows Paid,
+``payment.failed`` marks unpaid rows Failed; other events are kept as
+``ignored``.  Only the registrations recorded with the order are touched, so
+a webhook delivered hours later never pays for a traveler added since.
+Events for orders this app did not create are ``unmatched``.
+"""
+import hashlib
+import json
+import os
+import threading
+import uuid
+from datetime import timedelta
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from analytics import rows_days
+from models import db, PaymentEvent, PaymentOrder, LoginDetails, YatraDetails, get_india_time
+
+PAID_EVENTS = ('payment.captured', 'order.paid')
+FAILED_EVENTS = ('payment.failed',)
+MAX_ATTEMPTS = 5
+
+
+# ── Inbox ──
+
+def _entities(payload):
+    inner = payload.get('payload') or {}
+    payment = (inner.get('payment') or {}).get('entity') or {}
+    order = (inner.get('order') or {}).get('entity') or {}
+    return payment, order
+
+
+def record_event(body, event_id=None):
+    """Store a (signature-checked) webhook body.  Returns the new
+    ``PaymentEvent``, or ``None`` if this event was stored before.  Commits.
+    Raises ``ValueError`` for a body that is not a Razorpay event."""
+    payload = json.loads(body)
+    if not isinstance(payload, dict) or not payload.get('event'):
+        raise ValueError('not a Razorpay event')
+    payment, order = _entities(payload)
+    event = PaymentEvent(
+        # Razorpay sends X-Razorpay-Event-Id; fall back to the body hash for older senders
+        event_id=(event_id or hashlib.sha256(body).hexdigest())[:64],
+        event=str(payload['event'])[:50],
+        order_id=payment.get('order_id') or order.get('id'),
+        payment_id=payment.get('id'),
+        payload=body.decode('utf-8') if isinstance(body, bytes) else body)
+    db.session.add(event)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return None
+    return event
+
+
+def _order_match(login_id, passenger_id):
+    """WHERE clause for the registrations of an order: one passenger (by id, or by name
+    on rows from before passenger ids) or, for "pay all", every registration of the login."""
+    match, params = "login_id = :lid", {'lid': login_id}
+    if passenger_id:
+        passenger = db.session.get(LoginDetails, passenger_id)
+        match += " AND (passenger_id = :pid OR (passenger_id IS NULL AND name = :nm))"
+        params.update(pid=passenger_id, nm=passenger.name if passenger else None)
+    return match, params
+
+
+def unpaid_registration_ids(table, login_id, passenger_id):
+    """Row ids in ``table`` an order for ``passenger_id`` (0: pay all) would pay for now."""
+    match, params = _order_match(login_id, int(passenger_id or 0))
+    return [row[0] for row in db.session.execute(text(
+        f"SELECT id FROM {table} WHERE {match} AND (status IS NULL OR status != 'Paid') ORDER BY id"), params)]
+
+
+def record_order(order_id, yatra_id, passenger_id, login_id, amount, registration_ids=None):
+    """Remember what a new Razorpay order pays for (``registration_ids``: see
+    ``unpaid_registration_ids``).  Does not commit."""
+    db.session.merge(PaymentOrder(order_id=order_id, yatra_id=int(yatra_id), passenger_id=int(passenger_id or 0),
+                                  login_id=login_id, amount=int(amount),
+                                  registration_ids=None if registration_ids is None else json.dumps(registration_ids)))
+
+
+# ── Reconciler ──
+
+class PaymentReconciler:
+    """Applies stored webhook events in batches on one thread per process."""
+
+    def __init__(self):
+        self.app = None
+        self.batch_size = 200
+        self.interval = 30.0
+        self.stale_after = timedelta(minutes=10)
+        self.resolve_table = None
+        self.on_applied = None
+        self.logger = None
+        self._thread_pid = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+
+    def init_app(self, app, resolve_table, on_applied=None, logger=None):
+        """``resolve_table(yatra)`` returns the yatra's registration table name;
+        ``on_applied({table: days})`` runs after each committed batch."""
+        self.app = app
+        self.batch_size = app.config['PAYMENT_RECONCILE_BATCH']
+        self.interval = app.config['PAYMENT_RECONCILE_INTERVAL']
+        self.stale_after = timedelta(seconds=app.config['PAYMENT_RECONCILE_STALE_SECONDS'])
+        self.resolve_table = resolve_table
+        self.on_applied = on_applied
+        self.logger = logger or app.logger
+
+    def start(self):
+        """Start this process's sweep thread (none with ``interval`` <= 0).  Called from
+        app.start_worker_services, so under gunicorn's preload it runs after the fork."""
+        if self.interval <= 0:
+            return
+        with self._lock:
+            if self._thread_pid != os.getpid():
+                self._thread_pid = os.getpid()
+                threading.Thread(target=self._loop, name='payment-reconciler', daemon=True).start()
+
+    def kick(self):
+        """New events are in: have them applied now rather than at the next sweep
+        (inline, with ``interval`` <= 0)."""
+        if self.interval <= 0:
+            self.process_pending()
+            return
+        self._wake.set()
+
+    def _loop(self):
+        while True:
+            # Also wakes every ``interval`` to pick up events another worker left half-done
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            with self.app.app_context():
+                try:
+                    self.process_pending()
+                except Exception as e:
+                    db.session.rollback()
+                    self._log(f"Payment reconciliation failed: {e}")
+
+    def process_pending(self):
+        """Apply claimable events batch by batch until none are left.  Returns the count."""
+        done = 0
+        while True:
+            batch = self._claim_batch()
+            if not batch:
+                return done
+            self._apply_batch(batch)
+            done += len(batch)
+
+    def _claim_batch(self):
+        token = uuid.uuid4().hex
+        now = get_india_time()
+        claimable = "(status = 'pending' OR (status = 'processing' AND claimed_at < :stale))"
+        params = {'tok': token, 'now': now, 'stale': now - self.stale_after, 'n': self.batch_size}
+        # The outer condition is re-checked per row, so two workers never claim the same event
+        db.session.execute(text(
+            f"UPDATE payment_events SET status = 'processing', claim_token = :tok, claimed_at = :now, "
+            f"attempts = attempts + 1 WHERE {claimable} AND id IN "
+            f"(SELECT id FROM payment_events WHERE {claimable} ORDER BY id LIMIT :n)"), params)
+        db.session.commit()
+        return PaymentEvent.query.filter_by(claim_token=token, status='processing').order_by(PaymentEvent.id).all()
+
+    def _apply_batch(self, events):
+        touched = {}
+        for event in events:
+            try:
+                with db.session.begin_nested():  # one bad event must not undo the rest of the batch
+                    outcome = self._apply(event, touched)
+                event.status, event.error = outcome, None
+            except Exception as e:
+                give_up = event.attempts >= MAX_ATTEMPTS
+                event.status = 'failed' if give_up else 'pending'
+                event.error = str(e)[:1000]
+                self._log(f"Payment event {event.event_id} ({event.event}) "
+                          f"{'failed' if give_up else 'will retry'}: {e}")
+            event.processed_at = get_india_time()
+        db.session.commit()
+        if self.on_applied and touched:
+            try:
+                self.on_applied(touched)
+            except Exception as e:
+                db.session.rollback()
+                self._log(f"Payment reconciliation hook failed: {e}")
+
+    def _apply(self, event, touched):
+        """Apply one event inside the batch transaction; returns its final status."""
+        if event.event not in PAID_EVENTS + FAILED_EVENTS:
+            return 'ignored'
+        order = db.session.get(PaymentOrder, event.order_id) if event.order_id else None
+        if order is None:
+            return 'unmatched'
+        yatra = db.session.get(YatraDetails, order.yatra_id)
+        table = self.resolve_table(yatra) if yatra else None
+        if not table:
+            return 'unmatched'
+
+        payment_id = event.payment_id or order.payment_id
+        match, params = _order_match(order.login_id, order.passenger_id)
+        params['oid'] = order.order_id
+        if order.registration_ids is not None:
+            # Only the registrations the order was created for
+            ids = json.loads(order.registration_ids)
+            if not ids:
+                return 'unmatched'
+            params.update({f'rid{n}': int(rid) for n, rid in enumerate(ids)})
+            match += f" AND id IN ({', '.join(f':rid{n}' for n in range(len(ids)))})"
+        elif not order.passenger_id:
+            # A "pay all" order from before registration_ids: which rows it covered is
+            # unknown, and newer ones must not be marked Paid - left for an admin
+            return 'unmatched'
+
+        if event.event in PAID_EVENTS:
+            db.session.execute(text(
+                f"UPDATE {table} SET status = 'Paid', razorpay_id = :rzp, order_id = :oid "
+                f"WHERE {match} AND (status IS NULL OR status != 'Paid')"), dict(params, rzp=payment_id))
+            order.status, order.payment_id = 'paid', payment_id
+        else:
+            db.session.execute(text(
+                f"UPDATE {table} SET status = 'Failed', order_id = :oid "
+                f"WHERE {match} AND (status IS NULL OR status NOT IN ('Paid', 'Failed'))"), params)
+            if order.status != 'paid':
+                order.status = 'failed'
+        touched.setdefault(table, set()).update(rows_days(table, f"{match} AND order_id = :oid", params))
+        return 'applied'
+
+    def replay(self, event_ids=None, statuses=None):
+        """Put events back in the queue (all ``statuses`` or the given ids) and
+        apply them now.  Returns the number re-queued."""
+        query = PaymentEvent.query
+        if event_ids:
+            query = query.filter(PaymentEvent.event_id.in_(event_ids))
+        if statuses:
+            query = query.filter(PaymentEvent.status.in_(statuses))
+        count = query.update({'status': 'pending', 'attempts': 0, 'error': None, 'claim_token': None},
+                             synchronize_session=False)
+        db.session.commit()
+        self.process_pending()
+        return count
+
+    def stats(self):
+        rows = db.session.execute(text("SELECT status, COUNT(*) FROM payment_events GROUP BY status")).fetchall()
+        return {status: n for status, n in rows}
+
+    def _log(self, message):
+        if self.logger:
+            self.logger.error(message)
+
+
+payment_reconciler = PaymentReconciler()
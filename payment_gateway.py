@@ -0,0 +1,423 @@
+"""Razorpay API client shared by all requests of a worker.
+
+The payment routes used to build a new ``razorpay.Client`` per request - a
+fresh HTTP session and TLS handshake every time, no timeouts, no retries -
+so a slow Razorpay tied up workers for as long as it liked.
+``razorpay_gateway`` instead keeps a pool of keep-alive HTTPS connections,
+gives every call explicit connect and read timeouts, and:
+
+* retries transient failures (connection errors, timeouts, 429 / 5xx) with
+  jittered exponential backoff - fetches always, order creation only when the
+  request cannot have reached Razorpay (connection refused / connect timeout),
+  so a retry never creates a second order for one click;
+* counts consecutive failures in a circuit breaker: once it opens, calls fail
+  at once with ``PaymentsUnavailable`` for ``breaker_reset`` seconds, then one
+  trial call decides whether to close it again;
+* runs every call on a small per-worker thread pool (``GatewayExecutor``):
+  the request thread waits at most ``call_deadline`` seconds for the answer,
+  and when ``max_pending`` calls are already queued or running it is refused
+  at once with ``GatewayBusy`` and a retry hint - so a burst of payers against
+  a slow Razorpay cannot tie up every request thread of the worker.
+
+Payment and webhook signatures are checked locally (HMAC-SHA256 of
+``order|payment`` and of the raw webhook body, as the SDK does).
+``api_base`` can point at a local stub (razorpay_stub.py).
+"""
+import base64
+import concurrent.futures
+import hashlib
+import hmac
+import http.client
+import json
+import os
+import queue
+import random
+import select
+import socket
+import ssl
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+
+class GatewayError(Exception):
+    """Razorpay answered, but refused the request (bad amount, unknown id...)."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class PaymentsUnavailable(Exception):
+    """Razorpay cannot be reached right now (circuit open or retries used up)."""
+
+
+class GatewayBusy(PaymentsUnavailable):
+    """Too many Razorpay calls already waiting; try again in ``retry_after`` seconds."""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Transient(Exception):
+    """A failure worth retrying; ``sent`` tells whether Razorpay may have seen the request."""
+
+    def __init__(self, message, sent=True):
+        super().__init__(message)
+        self.sent = sent
+
+
+# ── Circuit breaker ──
+
+class CircuitBreaker:
+    """Opens after ``threshold`` consecutive failures; after ``reset_after``
+    seconds lets a single trial call through (half-open)."""
+
+    def __init__(self, threshold=5, reset_after=30.0):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            return 'half-open' if time.monotonic() - self._opened_at >= self.reset_after else 'open'
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_after or self._trial:
+                return False
+            self._trial = True  # this caller probes; the rest keep failing fast
+            return True
+
+    def success(self):
+        with self._lock:
+            self._failures, self._opened_at, self._trial = 0, None, False
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+
+# ── Executor ──
+
+class GatewayExecutor:
+    """Thread pool for outbound calls with a cap on queued + running calls and
+    a deadline per call (``TimeoutError``).  A call past its deadline keeps
+    running on the pool (its answer is dropped); only the waiting request gives up."""
+
+    def __init__(self, workers=2, max_pending=4, deadline=8.0):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.deadline = deadline
+        self._pool = None
+        self._pool_pid = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=500)  # seconds from submit to answer, recent calls
+        self.counters = {'calls': 0, 'rejected': 0, 'timeouts': 0, 'errors': 0, 'max_pending_seen': 0}
+
+    def run(self, fn, *args, **kwargs):
+        if not self.workers:  # disabled: call inline, as before
+            return fn(*args, **kwargs)
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.counters['rejected'] += 1
+                raise GatewayBusy(f'{self._pending} Razorpay calls already pending', self._retry_after())
+            self._pending += 1
+            self.counters['calls'] += 1
+            self.counters['max_pending_seen'] = max(self.counters['max_pending_seen'], self._pending)
+            pool = self._get_pool()
+        started = time.monotonic()
+        future = pool.submit(self._tracked, fn, args, kwargs)
+        try:
+            return future.result(timeout=self.deadline)
+        except concurrent.futures.TimeoutError:
+            with self._lock:
+                self.counters['timeouts'] += 1
+            raise
+        finally:
+            with self._lock:
+                self._latencies.append(time.monotonic() - started)
+
+    def _tracked(self, fn, args, kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self.counters['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _get_pool(self):
+        # Called with the lock held.  One pool per process (gunicorn workers fork after import).
+        if self._pool is None or self._pool_pid != os.getpid():
+            self._pool = concurrent.futures.ThreadPoolExecutor(self.workers, thread_name_prefix='razorpay')
+            self._pool_pid = os.getpid()
+        return self._pool
+
+    def _retry_after(self):
+        """Seconds until a slot is likely free: recent median latency per queued round."""
+        recent = sorted(self._latencies)
+        median = recent[len(recent) // 2] if recent else 1.0
+        return max(1, int(median * -(-self._pending // self.workers) + 0.999))
+
+    def stats(self):
+        with self._lock:
+            recent = sorted(self._latencies)
+            return dict(self.counters, pending=self._pending, workers=self.workers,
+                        max_pending=self.max_pending, deadline_seconds=self.deadline,
+                        latency_ms_p50=round(recent[len(recent) // 2] * 1000, 1) if recent else None,
+                        latency_ms_p95=round(recent[int(len(recent) * 0.95)] * 1000, 1) if recent else None)
+
+
+# ── Connection pool ──
+
+class _ConnectionPool:
+    """Keep-alive ``http.client`` connections to one host, at most ``size`` idle.
+
+    A connection idle for ``max_idle`` seconds is dropped instead of reused -
+    set it below the server's keep-alive timeout - and one the server has
+    closed meanwhile is noticed before a request is written to it, so a POST
+    never goes out on a socket that cannot answer."""
+
+    def __init__(self, base_url, size, connect_timeout, read_timeout, max_idle=20.0):
+        parts = urlsplit(base_url)
+        self.https = parts.scheme == 'https'
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.https else 80)
+        self.prefix = parts.path.rstrip('/')
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_idle = max_idle
+        self._idle = queue.LifoQueue(maxsize=size)  # most recently used first: least likely to be stale
+        self._ssl = ssl.create_default_context() if self.https else None
+
+    @staticmethod
+    def _closed_by_peer(conn):
+        """An idle connection has nothing to read; readable means EOF (or a TLS close_notify)."""
+        if conn.sock is None:
+            return True
+        poller = select.poll()
+        poller.register(conn.sock, select.POLLIN)
+        return bool(poller.poll(0))
+
+    def get(self):
+        """``(connection, reused)``"""
+        while True:
+            try:
+                conn, idle_since = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if time.monotonic() - idle_since < self.max_idle and not self._closed_by_peer(conn):
+                return conn, True
+            conn.close()
+        if self.https:
+            conn = http.client.HTTPSConnection(self.host, self.port, timeout=self.connect_timeout, context=self._ssl)
+        else:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.connect_timeout)
+        try:
+            conn.connect()
+        except (socket.timeout, OSError) as e:
+            conn.close()
+            raise _Transient(f"cannot connect to {self.host}: {e}", sent=False)
+        conn.sock.settimeout(self.read_timeout)
+        return conn, False
+
+    def put(self, conn):
+        try:
+            self._idle.put_nowait((conn, time.monotonic()))
+        except queue.Full:
+            conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait()[0].close()
+            except queue.Empty:
+                return
+
+
+# ── Gateway ──
+
+class RazorpayGateway:
+    """Thread-safe Razorpay client; configure once with ``init_app``."""
+
+    def __init__(self):
+        self.key_id = ''
+        self.key_secret = ''
+        self.webhook_secret = ''
+        self.api_base = 'https://api.razorpay.com/v1'
+        self.retries = 2
+        self.backoff = 0.2
+        self.pool_size = 10
+        self.pool_max_idle = 20.0
+        self.connect_timeout = 3.0
+        self.read_timeout = 10.0
+        self.breaker = CircuitBreaker()
+        self.executor = GatewayExecutor()
+        self.logger = None
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app, logger=None):
+        cfg = app.config
+        self.key_id, self.key_secret = cfg['RAZORPAY_KEY_ID'], cfg['RAZORPAY_KEY_SECRET']
+        self.webhook_secret = cfg['RAZORPAY_WEBHOOK_SECRET']
+        self.api_base = cfg['RAZORPAY_API_BASE']
+        self.connect_timeout = cfg['RAZORPAY_CONNECT_TIMEOUT']
+        self.read_timeout = cfg['RAZORPAY_READ_TIMEOUT']
+        self.retries = cfg['RAZORPAY_RETRIES']
+        self.pool_size = cfg['RAZORPAY_POOL_SIZE']
+        self.pool_max_idle = cfg['RAZORPAY_POOL_MAX_IDLE']
+        self.breaker = CircuitBreaker(cfg['RAZORPAY_BREAKER_FAILURES'], cfg['RAZORPAY_BREAKER_RESET_SECONDS'])
+        self.executor = GatewayExecutor(cfg['RAZORPAY_EXECUTOR_WORKERS'], cfg['RAZORPAY_MAX_PENDING'],
+                                        cfg['RAZORPAY_CALL_DEADLINE'])
+        self.logger = logger or app.logger
+        self._reset_pool()
+
+    def _reset_pool(self):
+        with self._lock:
+            if self._pool:
+                self._pool.close()
+            self._pool = None
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                # First use in this process (gunicorn workers fork after import)
+                self._pool = _ConnectionPool(self.api_base, self.pool_size, self.connect_timeout, self.read_timeout,
+                                             self.pool_max_idle)
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    # ── Public API ──
+
+    def create_order(self, amount_paise, currency='INR', receipt=None, notes=None):
+        body = {'amount': int(amount_paise), 'currency': currency, 'payment_capture': 1}
+        if receipt:
+            body['receipt'] = receipt
+        if notes:
+            body['notes'] = notes
+        return self._run('POST', '/orders', body, idempotent=False)
+
+    def fetch_order(self, order_id):
+        return self._run('GET', f'/orders/{order_id}')
+
+    def fetch_order_payments(self, order_id):
+        return self._run('GET', f'/orders/{order_id}/payments')
+
+    def fetch_payment(self, payment_id):
+        return self._run('GET', f'/payments/{payment_id}')
+
+    def verify_payment_signature(self, order_id, payment_id, signature):
+        """True if ``signature`` is Razorpay's checkout signature for this order and payment."""
+        expected = hmac.new(self.key_secret.encode(), f"{order_id}|{payment_id}".encode(), hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, str(signature or ''))
+
+    def verify_webhook_signature(self, body, signature):
+        """True if ``signature`` (X-Razorpay-Signature) is the webhook secret's HMAC of the raw body."""
+        if not self.webhook_secret:
+            return False
+        expected = hmac.new(self.webhook_secret.encode(), body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, str(signature or ''))
+
+    def status(self):
+        return {'breaker': self.breaker.state, 'api_base': self.api_base, 'executor': self.executor.stats()}
+
+    # ── Plumbing ──
+
+    def _run(self, method, path, body=None, idempotent=True):
+        if self.breaker.state == 'open':  # fail fast without taking an executor slot
+            raise PaymentsUnavailable('Razorpay circuit is open')
+        try:
+            return self.executor.run(self._call, method, path, body, idempotent)
+        except concurrent.futures.TimeoutError:
+            if self.logger:
+                self.logger.error(f"Razorpay {method} {path}: no answer within {self.executor.deadline:g}s")
+            raise PaymentsUnavailable(f'no answer from Razorpay within {self.executor.deadline:g}s')
+
+    def _call(self, method, path, body=None, idempotent=True):
+        if not self.breaker.allow():
+            raise PaymentsUnavailable('Razorpay circuit is open')
+        attempt = 0
+        while True:
+            try:
+                result = self._send(method, path, body, idempotent)
+            except GatewayError:
+                self.breaker.success()  # Razorpay is up; the request itself was wrong
+                raise
+            except _Transient as e:
+                if attempt < self.retries and (idempotent or not e.sent):
+                    attempt += 1
+                    # Full jitter: spread retries of concurrent requests apart
+                    time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+                    continue
+                self.breaker.failure()
+                if self.logger:
+                    self.logger.error(f"Razorpay {method} {path} failed after {attempt + 1} attempt(s): {e}")
+                raise PaymentsUnavailable(str(e))
+            self.breaker.success()
+            return result
+
+    def _send(self, method, path, body, idempotent=True):
+        pool = self._get_pool()
+        payload = json.dumps(body).encode() if body is not None else None
+        token = base64.b64encode(f"{self.key_id}:{self.key_secret}".encode()).decode()
+        headers = {'Authorization': f'Basic {token}', 'Accept': 'application/json', 'Connection': 'keep-alive'}
+        if payload is not None:
+            headers['Content-Type'] = 'application/json'
+
+        for fresh_try in (False, True):
+            conn, reused = pool.get()
+            sent = False
+            try:
+                conn.request(method, pool.prefix + path, body=payload, headers=headers)
+                sent = True
+                response = conn.getresponse()
+                data = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                conn.close()
+                # The server dropped a reused connection (the pool screens out idle and closed ones,
+                # but it can still happen in between): redo the request on a new connection, unless
+                # a POST /orders may have reached Razorpay (a second order would be created)
+                if reused and not fresh_try and (idempotent or not sent):
+                    continue
+                raise _Transient(f"connection lost: {e}", sent=sent)
+            except (socket.timeout, OSError, http.client.HTTPException) as e:
+                conn.close()
+                raise _Transient(f"{type(e).__name__}: {e}")
+            if response.will_close:
+                conn.close()
+            else:
+                pool.put(conn)
+            break
+
+        if response.status == 429 or response.status >= 500:
+            raise _Transient(f"HTTP {response.status}")
+        try:
+            parsed = json.loads(data or b'{}')
+        except ValueError:
+            raise _Transient(f"HTTP {response.status}: unreadable response")
+        if response.status >= 400:
+            error = parsed.get('error', {}) if isinstance(parsed, dict) else {}
+            raise GatewayError(error.get('description') or f"HTTP {response.status}", response.status)
+        return parsed
+
+
+razorpay_gateway = RazorpayGateway()
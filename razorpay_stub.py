@@ -0,0 +1,150 @@
+"""A local stand-in for the Razorpay orders / payments API.
+
+Point the app at it to exercise payments without Razorpay - including
+slowness and outages, to watch the gateway's timeouts, retries and circuit
+breaker:
+
+    python razorpay_stub.py --port 8099 [--delay 0.5] [--fail-rate 0.3]
+    RAZORPAY_API_BASE=http://127.0.0.1:8099/v1 RAZORPAY_API_SECRET=stub_secret python app.py
+
+Implements POST /v1/orders, GET /v1/orders/<id>, GET /v1/orders/<id>/payments
+and GET /v1/payments/<id>.  POST /v1/stub/pay {"order_id": ...} pays an order
+and returns the checkout fields (payment id and signature) the browser would
+post to /verify-razorpay-payment.  State lives in memory.
+
+Usage:
+    python razorpay_stub.py [--port 8099] [--secret stub_secret] [--delay SECONDS] [--fail-rate 0..1]
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubState:
+    def __init__(self, secret, delay=0.0, fail_rate=0.0):
+        self.secret = secret
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.orders = {}
+        self.payments = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def create_order(self, body):
+        order = {'id': f"order_{uuid.uuid4().hex[:14]}", 'entity': 'order', 'amount': int(body['amount']),
+                 'amount_paid': 0, 'currency': body.get('currency', 'INR'), 'receipt': body.get('receipt'),
+                 'notes': body.get('notes') or {}, 'status': 'created', 'attempts': 0, 'created_at': int(time.time())}
+        with self.lock:
+            self.orders[order['id']] = order
+        return order
+
+    def pay(self, order_id, status='captured'):
+        with self.lock:
+            order = self.orders[order_id]
+            payment = {'id': f"pay_{uuid.uuid4().hex[:14]}", 'entity': 'payment', 'amount': order['amount'],
+                       'currency': order['currency'], 'status': status, 'order_id': order_id,
+                       'method': 'upi', 'captured': status == 'captured', 'created_at': int(time.time())}
+            self.payments[payment['id']] = payment
+            order['attempts'] += 1
+            if status == 'captured':
+                order['status'], order['amount_paid'] = 'paid', order['amount']
+        signature = hmac.new(self.secret.encode(), f"{order_id}|{payment['id']}".encode(), hashlib.sha256).hexdigest()
+        return payment, signature
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, payload):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            try:
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client timed out first - that's what --delay is for
+
+        def _error(self, status, description):
+            self._reply(status, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': description}})
+
+        def _body(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            return json.loads(self.rfile.read(length) or b'{}') if length else {}
+
+        def _handle(self, method):
+            body = self._body()
+            with state.lock:
+                state.requests += 1
+            if state.delay:
+                time.sleep(state.delay)
+            if state.fail_rate and random.random() < state.fail_rate:
+                return self._error(503, 'stub outage')
+
+            path = self.path.split('?', 1)[0]
+            if method == 'POST' and path == '/v1/orders':
+                if int(body.get('amount') or 0) < 100:
+                    return self._error(400, 'Order amount less than minimum amount allowed')
+                return self._reply(200, state.create_order(body))
+            if method == 'POST' and path == '/v1/stub/pay':
+                if body.get('order_id') not in state.orders:
+                    return self._error(400, 'The id provided does not exist')
+                payment, signature = state.pay(body['order_id'], body.get('status', 'captured'))
+                return self._reply(200, {'razorpay_order_id': body['order_id'], 'razorpay_payment_id': payment['id'],
+                                         'razorpay_signature': signature})
+            m = re.fullmatch(r'/v1/orders/([\w]+)(/payments)?', path)
+            if method == 'GET' and m:
+                order = state.orders.get(m.group(1))
+                if not order:
+                    return self._error(400, 'The id provided does not exist')
+                if m.group(2):
+                    items = [p for p in state.payments.values() if p['order_id'] == order['id']]
+                    return self._reply(200, {'entity': 'collection', 'count': len(items), 'items': items})
+                return self._reply(200, order)
+            m = re.fullmatch(r'/v1/payments/([\w]+)', path)
+            if method == 'GET' and m:
+                payment = state.payments.get(m.group(1))
+                return self._reply(200, payment) if payment else self._error(400, 'The id provided does not exist')
+            return self._error(404, 'The requested URL was not found on the server.')
+
+        def do_GET(self):
+            self._handle('GET')
+
+        def do_POST(self):
+            self._handle('POST')
+
+    return Handler
+
+
+def serve(port=8099, secret='stub_secret', delay=0.0, fail_rate=0.0, block=True):
+    """Start the stub; returns ``(server, state)`` when ``block`` is false."""
+    state = StubState(secret, delay, fail_rate)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(state))
+    server.daemon_threads = True
+    if not block:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server, state
+    print(f"Razorpay stub on http://127.0.0.1:{server.server_address[1]}/v1 (secret {secret!r})")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--secret', default='stub_secret')
+    parser.add_argument('--delay', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='share of requests answered with 503')
+    args = parser.parse_args()
+    serve(args.port, args.secret, args.delay, args.fail_rate)
@@ -0,0 +1,28 @@
+"""Rebuild the analytics rollup (analytics_daily_rollup) from the yatra tables.
+
+The app keeps the rollup up to date as registrations are written and rebuilds
+it on its own the first time analytics is opened in a new year.  Run this after
+bulk edits made directly in the database, or to repair drift.
+
+Usage:
+    python rebuild_analytics.py
+"""
+from app import app, db, _get_all_yatra_table_names
+from analytics import rebuild_rollups
+
+
+def rebuild():
+    print("Rebuilding analytics rollup...")
+    with app.app_context():
+        try:
+            table_names = _get_all_yatra_table_names()
+            rebuild_rollups(table_names)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Rollup rebuild failed: {e}")
+            return
+    print(f"Analytics rollup rebuilt ({len(table_names)} yatra tables).")
+
+
+if __name__ == '__main__':
+    rebuild()
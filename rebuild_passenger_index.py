@@ -0,0 +1,30 @@
+"""Rebuild the passenger -> yatra membership index (passenger_yatras).
+
+The app keeps the index up to date as registrations are written; migrate.py
+fills it once for existing registrations.  Run this after bulk edits made
+directly in the database, or to repair drift.
+
+Usage:
+    python rebuild_passenger_index.py
+"""
+from app import app, db, _get_all_yatra_table_names
+from passenger_index import rebuild_memberships
+
+
+def rebuild():
+    print("Rebuilding passenger index...")
+    with app.app_context():
+        try:
+            table_names = _get_all_yatra_table_names()
+            rebuild_memberships(table_names)
+            db.session.commit()
+            count = db.session.execute(db.text("SELECT COUNT(*) FROM passenger_yatras")).scalar()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Passenger index rebuild failed: {e}")
+            return
+    print(f"Passenger index rebuilt: {count} memberships across {len(table_names)} yatra tables.")
+
+
+if __name__ == '__main__':
+    rebuild()
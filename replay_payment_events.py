@@ -0,0 +1,61 @@
+"""Re-apply stored Razorpay webhook events (payment_events).
+
+The reconciler applies each event once.  Use this after fixing whatever made
+events fail or go unmatched (a yatra renamed, an order row restored...), or to
+load webhook bodies exported from the Razorpay dashboard.  Applying is
+idempotent, so replaying an already applied event changes nothing.
+
+Usage:
+    python replay_payment_events.py                           # counts per status
+    python replay_payment_events.py --status failed unmatched
+    python replay_payment_events.py --event-id evt_123 evt_456
+    python replay_payment_events.py --import events.jsonl     # one webhook body per line
+"""
+import argparse
+import json
+
+from app import app, db
+from payment_events import payment_reconciler, record_event
+
+
+def import_events(path):
+    """Store webhook bodies from a JSON-lines file; returns (new, duplicate) counts."""
+    new = duplicate = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            event_id = json.loads(line).get('id')  # exports carry the event id in the body
+            if record_event(line, event_id):
+                new += 1
+            else:
+                duplicate += 1
+    return new, duplicate
+
+
+def replay(statuses=None, event_ids=None, import_path=None):
+    with app.app_context():
+        try:
+            if import_path:
+                new, duplicate = import_events(import_path)
+                print(f"Imported {new} events ({duplicate} already stored).")
+                payment_reconciler.process_pending()
+            elif statuses or event_ids:
+                count = payment_reconciler.replay(event_ids=event_ids, statuses=statuses)
+                print(f"Replayed {count} events.")
+        except Exception as e:
+            db.session.rollback()
+            print(f"Replay failed: {e}")
+            return
+        for status, n in sorted(payment_reconciler.stats().items()):
+            print(f"  {status:<10} {n}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--status', nargs='+', help='replay every event with these statuses')
+    parser.add_argument('--event-id', nargs='+', help='replay these events')
+    parser.add_argument('--import', dest='import_path', help='JSON-lines file of webhook bodies to store and apply')
+    args = parser.parse_args()
+    replay(args.status, args.event_id, args.import_path)
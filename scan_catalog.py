@@ -0,0 +1,26 @@
+"""Build or refresh the photo catalog index (catalog_albums / catalog_photos).
+
+The catalog pages refresh the index themselves every CATALOG_RESCAN_SECONDS,
+but the first scan reads and hashes every photo - run this at deploy time so
+no visitor waits for it.  Folders whose mtime has not changed are skipped;
+pass --force to re-read every file (e.g. after overwriting photos in place).
+
+Usage:
+    python scan_catalog.py [--force]
+"""
+import sys
+
+from app import app
+from catalog_index import catalog_root, scan_catalog
+
+
+def scan(force=False):
+    print("Scanning photo catalog...")
+    with app.app_context():
+        stats = scan_catalog(catalog_root(app.root_path), force=force, log=print)
+    print(f"Catalog scan complete ({stats['albums']} albums, {stats['rescanned']} rescanned, "
+          f"{stats['files_read']} files read, {stats['removed']} removed).")
+
+
+if __name__ == '__main__':
+    scan(force='--force' in sys.argv[1:])
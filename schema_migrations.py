@@ -0,0 +1,219 @@
+"""Versioned schema migrations.
+
+app.py used to run ``db.create_all()`` and a row of ``ALTER TABLE ... ADD
+COLUMN`` statements in try/except at import: every worker, every boot, each
+attempt failing and rolling back (and taking locks on Postgres), while
+columns of the dynamic yatra tables were added by hand-run sqlite3 scripts.
+
+Now every schema change is a numbered function in ``MIGRATIONS`` and the
+versions applied are recorded in ``schema_version``.  ``run_migrations``
+applies the pending ones in order, under a lock (a Postgres advisory lock, or
+a lock file next to the SQLite database) so only one process migrates and
+the rest find nothing left to do.  It runs from ``python migrate.py`` on
+deploy; workers only compare versions at startup (one SELECT) unless
+``SCHEMA_AUTO_MIGRATE`` lets the first of them apply what is pending.
+
+Migrations must be idempotent - a database upgraded by the old startup code
+already has most of these columns, so each one checks before changing
+anything.  Dynamic yatra tables created later already have the current
+layout (yatra_store.create_yatra_table); the migrations bring existing ones
+in line.  Append new migrations with the next version number; never
+renumber or edit applied ones.
+"""
+import os
+from contextlib import contextmanager
+
+from flask import current_app
+from sqlalchemy import inspect, text
+
+from models import db, SchemaVersion, DashboardRevision
+from schema_registry import schema_registry
+from session_store import sessions_table
+from yatra_store import is_view, ensure_yatra_indexes
+
+ADVISORY_LOCK_KEY = 72_801_523  # any constant shared by all processes of this app
+
+MIGRATIONS = []
+
+
+def migration(version, name):
+    """Register the decorated function as migration ``version``."""
+    def register(fn):
+        assert all(m[0] < version for m in MIGRATIONS), 'migrations must be added in version order'
+        MIGRATIONS.append((version, name, fn))
+        return fn
+    return register
+
+
+# ── Helpers ──
+
+def _columns(table):
+    inspector = inspect(db.engine)
+    if table not in inspector.get_table_names():
+        return None
+    return {c['name'] for c in inspector.get_columns(table)}
+
+
+def _add_column(table, column, ddl_type):
+    """Add ``column`` unless ``table`` already has it (or does not exist); True if added."""
+    columns = _columns(table)
+    if columns is None or column in columns:
+        return False
+    db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+    return True
+
+
+def _yatra_tables():
+    """Physical dynamic yatra tables (compatibility views share ``registrations``)."""
+    return [t for t in schema_registry.table_names() if not is_view(t)]
+
+
+# ── Migrations ──
+
+@migration(1, 'core tables')
+def _core_tables():
+    db.create_all()
+
+
+@migration(2, 'yatra_details: is_active, about_image, yatra_message, yatra_link')
+def _yatra_details_columns():
+    _add_column('yatra_details', 'is_active', 'BOOLEAN DEFAULT TRUE')
+    _add_column('yatra_details', 'about_image', 'VARCHAR(255)')
+    _add_column('yatra_details', 'yatra_message', 'TEXT')
+    _add_column('yatra_details', 'yatra_link', 'VARCHAR(500)')
+
+
+@migration(3, 'carousel_images.sort_order')
+def _carousel_sort_order():
+    _add_column('carousel_images', 'sort_order', 'INTEGER DEFAULT 0')
+
+
+@migration(4, 'upload pipeline thumbnail columns')
+def _thumbnail_columns():
+    for table, column in (('login_details', 'photo_thumb'), ('yatra_details', 'about_image_thumb'),
+                          ('carousel_images', 'thumb_path')):
+        _add_column(table, column, 'VARCHAR(255)')
+
+
+@migration(5, 'catalog_albums.cover_hash')
+def _catalog_cover_hash():
+    if _add_column('catalog_albums', 'cover_hash', 'VARCHAR(64)'):
+        # Forget folder mtimes so the next scan fills the hashes in
+        db.session.execute(text("UPDATE catalog_albums SET dir_mtime = NULL"))
+
+
+@migration(6, 'yatra tables: passenger_id, backfilled from login_details')
+def _yatra_passenger_id():
+    for table in _yatra_tables():
+        if not _add_column(table, 'passenger_id', 'INTEGER'):
+            continue
+        # Match by login and name; soft-deleted travelers keep their login as '#del#<login>'
+        db.session.execute(text(f"""
+            UPDATE {table} SET passenger_id = (
+                SELECT MIN(ld.id) FROM login_details ld
+                WHERE ld.name = {table}.name
+                  AND (ld.login_id = {table}.login_id OR ld.login_id = '#del#' || {table}.login_id))
+        """))
+
+
+@migration(7, 'yatra tables: order_id')
+def _yatra_order_id():
+    for table in _yatra_tables():
+        _add_column(table, 'order_id', 'TEXT')
+
+
+@migration(8, 'yatra tables: secondary indexes')
+def _yatra_indexes():
+    for table in _yatra_tables():
+        ensure_yatra_indexes(table, concurrently=True)
+
+
+@migration(9, 'registrations: order_id index')
+def _registrations_order_index():
+    if _columns('registrations') is not None:
+        db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_registrations_order ON registrations (order_id)"))
+
+
+@migration(10, 'passenger_yatras: backfill')
+def _passenger_index_backfill():
+    from passenger_index import rebuild_memberships
+    rebuild_memberships(schema_registry.table_names())
+
+
+@migration(11, 'dashboard_revisions')
+def _dashboard_revisions():
+    DashboardRevision.__table__.create(db.engine, checkfirst=True)
+
+
+@migration(12, 'payment_orders.registration_ids')
+def _payment_order_registrations():
+    _add_column('payment_orders', 'registration_ids', 'TEXT')
+
+
+@migration(13, 'flask_sessions (SESSION_BACKEND=database)')
+def _flask_sessions():
+    # The sqlite backend keeps sessions in a file of its own; switching an existing
+    # deployment to 'database' later needs the table created by hand (sessions_table.create)
+    if current_app.config.get('SESSION_BACKEND') == 'database':
+        sessions_table.create(db.engine, checkfirst=True)
+
+
+# ── Runner ──
+
+def applied_versions():
+    """Versions recorded in ``schema_version`` (empty if the table does not exist yet)."""
+    try:
+        return {row[0] for row in db.session.execute(text("SELECT version FROM schema_version"))}
+    except Exception:
+        db.session.rollback()
+        return set()
+
+
+def pending_migrations():
+    applied = applied_versions()
+    return [(version, name) for version, name, _ in MIGRATIONS if version not in applied]
+
+
+@contextmanager
+def _migration_lock():
+    """Serialise migration runs across processes (and hosts, on Postgres)."""
+    if db.engine.dialect.name == 'postgresql':
+        with db.engine.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:k)"), {'k': ADVISORY_LOCK_KEY})
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:k)"), {'k': ADVISORY_LOCK_KEY})
+        return
+    import fcntl
+    os.makedirs(current_app.instance_path, exist_ok=True)
+    with open(os.path.join(current_app.instance_path, 'schema_migrations.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def run_migrations(log=print):
+    """Apply the pending migrations in order, each committed with its version row.
+    Returns the versions applied (none if another process got there first)."""
+    done = []
+    with _migration_lock():
+        SchemaVersion.__table__.create(db.engine, checkfirst=True)
+        applied = applied_versions()  # re-read under the lock
+        for version, name, fn in MIGRATIONS:
+            if version in applied:
+                continue
+            log(f"Applying migration {version:03d}: {name}")
+            try:
+                fn()
+                db.session.add(SchemaVersion(version=version, name=name))
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            done.append(version)
+        if done:
+            schema_registry.invalidate()
+    return done
@@ -0,0 +1,88 @@
+"""In-process registry of the dynamic yatra tables and their columns.
+
+``_table_exists`` / ``_get_all_yatra_table_names`` / ``_is_valid_table`` used to
+query ``sqlite_master`` or ``pg_catalog`` on every call.  The registry loads the
+whole set once per worker and serves it from memory.  Routes that change DDL
+call ``invalidate()``, which reloads locally and bumps the ``_schema_version``
+stamp so other workers reload on their next version check.
+"""
+import threading
+
+from sqlalchemy import text
+
+from cache_utils import VersionStamp
+from models import db
+
+SCHEMA_VERSION_KEY = '_schema_version'
+
+
+class SchemaRegistry:
+    """Cached map of yatra table / view name -> frozenset of its column names."""
+
+    def __init__(self, check_interval_ms=2000):
+        self.stamp = VersionStamp(SCHEMA_VERSION_KEY, check_interval_ms)
+        self._tables = None
+        self._loaded_stamp = None
+        self._lock = threading.Lock()
+
+    def configure(self, check_interval_ms):
+        self.stamp.check_interval = check_interval_ms / 1000.0
+
+    @property
+    def version(self):
+        """Stamp of the schema currently loaded (usable as a cache key)."""
+        self._ensure_fresh()
+        return self._loaded_stamp
+
+    def _load(self):
+        if db.engine.dialect.name == 'postgresql':
+            rows = db.session.execute(text("""
+                SELECT c.table_name, c.column_name FROM information_schema.columns c
+                WHERE c.table_schema = 'public' AND c.table_name LIKE 'yatra\\_%' AND c.table_name != 'yatra_details'
+            """)).fetchall()
+        else:
+            rows = db.session.execute(text("""
+                SELECT m.name, p.name FROM sqlite_master m JOIN pragma_table_info(m.name) p
+                WHERE m.type IN ('table', 'view') AND m.name LIKE 'yatra\\_%' ESCAPE '\\' AND m.name != 'yatra_details'
+            """)).fetchall()
+        tables = {}
+        for tname, column in rows:
+            tables.setdefault(tname, set()).add(column)
+        return {tname: frozenset(cols) for tname, cols in tables.items()}
+
+    def _ensure_fresh(self, force_check=False):
+        """The loaded map, reloaded first if the stamp moved.  Callers read the
+        map returned, never ``self._tables``: another thread may swap it."""
+        stamp = self.stamp.current(force=force_check)
+        tables = self._tables
+        if tables is not None and stamp == self._loaded_stamp:
+            return tables
+        with self._lock:
+            if self._tables is not None and stamp == self._loaded_stamp:
+                return self._tables
+            tables = self._load()
+            self._tables, self._loaded_stamp = tables, stamp
+            return tables
+
+    def table_names(self):
+        """All dynamic yatra table / view names, sorted."""
+        return sorted(self._ensure_fresh())
+
+    def has_table(self, name):
+        if name in self._ensure_fresh():
+            return True
+        # A miss may be a table another worker just created - confirm against the stamp.
+        return name in self._ensure_fresh(force_check=True)
+
+    def columns(self, name):
+        """Column names of a yatra table (empty if unknown)."""
+        return self._ensure_fresh().get(name, frozenset())
+
+    def invalidate(self):
+        """Call after committing DDL on yatra tables: reload here, notify other workers."""
+        with self._lock:
+            # Keep the map for readers already holding it; the next lookup reloads
+            self._loaded_stamp = None
+        self.stamp.bump()
+
+schema_registry = SchemaRegistry()
@@ -0,0 +1,268 @@
+"""Server-side sessions in a SQL table.
+
+Sessions used to live in Flask-Session's filesystem store: one pickle file
+per visitor in the temp dir, read and rewritten on every request and never
+cleaned up, so a registration drive left hundreds of thousands of files in
+one directory.  ``SqlSessionInterface`` keeps them in a table instead:
+
+* ``SESSION_BACKEND=sqlite`` (default) - a separate SQLite file
+  (``SESSION_SQLITE_PATH``) in WAL mode, so concurrent workers read without
+  blocking each other and writes are one short transaction.
+* ``SESSION_BACKEND=database`` - a ``flask_sessions`` table in the app's own
+  database (use this on Postgres / multi-host deployments), created by
+  ``python migrate.py`` like the rest of that schema.
+* ``SESSION_BACKEND=filesystem`` - the old Flask-Session store.
+
+Rows carry an indexed ``expires_at``; a daemon thread per process deletes
+expired rows in small batches every ``SESSION_GC_SECONDS``.  A request that
+did not change its session does not write at all - the row's expiry is only
+pushed forward once less than half of ``PERMANENT_SESSION_LIFETIME`` is left.
+Data is stored with Flask's tagged JSON (as the cookie session would), the
+cookie carries a signed random id.
+"""
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from sqlalchemy import Column, Double, MetaData, String, Table, Text, create_engine, text
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.schema import CreateIndex, CreateTable
+from werkzeug.datastructures import CallbackDict
+
+TABLE = 'flask_sessions'
+GC_BATCH = 500
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False, raw=None, expires_at=None):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.raw = raw                # stored data at load time, to skip unchanged writes
+        self.expires_at = expires_at
+        self.modified = False
+
+
+# Kept out of models.db's metadata: the table lives in the app database only with SESSION_BACKEND=database
+sessions_table = Table(
+    TABLE, MetaData(),
+    Column('id', String(64), primary_key=True),
+    Column('data', Text, nullable=False),
+    Column('expires_at', Double, nullable=False, index=True),
+)
+_UPSERT = (f"INSERT INTO {TABLE} (id, data, expires_at) VALUES (:id, :data, :exp) "
+           f"ON CONFLICT (id) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at")
+_EXPIRED = f"DELETE FROM {TABLE} WHERE id IN (SELECT id FROM {TABLE} WHERE expires_at <= :now LIMIT :n)"
+
+
+class SqlSessionStore:
+    """Session rows in any SQLAlchemy database: ``load`` / ``save`` / ``delete`` / ``gc``."""
+
+    def __init__(self, url):
+        self.engine = create_engine(url, pool_pre_ping=True)  # the table comes from schema_migrations
+
+    def load(self, sid, now):
+        """``(data, expires_at)`` of a live session, ``(None, None)`` otherwise."""
+        with self.engine.connect() as conn:
+            row = conn.execute(text(f"SELECT data, expires_at FROM {TABLE} WHERE id = :id AND expires_at > :now"),
+                               {'id': sid, 'now': now}).first()
+        return (row[0], row[1]) if row else (None, None)
+
+    def save(self, sid, data, expires_at):
+        with self.engine.begin() as conn:
+            conn.execute(text(_UPSERT), {'id': sid, 'data': data, 'exp': expires_at})
+
+    def delete(self, sid):
+        with self.engine.begin() as conn:
+            conn.execute(text(f"DELETE FROM {TABLE} WHERE id = :id"), {'id': sid})
+
+    def _delete_expired(self, now, batch):
+        with self.engine.begin() as conn:
+            return conn.execute(text(_EXPIRED), {'now': now, 'n': batch}).rowcount
+
+    def gc(self, now, batch=GC_BATCH, pause=0.05):
+        """Delete expired rows ``batch`` at a time (short write locks).  Returns the count."""
+        deleted = 0
+        while True:
+            n = self._delete_expired(now, batch)
+            deleted += n
+            if n < batch:
+                return deleted
+            time.sleep(pause)
+
+    def count(self):
+        with self.engine.connect() as conn:
+            return conn.execute(text(f"SELECT COUNT(*) FROM {TABLE}")).scalar()
+
+
+class SqliteSessionStore(SqlSessionStore):
+    """The same table in its own SQLite file in WAL mode, through one plain
+    ``sqlite3`` connection per thread - a session lookup is on every request,
+    so it skips the SQLAlchemy layer.  The file is no part of the app
+    database, so the store creates its table itself."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        dialect = sqlite.dialect()
+        conn.execute(str(CreateTable(sessions_table, if_not_exists=True).compile(dialect=dialect)))
+        for index in sessions_table.indexes:
+            conn.execute(str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect)))
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():  # not inherited across a fork
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')  # survives app crashes; a power cut may lose the last writes
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def load(self, sid, now):
+        row = self._conn().execute(f"SELECT data, expires_at FROM {TABLE} WHERE id = ? AND expires_at > ?",
+                                   (sid, now)).fetchone()
+        return (row[0], row[1]) if row else (None, None)
+
+    def save(self, sid, data, expires_at):
+        self._conn().execute(_UPSERT, {'id': sid, 'data': data, 'exp': expires_at})
+
+    def delete(self, sid):
+        self._conn().execute(f"DELETE FROM {TABLE} WHERE id = ?", (sid,))
+
+    def _delete_expired(self, now, batch):
+        return self._conn().execute(_EXPIRED, {'now': now, 'n': batch}).rowcount
+
+    def count(self):
+        return self._conn().execute(f"SELECT COUNT(*) FROM {TABLE}").fetchone()[0]
+
+
+class SqlSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store, gc_interval=300, logger=None):
+        self.store = store
+        self.gc_interval = gc_interval
+        self.logger = logger
+        self._gc_pid = None
+        self._lock = threading.Lock()
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt='flask-session', key_derivation='hmac')
+
+    def _lifetime(self, app):
+        return app.permanent_session_lifetime.total_seconds()
+
+    def open_session(self, app, request):
+        self._ensure_gc()
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode()
+            except BadSignature:
+                sid = None
+            if sid:
+                try:
+                    raw, expires_at = self.store.load(sid, time.time())
+                except Exception as e:
+                    self._log(f"Session load failed: {e}")
+                    raw = None
+                if raw is not None:
+                    try:
+                        return ServerSession(self.serializer.loads(raw), sid=sid, raw=raw, expires_at=expires_at)
+                    except ValueError:
+                        pass
+        return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        partitioned = self.get_cookie_partitioned(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not session:
+            # Emptied (logout) or never used: nothing to keep
+            if not session.new:
+                try:
+                    self.store.delete(session.sid)
+                except Exception as e:
+                    # The cookie still goes; the row expires and is collected
+                    self._log(f"Session delete failed: {e}")
+                response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                       partitioned=partitioned, samesite=samesite, httponly=httponly)
+            return
+
+        now = time.time()
+        lifetime = self._lifetime(app)
+        fresh = session.expires_at is not None and session.expires_at - now > lifetime / 2
+        if session.modified or not fresh:
+            raw = self.serializer.dumps(dict(session)) if session.modified else session.raw
+            if raw != session.raw or not fresh:
+                try:
+                    self.store.save(session.sid, raw, now + lifetime)
+                except Exception as e:
+                    # Answer the request anyway; the change is lost, as if it was never made
+                    self._log(f"Session save failed: {e}")
+
+        if session.new or (session.permanent and self.should_set_cookie(app, session)):
+            response.set_cookie(name, self._signer(app).sign(session.sid).decode(),
+                                expires=self.get_expiration_time(app, session), httponly=httponly,
+                                domain=domain, path=path, secure=secure, partitioned=partitioned,
+                                samesite=samesite)
+
+    # ── Garbage collection ──
+
+    def _ensure_gc(self):
+        if self._gc_pid == os.getpid() or self.gc_interval <= 0:
+            return
+        with self._lock:
+            if self._gc_pid == os.getpid():
+                return
+            # First request in this process (gunicorn workers fork after import)
+            self._gc_pid = os.getpid()
+            threading.Thread(target=self._gc_loop, name='session-gc', daemon=True).start()
+
+    def _gc_loop(self):
+        while True:
+            try:
+                self.store.gc(time.time())
+            except Exception as e:
+                self._log(f"Session cleanup failed: {e}")
+            time.sleep(self.gc_interval)
+
+    def _log(self, message):
+        if self.logger:
+            self.logger.error(message)
+
+
+def init_sessions(app, logger=None):
+    """Install the session backend chosen by ``SESSION_BACKEND``."""
+    backend = app.config['SESSION_BACKEND']
+    if backend == 'filesystem':
+        from flask_session import Session
+        app.config['SESSION_TYPE'] = 'filesystem'
+        os.makedirs(app.config['SESSION_FILE_DIR'], exist_ok=True)
+        Session(app)
+        return
+    if backend == 'sqlite':
+        path = app.config['SESSION_SQLITE_PATH']
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        store = SqliteSessionStore(path)
+    elif backend == 'database':
+        store = SqlSessionStore(app.config['SQLALCHEMY_DATABASE_URI'])
+    else:
+        raise ValueError(f"Unknown SESSION_BACKEND {backend!r} (sqlite, database or filesystem)")
+    app.session_interface = SqlSessionInterface(store, app.config['SESSION_GC_SECONDS'], logger)
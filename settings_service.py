@@ -0,0 +1,113 @@
+"""Process-wide cache of the ``app_settings`` key/value table.
+
+Almost every public page read one or two settings rows per request even though
+they only change when an admin flips a toggle.  ``settings`` loads every key in
+one query, serves typed getters from memory and reloads only when the
+``_settings_version`` stamp moves - which every write through ``set_setting`` /
+``set_many`` does, so other gunicorn workers pick changes up within
+``SETTINGS_VERSION_CHECK_MS``.
+"""
+import json
+import threading
+
+from cache_utils import VersionStamp
+from models import db, AppSettings
+
+SETTINGS_VERSION_KEY = '_settings_version'
+
+
+class SettingsService:
+    """Typed, cached access to ``AppSettings`` rows."""
+
+    def __init__(self, check_interval_ms=1000):
+        self.stamp = VersionStamp(SETTINGS_VERSION_KEY, check_interval_ms)
+        self._values = None
+        self._loaded_stamp = None
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def configure(self, check_interval_ms):
+        self.stamp.check_interval = check_interval_ms / 1000.0
+
+    def _load(self):
+        return {key: value for key, value in db.session.query(AppSettings.key, AppSettings.value).all()}
+
+    def _ensure_fresh(self):
+        """The loaded values, reloaded first if the stamp moved.  Callers read
+        the dict returned, never ``self._values``: another thread may swap it."""
+        stamp = self.stamp.current()
+        values = self._values
+        if values is not None and stamp == self._loaded_stamp:
+            return values
+        with self._lock:
+            if self._values is not None and stamp == self._loaded_stamp:
+                return self._values
+            values = self._load()
+            self._values, self._loaded_stamp = values, stamp
+            self.reloads += 1
+            return values
+
+    # ── Getters ──
+
+    def get_setting(self, key, default=None):
+        """Raw string value of ``key``; ``default`` if the row is missing."""
+        return self._ensure_fresh().get(key, default)
+
+    def get_bool(self, key, default=False):
+        """``True`` for 'true' / 'false' style values; ``default`` if the row is missing or empty."""
+        value = self.get_setting(key)
+        if value is None or value == '':
+            return default
+        return value.strip().lower() in ('true', '1', 'yes', 'on')
+
+    def get_json(self, key, default=None):
+        """JSON-decoded value of ``key``; ``default`` if missing or unparsable."""
+        value = self.get_setting(key)
+        if not value:
+            return default
+        try:
+            return json.loads(value)
+        except Exception:
+            return default
+
+    def is_registration_enabled(self):
+        # Enabled unless explicitly switched off
+        return self.get_setting('registration_enabled') != 'false'
+
+    def accept_payment_mode(self):
+        return self.get_setting('accept_payment_mode') == 'true'
+
+    # ── Writers ──
+
+    def set_many(self, values):
+        """Upsert several keys in one transaction and notify every worker."""
+        rows = {row.key: row for row in AppSettings.query.filter(AppSettings.key.in_(list(values))).all()}
+        for key, value in values.items():
+            row = rows.get(key)
+            if not row:
+                row = AppSettings(key=key)
+                db.session.add(row)
+            row.value = value
+        db.session.commit()
+        self.invalidate()
+
+    def set_setting(self, key, value):
+        self.set_many({key: value})
+
+    def invalidate(self):
+        with self._lock:
+            # Keep the values for readers already holding them; the next read reloads
+            self._loaded_stamp = None
+        self.stamp.bump()
+
+    def stats(self):
+        values = self._values
+        return {
+            'keys': len(values) if values is not None else None,
+            'version': self._loaded_stamp,
+            'reloads': self.reloads,
+            'check_interval_ms': int(self.stamp.check_interval * 1000),
+        }
+
+
+settings = SettingsService()
@@ -0,0 +1,121 @@
+"""Where does a worker's startup go?
+
+``app.py`` imports this module first and calls ``startup_timer.mark(phase)``
+after each block of its startup (imports, config and sessions, schema check,
+background services, routes).  With ``STARTUP_PROFILE=1`` in the environment
+the phases are printed to stderr once the app is built; otherwise marking
+costs one ``perf_counter`` call.
+
+Run as a script it imports the app in a fresh interpreter under
+``python -X importtime`` and reports the slowest imports, time per top-level
+package, the phase timings and the resident memory the worker starts with.
+
+Usage:
+    python startup_profile.py [--top 25]
+"""
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Child: import the app, then report its own timings and resident set size
+_CHILD = """
+import sys, time
+t0 = time.perf_counter()
+import app
+elapsed = time.perf_counter() - t0
+rss = next(int(line.split()[1]) for line in open('/proc/self/status') if line.startswith('VmRSS:'))
+print(f'STARTUP {elapsed:.6f} {rss}', file=sys.stderr)
+"""
+
+
+class StartupTimer:
+    def __init__(self):
+        self.enabled = os.getenv('STARTUP_PROFILE', '').strip().lower() in ('1', 'true', 'yes')
+        self.started = self._last = time.perf_counter()
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def report(self, out=None):
+        if not self.enabled:
+            return
+        out = out or sys.stderr
+        for phase, seconds in self.phases:
+            print(f"PHASE {seconds * 1000:9.1f} ms  {phase}", file=out)
+        print(f"PHASE {(self._last - self.started) * 1000:9.1f} ms  total", file=out)
+
+
+startup_timer = StartupTimer()
+
+
+def run_child(env=None, importtime=False, cwd=None):
+    """Import the app in a fresh interpreter.  Returns ``(wall seconds including
+    interpreter start, import seconds, RSS in KB after import, stderr lines)``."""
+    cmd = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', _CHILD]
+    child_env = dict(os.environ, **(env or {}))
+    child_env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, child_env.get('PYTHONPATH')]))
+    start = time.perf_counter()
+    result = subprocess.run(cmd, env=child_env, cwd=cwd, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    lines = result.stderr.splitlines()
+    summary = [line for line in lines if line.startswith('STARTUP ')]
+    if result.returncode or not summary:
+        raise RuntimeError(f"importing the app failed:\n{result.stderr[-2000:]}")
+    _, seconds, rss = summary[-1].split()
+    return wall, float(seconds), int(rss), lines
+
+
+def parse_importtime(lines):
+    """``[(module, self us, cumulative us, depth)]`` from ``-X importtime`` output."""
+    rows = []
+    for line in lines:
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Profile the import and startup of app.py')
+    parser.add_argument('--top', type=int, default=25, help='slowest imports to list')
+    args = parser.parse_args()
+
+    wall, seconds, rss, lines = run_child({'STARTUP_PROFILE': '1'}, importtime=True)
+    rows = parse_importtime(lines)
+    app_row = next((row for row in rows if row[0] == 'app'), None)
+    app_depth = app_row[3] if app_row else 0
+
+    print("Slowest imports (cumulative, below app):")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    below_app = [row for row in rows if row[3] > app_depth]
+    for name, self_us, cumulative_us, _ in sorted(below_app, key=lambda r: -r[2])[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+
+    packages = {}
+    for name, self_us, _, _ in rows:
+        top = name.split('.')[0]
+        packages[top] = packages.get(top, 0) + self_us
+    print("\nSelf time by top-level package:")
+    for top, self_us in sorted(packages.items(), key=lambda p: -p[1])[:args.top]:
+        print(f"{self_us / 1000:>14.1f} ms  {top}")
+
+    print("\nStartup phases of app.py (STARTUP_PROFILE=1):")
+    for line in lines:
+        if line.startswith('PHASE '):
+            print(line[len('PHASE '):])
+    print(f"\nImport of app: {seconds * 1000:.0f} ms; process start to ready: {wall * 1000:.0f} ms; "
+          f"RSS after import: {rss / 1024:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""Vendored, fingerprinted and precompressed static assets.
+
+The pages used to pull Bootstrap, bootstrap-icons, flatpickr, Chart.js and
+SortableJS from jsDelivr (two of them unversioned, sortablejs ``@latest``) and
+served style.css / state_district.json with Flask's default revalidate-every-
+time caching.
+
+build_assets.py runs two steps:
+
+* ``vendor_assets`` downloads the pinned files in ``VENDOR_FILES`` into
+  ``static/vendor/<package>@<version>/...`` (jsDelivr's own layout).
+* ``build_assets`` copies every CSS / JS / JSON / font file under static/ to
+  ``static/dist`` with a content hash in its name, rewrites ``url(...)``
+  references inside CSS to the hashed names, writes ``.gz`` (and ``.br`` when
+  the Brotli package is installed) siblings and records the mapping in
+  ``static/dist/manifest.json``.
+
+Templates link assets through ``asset_url('css/style.css')``: the hashed
+``/assets/...`` URL once built (served with a year-long immutable
+Cache-Control), the plain static file otherwise, and for a vendored file not
+downloaded yet the pinned jsDelivr URL - so a checkout works before the first
+build.
+"""
+import hashlib
+import json
+import os
+import posixpath
+import re
+
+CDN_ROOT = 'https://cdn.jsdelivr.net/npm/'
+# Paths below static/vendor, which are also their jsDelivr paths
+VENDOR_FILES = (
+    'bootstrap@5.3.0/dist/css/bootstrap.min.css',
+    'bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
+    'bootstrap-icons@1.11.0/font/bootstrap-icons.css',
+    'bootstrap-icons@1.11.0/font/fonts/bootstrap-icons.woff2',
+    'bootstrap-icons@1.11.0/font/fonts/bootstrap-icons.woff',
+    'flatpickr@4.6.13/dist/flatpickr.min.css',
+    'flatpickr@4.6.13/dist/flatpickr.min.js',
+    'flatpickr@4.6.13/dist/themes/dark.css',
+    'chart.js@4.4.1/dist/chart.umd.js',
+    'sortablejs@1.15.2/Sortable.min.js',
+)
+
+ASSET_EXTENSIONS = {'.css', '.js', '.json', '.svg', '.woff', '.woff2', '.ttf', '.eot'}
+COMPRESS_EXTENSIONS = {'.css', '.js', '.json', '.svg', '.ttf', '.eot'}  # woff/woff2 are compressed already
+COMPRESS_MIN_BYTES = 1024
+# Photos and uploads are not build assets; dist is the output
+SKIP_DIRS = {'dist', 'images', 'uploads', 'derivatives'}
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 12
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+_CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+_SOURCE_MAP = re.compile(r'/[*/]# sourceMappingURL=[^\s*]+\s*(\*/)?')
+
+
+def dist_root(app_root):
+    return os.path.join(app_root, 'static', 'dist')
+
+
+def cdn_url(filename):
+    """jsDelivr URL of a ``vendor/...`` asset, ``None`` for our own files."""
+    if filename.startswith('vendor/'):
+        return CDN_ROOT + filename[len('vendor/'):]
+    return None
+
+
+# ── Vendoring ──
+
+def vendor_assets(static_root, force=False, log=print, timeout=30):
+    """Download the ``VENDOR_FILES`` that are not in static/vendor yet.
+    Returns the number downloaded."""
+    import urllib.request  # build step only
+
+    downloaded = 0
+    for rel in VENDOR_FILES:
+        target = os.path.join(static_root, 'vendor', *rel.split('/'))
+        if os.path.exists(target) and not force:
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with urllib.request.urlopen(CDN_ROOT + rel, timeout=timeout) as response:
+            data = response.read()
+        with open(target + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(target + '.tmp', target)
+        downloaded += 1
+        if log:
+            log(f"vendor/{rel} ({len(data) // 1024} KB)")
+    return downloaded
+
+
+# ── Building ──
+
+def _source_assets(static_root):
+    """``{logical name: absolute path}`` of every asset below ``static_root``;
+    the logical name is the path relative to it with forward slashes."""
+    found = {}
+    for dirpath, dirnames, filenames in os.walk(static_root):
+        if dirpath == static_root:
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+        dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+        for filename in filenames:
+            if os.path.splitext(filename)[1].lower() in ASSET_EXTENSIONS and not filename.startswith('.'):
+                path = os.path.join(dirpath, filename)
+                found[os.path.relpath(path, static_root).replace(os.sep, '/')] = path
+    return found
+
+
+def _hashed_name(name, data):
+    stem, ext = posixpath.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}"
+
+
+def _rewrite_css(name, css, manifest, static_url_path):
+    """Point relative ``url(...)``s of the CSS file ``name`` at the hashed
+    copies, and drop source map comments (the maps are not shipped).  The
+    hashed copy sits in the same directory under dist/."""
+    base = posixpath.dirname(name)
+
+    def replace(match):
+        quote, ref = match.groups()
+        if re.match(r'^([a-z]+:|/|#)', ref, re.I):  # data:, http:, absolute, fragment
+            return match.group(0)
+        target = posixpath.normpath(posixpath.join(base, ref.split('?', 1)[0].split('#', 1)[0]))
+        if target in manifest:
+            rel = posixpath.relpath(manifest[target], base or '.')
+        else:
+            # Not a build asset (e.g. a photo): the original, which is not below /assets
+            rel = f"{static_url_path}/{target}"
+        return f"url({quote}{rel}{quote})"
+
+    return _SOURCE_MAP.sub('', _CSS_URL.sub(replace, css))
+
+
+def _compress(path, data):
+    import gzip
+
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(data, 9, mtime=0))
+    try:
+        import brotli
+    except ImportError:
+        return
+    with open(path + '.br', 'wb') as f:
+        f.write(brotli.compress(data))
+
+
+def _write(out_root, hashed, data):
+    target = os.path.join(out_root, *hashed.split('/'))
+    if os.path.exists(target):
+        return False  # same name = same content
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(target + '.tmp', target)
+    if posixpath.splitext(hashed)[1] in COMPRESS_EXTENSIONS and len(data) >= COMPRESS_MIN_BYTES:
+        _compress(target, data)
+    return True
+
+
+def build_assets(static_root, out_root, static_url_path='/static', log=print):
+    """Fingerprint every asset below ``static_root`` into ``out_root`` and write
+    the manifest.  ``static_url_path`` is where the app serves static/.
+    Returns ``(written, unchanged)``."""
+    sources = _source_assets(static_root)
+    manifest, written, unchanged = {}, 0, 0
+
+    # Everything but CSS first: a CSS file's content (and so its hash) includes
+    # the hashed names it references
+    css = sorted(name for name in sources if name.endswith('.css'))
+    for name in sorted(set(sources) - set(css)) + css:
+        if name in css:
+            with open(sources[name], encoding='utf-8') as f:
+                data = _rewrite_css(name, f.read(), manifest, static_url_path).encode('utf-8')
+        else:
+            with open(sources[name], 'rb') as f:
+                data = f.read()
+        manifest[name] = _hashed_name(name, data)
+        if _write(out_root, manifest[name], data):
+            written += 1
+        else:
+            unchanged += 1
+    for name in sorted(manifest):
+        if log:
+            log(f"{name} -> {manifest[name]}")
+
+    path = os.path.join(out_root, MANIFEST_NAME)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)  # pages switch to the new names only once all files exist
+    return written, unchanged
+
+
+def prune_assets(out_root):
+    """Delete built files (and their .gz/.br) the manifest no longer references.
+    Keep the previous build until no cached page can still link to it."""
+    try:
+        with open(os.path.join(out_root, MANIFEST_NAME)) as f:
+            referenced = set(json.load(f).values())
+    except (OSError, ValueError):
+        return 0
+    deleted = 0
+    for dirpath, _, filenames in os.walk(out_root):
+        for filename in filenames:
+            rel = os.path.relpath(os.path.join(dirpath, filename), out_root).replace(os.sep, '/')
+            base = re.sub(r'\.(gz|br)$', '', rel)
+            if rel != MANIFEST_NAME and base not in referenced:
+                os.remove(os.path.join(dirpath, filename))
+                deleted += 1
+    return deleted
+
+
+# ── Serving ──
+
+def pick_encoding(path, accept_encoding):
+    """The precompressed sibling of ``path`` the client accepts, as
+    ``(path, content encoding)``; ``(path, None)`` when there is none."""
+    accepted = {part.split(';', 1)[0].strip().lower() for part in (accept_encoding or '').split(',')}
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if encoding in accepted and os.path.exists(path + suffix):
+            return path + suffix, encoding
+    return path, None
@@ -1,3 +1,4 @@
-from app import app, db, AppSettings
+from app import app, db
+from models import AppSettings
 with app.app_context():
     print(AppSettings.query.filter_by(key='recent_yatra_youtube').first().value)
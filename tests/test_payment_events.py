@@ -0,0 +1,168 @@
+"""Webhook reconciler (payment_events.py): duplicates, event order and pay-all orders.
+
+Runs the app against a throw-away SQLite database, with orders created
+through /create-razorpay-order on razorpay_stub.py and events applied
+inline (``PAYMENT_RECONCILE_INTERVAL=0``).
+
+Usage:
+    python -m pytest tests/test_payment_events.py
+"""
+import os
+import socket
+import sys
+import tempfile
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix='yatra_test_')
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+STUB_PORT = _free_port()
+os.environ['DATABASE_URI'] = 'sqlite:///' + os.path.join(WORKDIR, 'test.db')
+os.environ['SESSION_SQLITE_PATH'] = os.path.join(WORKDIR, 'sessions.sqlite3')
+os.environ['UPLOAD_STAGING_DIR'] = os.path.join(WORKDIR, 'upload_staging')
+os.environ['SCHEMA_AUTO_MIGRATE'] = 'true'
+os.environ['RAZORPAY_API_BASE'] = f'http://127.0.0.1:{STUB_PORT}/v1'
+os.environ['RAZORPAY_API_KEY'] = 'rzp_test'
+os.environ['RAZORPAY_API_SECRET'] = 'stub_secret'
+os.environ['PAYMENT_RECONCILE_INTERVAL'] = '0'
+os.environ['ADMIN_PASSWORD'] = 'test_pw'
+sys.path.insert(0, ROOT)
+os.chdir(WORKDIR)
+
+import razorpay_stub  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+from app import app, db, settings, sanitize_table_name  # noqa: E402
+from fake_razorpay_events import make_event  # noqa: E402
+from models import LoginDetails, PaymentEvent, YatraDetails  # noqa: E402
+from payment_events import record_event, payment_reconciler  # noqa: E402
+
+razorpay_stub.serve(STUB_PORT, os.environ['RAZORPAY_API_SECRET'], block=False)
+app.config['TESTING'] = True
+
+YATRAS = []  # titles created so far; each test gets its own yatra and login
+
+
+@pytest.fixture
+def yatra():
+    """A new yatra with a logged-in user and two travelers saved on it."""
+    title = f"Test Yatra {len(YATRAS) + 1}"
+    YATRAS.append(title)
+    admin = app.test_client()
+    assert admin.post('/admin224151/login', json={'username': 'admin', 'password': 'test_pw'}).get_json()['success']
+    assert admin.post('/admin/manage-yatra', data={
+        'title': title, 'starting_date': '2026-01-01', 'end_date': '2026-01-10',
+        'hotel_title[]': ['Std'], 'hotel_price[]': ['100'],
+        'travel_title[]': ['Bus'], 'travel_price[]': ['50']}).status_code == 302
+    with app.app_context():
+        settings.set_many({'accept_payment_mode': 'true'})
+        yatra_id = YatraDetails.query.filter_by(title=title).first().id
+
+    user = app.test_client()
+    assert user.post('/send-otp', json={'phone': f"90000000{len(YATRAS):02d}"}).get_json()['success']
+    travelers = [_add_traveler(user, yatra_id, f"{name} {len(YATRAS)}") for name in ('Ram', 'Sita')]
+    return {'yatra_id': yatra_id, 'table': sanitize_table_name(title), 'user': user, 'travelers': travelers}
+
+
+def _add_traveler(user, yatra_id, name):
+    user.post('/add-traveler', data={'name': name, 'year_of_birth': '1990', 'gender': 'Male', 'email': 'a@b.c'})
+    with app.app_context():
+        passenger_id = LoginDetails.query.filter_by(name=name).first().id
+    assert user.post('/save-passenger-package', data={'yatra_id': yatra_id, 'passenger_id': passenger_id,
+                                                      'hotel': 'Std', 'travel': 'Bus'}).get_json()['success']
+    return passenger_id
+
+
+def _create_order(yatra, passenger_id, amount=15000):
+    data = yatra['user'].post('/create-razorpay-order', json={
+        'yatra_id': yatra['yatra_id'], 'passenger_id': passenger_id, 'amount_paise': amount}).get_json()
+    assert data['success'], data
+    return data['order_id']
+
+
+def _deliver(event_id, body):
+    """Store and apply one webhook delivery; the stored event, or None for a duplicate."""
+    with app.app_context():
+        event = record_event(body, event_id)
+        payment_reconciler.process_pending()
+        return event and event.event_id
+
+
+def _statuses(yatra):
+    with app.app_context():
+        rows = db.session.execute(text(f"SELECT passenger_id, status FROM {yatra['table']}")).fetchall()
+    return {passenger_id: status for passenger_id, status in rows}
+
+
+def _event_status(event_id):
+    with app.app_context():
+        return PaymentEvent.query.filter_by(event_id=event_id).one().status
+
+
+def test_duplicate_event_is_applied_once(yatra):
+    ram, sita = yatra['travelers']
+    order_id = _create_order(yatra, ram)
+    event_id, body = make_event(order_id, 15000)
+
+    assert _deliver(event_id, body) == event_id
+    assert _deliver(event_id, body) is None
+    assert _event_status(event_id) == 'applied'
+    assert _statuses(yatra) == {ram: 'Paid', sita: 'Interest'}
+
+
+def test_captured_after_failed_marks_paid(yatra):
+    ram, sita = yatra['travelers']
+    order_id = _create_order(yatra, ram)
+
+    _deliver(*make_event(order_id, 15000, 'failed'))
+    assert _statuses(yatra)[ram] == 'Failed'
+    _deliver(*make_event(order_id, 15000))
+    assert _statuses(yatra) == {ram: 'Paid', sita: 'Interest'}
+
+
+def test_failed_after_captured_keeps_paid(yatra):
+    ram, _ = yatra['travelers']
+    order_id = _create_order(yatra, ram)
+
+    _deliver(*make_event(order_id, 15000))
+    _deliver(*make_event(order_id, 15000, 'failed'))
+    assert _statuses(yatra)[ram] == 'Paid'
+
+
+def test_pay_all_covers_only_travelers_registered_at_order_time(yatra):
+    ram, sita = yatra['travelers']
+    order_id = _create_order(yatra, 0, amount=30000)
+    laxman = _add_traveler(yatra['user'], yatra['yatra_id'], f"Laxman {len(YATRAS)}")
+
+    event_id, body = make_event(order_id, 30000)
+    _deliver(event_id, body)
+    assert _event_status(event_id) == 'applied'
+    assert _statuses(yatra) == {ram: 'Paid', sita: 'Paid', laxman: 'Interest'}
+
+
+def test_sweep_applies_events_nobody_kicked(yatra):
+    """An event stored by a worker that died before applying it is picked up by the sweep."""
+    ram, _ = yatra['travelers']
+    order_id = _create_order(yatra, ram)
+    event_id, body = make_event(order_id, 15000)
+    with app.app_context():
+        record_event(body, event_id)  # stored, never kicked
+
+    payment_reconciler.interval = 0.05
+    try:
+        payment_reconciler.start()  # what app.start_worker_services does in each worker
+        deadline = time.time() + 5
+        while _event_status(event_id) != 'applied' and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        payment_reconciler.interval = 3600  # park the sweep thread for the remaining tests
+    assert _event_status(event_id) == 'applied'
+    assert _statuses(yatra)[ram] == 'Paid'
@@ -0,0 +1,102 @@
+"""RazorpayGateway connection reuse: order creation must not fail (or be
+sent twice) because a pooled keep-alive connection went stale.
+
+Usage:
+    python -m pytest tests/test_payment_gateway.py
+"""
+import json
+import os
+import socket
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from payment_gateway import RazorpayGateway  # noqa: E402
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Answers every request with an order on a keep-alive connection.  After
+    ``server.requests_per_connection`` it closes its side, like a keep-alive
+    timeout the client was not told about, and discards whatever still
+    arrives: the client's write succeeds, its read finds the connection gone."""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.served = 0
+        self.server.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.server.requests.append((self.server.connections, self.path))
+        body = json.dumps({'id': f"order_{len(self.server.requests)}", 'amount': 100, 'currency': 'INR'}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.served += 1
+        if self.served >= self.server.requests_per_connection:
+            self.wfile.flush()
+            self.connection.shutdown(socket.SHUT_WR)
+            self.server.closed.set()
+            self.connection.settimeout(5)
+            try:
+                while self.connection.recv(65536):
+                    self.server.dropped += 1
+            except OSError:
+                pass
+            self.close_connection = True
+
+
+@pytest.fixture
+def server():
+    srv = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    srv.daemon_threads = True
+    srv.requests, srv.connections, srv.dropped, srv.closed = [], 0, 0, threading.Event()
+    srv.requests_per_connection = 100
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def _gateway(server, max_idle=20.0):
+    gateway = RazorpayGateway()
+    gateway.api_base = f'http://127.0.0.1:{server.server_address[1]}/v1'
+    gateway.key_id = gateway.key_secret = 'test'
+    gateway.retries, gateway.backoff, gateway.pool_max_idle = 0, 0, max_idle
+    return gateway
+
+
+def test_create_order_after_server_closed_idle_connection(server):
+    server.requests_per_connection = 1
+    gateway = _gateway(server)
+    assert gateway.create_order(100)['id'] == 'order_1'
+    assert server.closed.wait(5)  # the pooled connection is now dead
+
+    assert gateway.create_order(100)['id'] == 'order_2'
+    assert server.requests == [(1, '/v1/orders'), (2, '/v1/orders')]
+    assert server.dropped == 0  # nothing was written to the dead connection
+    assert gateway.breaker.state == 'closed'
+
+
+def test_connection_idle_past_max_idle_is_not_reused(server):
+    gateway = _gateway(server, max_idle=0)
+    gateway.create_order(100)
+    gateway.create_order(100)
+    assert [connection for connection, _ in server.requests] == [1, 2]
+
+
+def test_fresh_connection_is_reused(server):
+    gateway = _gateway(server)
+    gateway.create_order(100)
+    gateway.create_order(100)
+    assert [connection for connection, _ in server.requests] == [1, 1]
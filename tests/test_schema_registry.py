@@ -0,0 +1,92 @@
+"""SchemaRegistry under concurrent lookups and invalidations (gthread workers).
+
+The database is left out: ``_load`` returns a fixed map and the version
+stamp lives in memory, so invalidations are cheap enough to interleave with
+every lookup.
+
+Usage:
+    python -m pytest tests/test_schema_registry.py
+"""
+import itertools
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schema_registry import SchemaRegistry  # noqa: E402
+
+TABLES = {'yatra_test': frozenset({'id', 'name'})}
+
+
+class MemoryStamp:
+    """VersionStamp without the app_settings row."""
+
+    def __init__(self):
+        self._counter = itertools.count(1)
+        self.value = '0'
+
+    def current(self, force=False):
+        return self.value
+
+    def bump(self):
+        self.value = str(next(self._counter))
+        return self.value
+
+
+class MemoryRegistry(SchemaRegistry):
+    def __init__(self):
+        super().__init__()
+        self.stamp = MemoryStamp()
+        self.loads = 0
+
+    def _load(self):
+        self.loads += 1
+        return dict(TABLES)
+
+
+def test_invalidate_keeps_the_map_and_reloads_on_next_lookup():
+    registry = MemoryRegistry()
+    before = registry._ensure_fresh()
+    registry.invalidate()
+
+    assert before == TABLES  # a reader holding the old map can still use it
+    assert registry.has_table('yatra_test')
+    assert registry.loads == 2
+
+
+def test_lookups_survive_concurrent_invalidate():
+    registry = MemoryRegistry()
+    stop = threading.Event()
+    errors, results = [], set()
+
+    def invalidate():
+        while not stop.is_set():
+            registry.invalidate()
+
+    def look_up():
+        for _ in range(5000):
+            try:
+                results.add((registry.has_table('yatra_test'), registry.columns('yatra_test'),
+                             tuple(registry.table_names())))
+            except Exception as e:
+                errors.append(e)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads as often as the interpreter allows
+    invalidator = threading.Thread(target=invalidate)
+    readers = [threading.Thread(target=look_up) for _ in range(4)]
+    try:
+        invalidator.start()
+        for t in readers:
+            t.start()
+        for t in readers:
+            t.join()
+    finally:
+        stop.set()
+        invalidator.join()
+        sys.setswitchinterval(interval)
+
+    assert errors == []
+    assert results == {(True, TABLES['yatra_test'], ('yatra_test',))}
+    assert registry.loads > 1
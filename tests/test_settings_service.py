@@ -0,0 +1,69 @@
+"""SettingsService under concurrent reads and invalidations (gthread workers).
+
+Usage:
+    python -m pytest tests/test_settings_service.py
+"""
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from settings_service import SettingsService  # noqa: E402
+from test_schema_registry import MemoryStamp  # noqa: E402
+
+VALUES = {'accept_payment_mode': 'true', 'registration_enabled': 'false'}
+
+
+class MemorySettings(SettingsService):
+    def __init__(self):
+        super().__init__()
+        self.stamp = MemoryStamp()
+
+    def _load(self):
+        return dict(VALUES)
+
+
+def test_invalidate_keeps_the_values_and_reloads_on_next_read():
+    settings = MemorySettings()
+    before = settings._ensure_fresh()
+    settings.invalidate()
+
+    assert before == VALUES
+    assert settings.accept_payment_mode()
+    assert settings.reloads == 2
+
+
+def test_reads_survive_concurrent_invalidate():
+    settings = MemorySettings()
+    stop = threading.Event()
+    errors, results = [], set()
+
+    def invalidate():
+        while not stop.is_set():
+            settings.invalidate()
+
+    def read():
+        for _ in range(5000):
+            try:
+                results.add((settings.accept_payment_mode(), settings.is_registration_enabled()))
+            except Exception as e:
+                errors.append(e)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    invalidator = threading.Thread(target=invalidate)
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    try:
+        invalidator.start()
+        for t in readers:
+            t.start()
+        for t in readers:
+            t.join()
+    finally:
+        stop.set()
+        invalidator.join()
+        sys.setswitchinterval(interval)
+
+    assert errors == []
+    assert results == {(True, False)}
@@ -0,0 +1,316 @@
+"""Background processing of uploaded images.
+
+Upload routes used to ``f.save()`` the raw file straight into static/uploads
+inside the request: multi-MB phone photos, EXIF (GPS included) intact,
+sideways if the camera only flagged the rotation, then shown at 45px in the
+admin grid.  Now a route only writes the upload to a private staging
+directory and records an ``UploadJob``; once its transaction commits it calls
+``upload_pipeline.kick()`` and answers straight away.
+
+A small thread pool (``UPLOAD_WORKERS`` per process) drains the job table:
+rotate per EXIF, drop all metadata, write a display variant and a thumbnail
+into static/uploads/<kind>, store both paths on the target row and remove the
+files they replace.  The job table is the queue, so jobs left behind by a
+restarted worker are picked up again (``resume``), and a job that keeps
+failing is given up after ``MAX_ATTEMPTS``.  Without Pillow the upload is
+published unchanged.  ``UPLOAD_WORKERS=0`` processes inside the request.
+"""
+import json
+import os
+import shutil
+import threading
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from sqlalchemy import text
+from werkzeug.utils import secure_filename
+
+from models import db, UploadJob, LoginDetails, CarouselImage, YatraDetails, get_india_time
+
+ALLOWED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp'}
+MAX_ATTEMPTS = 3
+JPEG_QUALITY = 82
+
+# folder: under static/; display: longest side; thumb: box; crop: fill the box (square avatars)
+UploadKind = namedtuple('UploadKind', 'folder display thumb crop')
+KINDS = {
+    'passenger': UploadKind('uploads/passengers', 1024, (160, 160), True),
+    'carousel': UploadKind('uploads/carousel', 1920, (480, 270), False),
+    'yatra_about': UploadKind('uploads/yatra_images', 1600, (480, 480), False),
+}
+
+
+class InvalidUpload(ValueError):
+    """The upload is not an image we accept; retrying will not help."""
+
+
+def is_allowed_image(filename):
+    return os.path.splitext(filename or '')[1].lower() in ALLOWED_EXTENSIONS
+
+
+# ── Image work ──
+
+def make_variants(src_path, kind, static_root, stem):
+    """Write the display and thumbnail variants of ``src_path``.
+
+    Returns their paths relative to ``static_root`` (thumbnail ``None`` when
+    Pillow is missing and the file is published unchanged).
+    """
+    spec = KINDS[kind]
+    out_dir = os.path.join(static_root, spec.folder)
+    os.makedirs(out_dir, exist_ok=True)
+    try:
+        from PIL import Image, ImageOps, UnidentifiedImageError
+    except ImportError:
+        ext = os.path.splitext(src_path)[1].lower()
+        shutil.copyfile(src_path, os.path.join(out_dir, stem + ext))
+        return f"{spec.folder}/{stem}{ext}", None
+
+    try:
+        img = Image.open(src_path)
+        img.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise InvalidUpload(f"not a readable image: {e}")
+    with img:
+        img = ImageOps.exif_transpose(img)  # phones store portraits sideways + a rotation flag
+        has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+        img = img.convert('RGBA' if has_alpha else 'RGB')  # also drops EXIF / text chunks
+        ext, fmt, options = ('.png', 'PNG', {'optimize': True}) if has_alpha else \
+            ('.jpg', 'JPEG', {'quality': JPEG_QUALITY, 'optimize': True, 'progressive': True})
+
+        display = img.copy()
+        display.thumbnail((spec.display, spec.display), Image.LANCZOS)
+        if spec.crop:
+            thumb = ImageOps.fit(img, spec.thumb, Image.LANCZOS)
+        else:
+            thumb = img.copy()
+            thumb.thumbnail(spec.thumb, Image.LANCZOS)
+
+        names = (f"{stem}{ext}", f"{stem}_thumb{ext}")
+        for variant, name in zip((display, thumb), names):
+            target = os.path.join(out_dir, name)
+            variant.save(target + '.tmp', fmt, **options)
+            os.replace(target + '.tmp', target)
+    return f"{spec.folder}/{names[0]}", f"{spec.folder}/{names[1]}"
+
+
+# ── Publishing results ──
+
+def _apply(job, display, thumb):
+    """Point the job's target row at the new variants.  Returns the static paths
+    that are no longer used (old variants, or the new ones if the target is gone)."""
+    if job.kind == 'passenger':
+        traveler = LoginDetails.query.get(job.target_id)
+        if not traveler:
+            return [display, thumb]
+        old = [traveler.photo, traveler.photo_thumb]
+        traveler.photo, traveler.photo_thumb = display, thumb
+        return old
+    if job.kind == 'yatra_about':
+        yatra = YatraDetails.query.get(job.target_id)
+        if not yatra:
+            return [display, thumb]
+        old = [yatra.about_image, yatra.about_image_thumb]
+        yatra.about_image, yatra.about_image_thumb = display, thumb
+        return old
+    if job.kind == 'carousel' and job.target_id is not None:
+        # An existing slide re-processed (migrate_upload_variants.py)
+        img = db.session.get(CarouselImage, job.target_id)
+        if not img:
+            return [display, thumb]
+        old = [img.image_path, img.thumb_path]
+        img.image_path, img.thumb_path = display, thumb
+        return old
+    if job.kind == 'carousel':
+        payload = json.loads(job.payload or '{}')
+        db.session.add(CarouselImage(image_path=display, thumb_path=thumb,
+                                     sort_order=payload.get('sort_order', 0)))
+        return []
+    raise InvalidUpload(f"unknown upload kind {job.kind!r}")
+
+
+def remove_static_files(static_root, paths):
+    for path in paths:
+        if not path:
+            continue
+        full_path = os.path.join(static_root, path)
+        try:
+            if os.path.exists(full_path):
+                os.remove(full_path)
+        except OSError:
+            pass
+
+
+# ── Queue ──
+
+class UploadPipeline:
+    """Stages uploads and processes them on a bounded thread pool."""
+
+    def __init__(self):
+        self.app = None
+        self.workers = 2
+        self.stale_after = timedelta(minutes=10)
+        self.on_processed = None
+        self.logger = None
+        self._executor = None
+        self._executor_pid = None
+        self._outstanding = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app, on_processed=None, logger=None):
+        """``on_processed(job)`` runs in the worker thread, inside an app
+        context, after a job's result has been committed."""
+        self.app = app
+        self.logger = logger or app.logger
+        self.workers = app.config['UPLOAD_WORKERS']
+        self.stale_after = timedelta(seconds=app.config['UPLOAD_JOB_STALE_SECONDS'])
+        self.staging_dir = app.config['UPLOAD_STAGING_DIR']
+        self.static_root = os.path.join(app.root_path, 'static')
+        self.on_processed = on_processed
+        os.makedirs(self.staging_dir, exist_ok=True)
+
+    def stage(self, file_storage, kind, target_id=None, payload=None):
+        """Save ``file_storage`` to the staging area and add its job to the
+        session.  Returns the job, or ``None`` for an empty / disallowed file.
+        Commit, then call ``kick()``."""
+        if not file_storage or not file_storage.filename or not is_allowed_image(file_storage.filename):
+            return None
+        ext = os.path.splitext(file_storage.filename)[1].lower()
+        staging_path = os.path.join(self.staging_dir, f"{uuid.uuid4().hex}{ext}")
+        file_storage.save(staging_path)
+        job = UploadJob(kind=kind, target_id=target_id, staging_path=staging_path,
+                        original_name=file_storage.filename[:255],
+                        payload=json.dumps(payload) if payload else None)
+        db.session.add(job)
+        return job
+
+    def kick(self):
+        """Make sure a worker is on its way to the pending jobs."""
+        if self.workers <= 0:
+            self.process_pending()
+            return
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                # First use in this process (a gunicorn worker forks after import)
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='upload')
+                self._executor_pid = os.getpid()
+                self._outstanding = 0
+            if self._outstanding >= self.workers:
+                return  # every worker is busy and will look for more work before it stops
+            self._outstanding += 1
+        self._executor.submit(self._drain_in_background)
+
+    def resume(self):
+        """Pick up jobs a previous process left pending or half-done."""
+        if self._has_pending():
+            self.kick()
+
+    def process_pending(self):
+        """Process claimable jobs in the calling thread until none are left."""
+        while True:
+            job = self._claim()
+            if job is None:
+                return
+            self._run(job)
+
+    def _drain_in_background(self):
+        try:
+            with self.app.app_context():
+                self.process_pending()
+        finally:
+            with self._lock:
+                self._outstanding -= 1
+        # A job committed after our last claim attempt must not wait for the next upload
+        with self.app.app_context():
+            if self._has_pending():
+                self.kick()
+
+    def _claimable(self):
+        return ("(status = 'pending' OR (status = 'processing' AND claimed_at < :stale))",
+                {'stale': get_india_time() - self.stale_after})
+
+    def _has_pending(self):
+        try:
+            cond, params = self._claimable()
+            found = db.session.execute(text(f"SELECT 1 FROM upload_jobs WHERE {cond} LIMIT 1"), params).first()
+            db.session.commit()
+            return found is not None
+        except Exception as e:
+            db.session.rollback()
+            self._log(f"Upload queue check failed: {e}")
+            return False
+
+    def _claim(self):
+        """Atomically take the oldest claimable job; ``None`` when there is none."""
+        cond, params = self._claimable()
+        while True:
+            row = db.session.execute(text(f"SELECT id FROM upload_jobs WHERE {cond} ORDER BY id LIMIT 1"),
+                                     params).first()
+            if row is None:
+                db.session.commit()
+                return None
+            claimed = db.session.execute(text(
+                f"UPDATE upload_jobs SET status = 'processing', claimed_at = :now, attempts = attempts + 1 "
+                f"WHERE id = :id AND {cond}"), dict(params, id=row[0], now=get_india_time()))
+            db.session.commit()
+            if claimed.rowcount == 1:
+                return db.session.get(UploadJob, row[0])
+            # Another worker took it first - try the next one
+
+    def _run(self, job):
+        job_id = job.id
+        produced = []
+        try:
+            if not os.path.exists(job.staging_path):
+                raise InvalidUpload('staged file is missing')
+            stem = f"{os.path.splitext(secure_filename(job.original_name or '') or 'image')[0]}_{uuid.uuid4().hex[:8]}"
+            produced = list(make_variants(job.staging_path, job.kind, self.static_root, stem))
+            unused = _apply(job, *produced)
+            job.status, job.error, job.finished_at = 'done', None, get_india_time()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            remove_static_files(self.static_root, produced)
+            job = db.session.get(UploadJob, job_id)
+            give_up = isinstance(e, InvalidUpload) or job.attempts >= MAX_ATTEMPTS
+            job.status = 'failed' if give_up else 'pending'
+            job.error = str(e)[:1000]
+            if give_up:
+                job.finished_at = get_india_time()
+            db.session.commit()
+            self._log(f"Upload job {job_id} ({job.kind}) {'failed' if give_up else 'will retry'}: {e}")
+            if give_up:
+                self._discard(job.staging_path)
+            return
+
+        self._discard(job.staging_path)
+        remove_static_files(self.static_root, [p for p in unused if p not in produced])
+        if self.on_processed:
+            try:
+                self.on_processed(job)
+            except Exception as e:
+                db.session.rollback()
+                self._log(f"Upload job {job_id} post-processing hook failed: {e}")
+
+    def _discard(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _log(self, message):
+        if self.logger:
+            self.logger.error(message)
+
+    def stats(self):
+        rows = db.session.execute(text("SELECT status, COUNT(*) FROM upload_jobs GROUP BY status")).fetchall()
+        return {status: n for status, n in rows}
+
+    def pending_count(self, kind):
+        return UploadJob.query.filter(UploadJob.kind == kind,
+                                      UploadJob.status.in_(('pending', 'processing'))).count()
+
+
+upload_pipeline = UploadPipeline()
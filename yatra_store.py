@@ -0,0 +1,332 @@
+"""Data-access helpers for the dynamic per-yatra registration tables.
+
+Every yatra gets its own ``yatra_<title>`` table (see ``sanitize_table_name`` in
+app.py).  Pages that need a login's registrations across *all* yatras used to
+issue one SELECT per table; the helpers here fetch them in a single statement.
+
+Storage modes (``REGISTRATION_STORAGE`` config):
+
+* ``tables`` (default) - one physical table per yatra, as before.
+* ``registrations`` - every row lives in the consolidated ``registrations``
+  table keyed by ``(yatra_id, passenger_id)``.  The old ``yatra_<title>`` names
+  remain as updatable compatibility views, so every route that builds SQL from a
+  ``_is_valid_table``-checked name keeps working unchanged.
+  ``migrate_consolidate_registrations.py`` moves existing tables across.
+"""
+from functools import lru_cache
+
+from flask import current_app
+from sqlalchemy import inspect, text
+
+from models import db
+
+STORAGE_TABLES = 'tables'
+STORAGE_REGISTRATIONS = 'registrations'
+
+# Columns every yatra table / compatibility view exposes (besides ``id``)
+YATRA_TABLE_COLUMNS = (
+    'login_id', 'name', 'year_of_birth', 'email', 'phone', 'gender', 'city', 'district', 'state',
+    'hotel_package', 'travel_package', 'start_date', 'end_date', 'status', 'razorpay_id',
+    'passenger_id', 'order_id', 'created_at',
+)
+
+# Secondary indexes every physical yatra table gets: dashboard / payment lookups
+# by login, save_passenger_package's passenger_id / (login_id, name) match,
+# the admin grid's status filter (newest first), created_at ordering and the
+# payment reconciler's order_id match.
+YATRA_TABLE_INDEXES = (
+    ('login_id',),
+    ('passenger_id',),
+    ('login_id', 'name'),
+    ('status', 'created_at'),
+    ('created_at',),
+    ('order_id',),
+)
+
+# Columns read back for a login's registrations (dashboard + saved packages)
+REGISTRATION_COLUMNS = (
+    'name', 'year_of_birth', 'email', 'phone', 'gender', 'city', 'district', 'state',
+    'hotel_package', 'travel_package', 'start_date', 'end_date', 'status',
+    'razorpay_id', 'passenger_id',
+)
+
+
+@lru_cache(maxsize=32)
+def _login_union_sql(table_names):
+    """Build (once per set of tables) the UNION ALL statement over ``table_names``.
+
+    Table names only ever come from ``sanitize_table_name`` / the catalog, so they
+    are safe to inline; the login id stays a bound parameter.
+    """
+    cols = ', '.join(REGISTRATION_COLUMNS)
+    parts = [
+        f"SELECT {pos} AS yatra_pos, '{tname}' AS table_name, {cols} FROM {tname} WHERE login_id = :lid"
+        for pos, tname in enumerate(table_names)
+    ]
+    return text(' UNION ALL '.join(parts) + ' ORDER BY yatra_pos')
+
+
+def fetch_login_registrations(login_id, table_names):
+    """Return every registration row for ``login_id`` across ``table_names``.
+
+    Rows are mappings carrying ``table_name`` plus ``REGISTRATION_COLUMNS`` and
+    come back grouped in the order of ``table_names``.  One round trip is used
+    regardless of the number of yatras; if the combined statement fails (e.g. a
+    legacy table is missing a column) it falls back to per-table queries and
+    skips the tables that cannot be read.
+    """
+    table_names = tuple(table_names)
+    if not table_names:
+        return []
+    try:
+        return db.session.execute(_login_union_sql(table_names), {'lid': login_id}).mappings().all()
+    except Exception as e:
+        db.session.rollback()
+        print(f"[WARNING] Combined registration query failed, falling back to per-table reads: {e}")
+
+    rows = []
+    for tname in table_names:
+        try:
+            rows.extend(db.session.execute(_login_union_sql((tname,)), {'lid': login_id}).mappings().all())
+        except Exception as e:
+            db.session.rollback()
+            print(f"[WARNING] Could not read registrations from {tname}: {e}")
+    return rows
+
+
+# ── Storage mode / DDL ──
+
+def storage_mode():
+    """Return the configured registration storage mode."""
+    mode = current_app.config.get('REGISTRATION_STORAGE', STORAGE_TABLES)
+    return mode if mode in (STORAGE_TABLES, STORAGE_REGISTRATIONS) else STORAGE_TABLES
+
+
+def _is_postgres():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def is_view(name):
+    """Return True if ``name`` is a view (i.e. a consolidated-storage compatibility view)."""
+    if _is_postgres():
+        sql = "SELECT 1 FROM pg_catalog.pg_views WHERE schemaname='public' AND viewname=:n"
+    else:
+        sql = "SELECT 1 FROM sqlite_master WHERE type='view' AND name=:n"
+    return db.session.execute(text(sql), {'n': name}).fetchone() is not None
+
+
+def create_yatra_table(tname):
+    """Create the dedicated physical table for a yatra (``tables`` storage)."""
+    if _is_postgres():
+        db.session.execute(text(f'''
+            CREATE TABLE IF NOT EXISTS {tname} (
+                id SERIAL PRIMARY KEY,
+                login_id TEXT,
+                name TEXT,
+                year_of_birth INTEGER,
+                email TEXT,
+                phone TEXT,
+                gender TEXT,
+                city TEXT,
+                district TEXT,
+                state TEXT,
+                hotel_package TEXT,
+                travel_package TEXT,
+                start_date TEXT,
+                end_date TEXT,
+                status TEXT DEFAULT 'Interest',
+                razorpay_id TEXT,
+                passenger_id INTEGER,
+                order_id TEXT,
+                created_at TIMESTAMP DEFAULT NOW()
+            )
+        '''))
+    else:
+        db.session.execute(text(f'''
+            CREATE TABLE IF NOT EXISTS {tname} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                login_id TEXT,
+                name TEXT,
+                year_of_birth INTEGER,
+                email TEXT,
+                phone TEXT,
+                gender TEXT,
+                city TEXT,
+                district TEXT,
+                state TEXT,
+                hotel_package TEXT,
+                travel_package TEXT,
+                start_date TEXT,
+                end_date TEXT,
+                status TEXT DEFAULT 'Interest',
+                razorpay_id TEXT,
+                passenger_id INTEGER,
+                order_id TEXT,
+                created_at TEXT DEFAULT (datetime('now', 'localtime'))
+            )
+        '''))
+
+
+def ensure_yatra_indexes(tname, concurrently=False, log=None):
+    """Create whichever of ``YATRA_TABLE_INDEXES`` ``tname`` is missing; returns their names.
+
+    Existing indexes are matched by column list rather than name, so tables
+    renamed after a title change (whose indexes keep the old name) are not
+    indexed twice.  With ``concurrently`` on Postgres each index is built with
+    CREATE INDEX CONCURRENTLY outside the session transaction, so writes to a
+    live table are not blocked.  Views (consolidated storage) are skipped: the
+    ``registrations`` table carries its own indexes.  So are indexes on columns
+    an old table never had.
+    """
+    if is_view(tname):
+        return []
+    inspector = inspect(db.engine)
+    existing = {tuple(ix['column_names']) for ix in inspector.get_indexes(tname)}
+    columns = {c['name'] for c in inspector.get_columns(tname)}
+    created = []
+    for cols in YATRA_TABLE_INDEXES:
+        if cols in existing or not columns.issuperset(cols):
+            continue
+        ix_name = f"ix_{tname}_{'_'.join(cols)}"
+        if concurrently and _is_postgres():
+            with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {ix_name} ON {tname} ({', '.join(cols)})"))
+        else:
+            db.session.execute(text(f"CREATE INDEX IF NOT EXISTS {ix_name} ON {tname} ({', '.join(cols)})"))
+        created.append(ix_name)
+        if log:
+            log(f"{tname}: created {ix_name}")
+    return created
+
+
+def create_compat_view(tname, yatra_id):
+    """Expose the ``registrations`` rows of one yatra under its legacy table name.
+
+    SQLite views are read-only, so INSTEAD OF triggers route writes to the base
+    table.  Postgres treats a single-table filtered view as auto-updatable; the
+    ``yatra_id`` column default makes INSERTs through the view land in the right
+    yatra and CHECK OPTION keeps UPDATEs from moving rows out of it.
+    """
+    yatra_id = int(yatra_id)
+    cols = ', '.join(('id', 'yatra_id') + YATRA_TABLE_COLUMNS)
+    if _is_postgres():
+        db.session.execute(text(
+            f"CREATE VIEW {tname} AS SELECT {cols} FROM registrations WHERE yatra_id = {yatra_id} WITH CASCADED CHECK OPTION"))
+        db.session.execute(text(f"ALTER VIEW {tname} ALTER COLUMN yatra_id SET DEFAULT {yatra_id}"))
+        return
+
+    db.session.execute(text(f"CREATE VIEW {tname} AS SELECT {cols} FROM registrations WHERE yatra_id = {yatra_id}"))
+    write_cols = [c for c in YATRA_TABLE_COLUMNS if c not in ('status', 'created_at')]
+    insert_cols = ', '.join(write_cols + ['status', 'created_at'])
+    insert_vals = ', '.join([f'NEW.{c}' for c in write_cols] + [
+        "COALESCE(NEW.status, 'Interest')", "COALESCE(NEW.created_at, datetime('now', 'localtime'))"])
+    set_clause = ', '.join(f'{c} = NEW.{c}' for c in YATRA_TABLE_COLUMNS)
+    db.session.execute(text(f"""
+        CREATE TRIGGER {tname}__ins INSTEAD OF INSERT ON {tname} BEGIN
+            INSERT INTO registrations (yatra_id, {insert_cols}) VALUES ({yatra_id}, {insert_vals});
+        END
+    """))
+    db.session.execute(text(f"""
+        CREATE TRIGGER {tname}__upd INSTEAD OF UPDATE ON {tname} BEGIN
+            UPDATE registrations SET {set_clause} WHERE id = OLD.id;
+        END
+    """))
+    db.session.execute(text(f"""
+        CREATE TRIGGER {tname}__del INSTEAD OF DELETE ON {tname} BEGIN
+            DELETE FROM registrations WHERE id = OLD.id;
+        END
+    """))
+
+
+def create_yatra_storage(tname, yatra_id):
+    """Create the storage behind a new yatra according to the configured mode."""
+    if storage_mode() == STORAGE_REGISTRATIONS:
+        create_compat_view(tname, yatra_id)
+    else:
+        create_yatra_table(tname)
+        ensure_yatra_indexes(tname)
+
+
+def rename_yatra_storage(old_tname, new_tname, yatra_id):
+    """Follow a yatra title change (table rename, or view re-creation)."""
+    if is_view(old_tname):
+        db.session.execute(text(f"DROP VIEW {old_tname}"))
+        create_compat_view(new_tname, yatra_id)
+    else:
+        db.session.execute(text(f"ALTER TABLE {old_tname} RENAME TO {new_tname}"))
+
+
+def drop_yatra_storage(tname):
+    """Drop a yatra's table, or its view together with the consolidated rows behind it."""
+    if is_view(tname):
+        db.session.execute(text(f"DELETE FROM registrations WHERE id IN (SELECT id FROM {tname})"))
+        db.session.execute(text(f"DROP VIEW {tname}"))
+    else:
+        db.session.execute(text(f"DROP TABLE IF EXISTS {tname}"))
+
+
+# ── Online migration: per-yatra tables → registrations ──
+
+def consolidate_yatra_table(tname, yatra_id, batch_size=1000, log=print):
+    """Move one physical yatra table into ``registrations`` without blocking writers.
+
+    1. Copy rows across in ``batch_size`` chunks, one short transaction each,
+       while the app keeps writing to the old table.
+    2. In a final transaction that holds the write lock on the old table,
+       reconcile what changed meanwhile (new, updated and deleted rows, tracked
+       through ``source_row_id``), rename the old table to ``legacy_<name>`` and
+       create the compatibility view in its place.
+
+    Returns the number of rows now stored for the yatra.  Safe to re-run: an
+    existing view means the table was already consolidated.
+    """
+    if is_view(tname):
+        log(f"{tname}: already consolidated, skipping")
+        return None
+    yatra_id = int(yatra_id)
+    present = {c['name'] for c in inspect(db.engine).get_columns(tname)}
+    targets = ', '.join(YATRA_TABLE_COLUMNS)
+    sources = ', '.join(c if c in present else 'NULL' for c in YATRA_TABLE_COLUMNS)
+
+    last_id = db.session.execute(text(
+        "SELECT COALESCE(MAX(source_row_id), 0) FROM registrations WHERE yatra_id = :y"), {'y': yatra_id}).scalar()
+    copied = 0
+    while True:
+        upto = db.session.execute(text(
+            f"SELECT MAX(id) FROM (SELECT id FROM {tname} WHERE id > :last ORDER BY id LIMIT :n) batch"),
+            {'last': last_id, 'n': batch_size}).scalar()
+        if upto is None:
+            break
+        result = db.session.execute(text(f"""
+            INSERT INTO registrations (yatra_id, source_row_id, {targets})
+            SELECT :y, id, {sources} FROM {tname} WHERE id > :last AND id <= :upto
+        """), {'y': yatra_id, 'last': last_id, 'upto': upto})
+        db.session.commit()
+        copied += result.rowcount or 0
+        last_id = upto
+    log(f"{tname}: bulk-copied {copied} rows")
+
+    # Cut-over: block writers on the old table, catch up, swap in the view.
+    if _is_postgres():
+        db.session.execute(text(f"LOCK TABLE {tname} IN SHARE ROW EXCLUSIVE MODE"))
+    db.session.execute(text(f"""
+        DELETE FROM registrations WHERE yatra_id = :y AND source_row_id IS NOT NULL
+            AND source_row_id NOT IN (SELECT id FROM {tname})
+    """), {'y': yatra_id})
+    refresh = ', '.join(
+        f"{c} = (SELECT {c} FROM {tname} src WHERE src.id = registrations.source_row_id)"
+        for c in YATRA_TABLE_COLUMNS if c in present)
+    db.session.execute(text(
+        f"UPDATE registrations SET {refresh} WHERE yatra_id = :y AND source_row_id IS NOT NULL"), {'y': yatra_id})
+    db.session.execute(text(f"""
+        INSERT INTO registrations (yatra_id, source_row_id, {targets})
+        SELECT :y, id, {sources} FROM {tname} WHERE id > :last
+    """), {'y': yatra_id, 'last': last_id})
+    db.session.execute(text(f"DROP TABLE IF EXISTS legacy_{tname}"))
+    db.session.execute(text(f"ALTER TABLE {tname} RENAME TO legacy_{tname}"))
+    create_compat_view(tname, yatra_id)
+    db.session.commit()
+
+    total = db.session.execute(text("SELECT COUNT(*) FROM registrations WHERE yatra_id = :y"), {'y': yatra_id}).scalar()
+    log(f"{tname}: consolidated ({total} rows), original kept as legacy_{tname}")
+    return total